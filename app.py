@@ -1,13 +1,38 @@
 import os
+import hmac
+import click
 from dotenv import load_dotenv
 load_dotenv()
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, session, send_from_directory
+from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, session, make_response, abort
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
 from werkzeug.utils import secure_filename
+from jinja2 import FileSystemBytecodeCache
 from datetime import datetime, timedelta
 from functools import wraps
 from config import Config, config
-from models import db, User, FreelancerProfile, Job, Bid, Payment, WorkSubmission, Review
+from models import db, User, FreelancerProfile, Job, Bid, Payment, WorkSubmission, Review, Upload, Money, JobStatus, BidStatus
+from dashboard import client_dashboard
+import cache
+import passwords
+import uploads
+import storage
+import delivery
+import avatars
+import tasks
+import payments
+import idempotency
+from idempotency import idempotent
+import user_cache
+import stats
+import migrations
+import assets
+from search import search_jobs, reindex as reindex_jobs
+import instrumentation
+from instrumentation import query_budget
+from loaders import load_many, prime, with_profile
+from pagination import keyset_paginate, wants_keyset
+from conditional import job_page_version, profile_page_version, not_modified, viewer_key
+import conditional
 
 def create_app(config_name='development', test_config=None):
     """Application factory"""
@@ -17,11 +42,25 @@ def create_app(config_name='development', test_config=None):
     if test_config:
         app.config.update(test_config)
     
-    # Disable Jinja2 caching for development
-    app.jinja_env.cache = None
+    # Template caching follows the config (disabled in development); must be
+    # set before app.jinja_env is first used
+    app.jinja_options = dict(app.jinja_options, cache_size=app.config['JINJA_CACHE_SIZE'])
+    if app.config['JINJA_BYTECODE_CACHE']:
+        cache_dir = app.config['JINJA_BYTECODE_CACHE_DIR'] or os.path.join(app.instance_path, 'jinja_cache')
+        os.makedirs(cache_dir, exist_ok=True)
+        app.jinja_options['bytecode_cache'] = FileSystemBytecodeCache(cache_dir)
+    
+    if app.config.get('UPLOAD_ACCEL_LOCAL_PROXY'):
+        app.wsgi_app = delivery.LocalAccelProxy(app.wsgi_app, app.config['UPLOAD_ACCEL_PREFIX'], app.config['UPLOAD_FOLDER'])
     
     # Initialize extensions
     db.init_app(app)
+    instrumentation.init_app(app)
+    assets.init_app(app)
+    conditional.init_app(app)
+    avatars.init_app(app)
+    tasks.init_app(app)
+    idempotency.init_app(app)
     
     # Initialize login manager
     login_manager = LoginManager()
@@ -36,37 +75,24 @@ def create_app(config_name='development', test_config=None):
             return date.strftime('%B %d, %Y')
         return ''
     
-    @login_manager.user_loader
-    def load_user(user_id):
-        try:
-            return User.query.get(int(user_id))
-        except:
-            return None
-    
-    # Create database tables
-    with app.app_context():
-        db.create_all()
+    user_cache.configure(app)
+    login_manager.user_loader(user_cache.load_user)
     
-    # Add cache-busting headers
+    # Caching policy: fingerprinted static files are immutable; pages and files
+    # served to a logged-in user must never be stored by shared caches
     @app.after_request
-    def add_no_cache_headers(response):
-        response.headers['Cache-Control'] = 'no-store, no-cache, must-revalidate, max-age=0'
-        response.headers['Pragma'] = 'no-cache'
-        response.headers['Expires'] = '0'
-        return response
-
-    @app.context_processor
-    def inject_static_version():
-        """Inject a cache-busting version (file mtime) for static assets."""
-        try:
-            css_path = os.path.join(app.root_path, 'static', 'css', 'styles.css')
-            if os.path.exists(css_path):
-                v = int(os.path.getmtime(css_path))
+    def set_cache_headers(response):
+        if request.endpoint == 'static':
+            if assets.is_fingerprinted(request.view_args.get('filename', '')):
+                response.headers['Cache-Control'] = assets.IMMUTABLE
+        elif current_user.is_authenticated:
+            if response.mimetype == 'text/html' and 'Cache-Control' not in response.headers:
+                response.headers['Cache-Control'] = 'no-store, no-cache, must-revalidate, max-age=0'
+                response.headers['Pragma'] = 'no-cache'
+                response.headers['Expires'] = '0'
             else:
-                v = int(datetime.utcnow().timestamp())
-        except Exception:
-            v = int(datetime.utcnow().timestamp())
-        return {'css_version': v}
+                response.cache_control.private = True
+        return response
     
     # ================== UTILITY FUNCTIONS ==================
     
@@ -97,6 +123,7 @@ def create_app(config_name='development', test_config=None):
     # ================== AUTHENTICATION ROUTES ==================
     
     @app.route('/')
+    @query_budget(0)
     def index():
         """Landing page"""
         # If user is logged in, send them to their dashboard instead of public landing
@@ -106,19 +133,8 @@ def create_app(config_name='development', test_config=None):
             else:
                 return redirect(url_for('dashboard'))
 
-        jobs_count = Job.query.filter_by(status='open').count()
-        users_count = User.query.count()
-        freelancers_count = User.query.filter_by(role='freelancer').count()
-
-        recent_jobs = Job.query.filter_by(status='open').order_by(Job.created_at.desc()).limit(6).all()
-        now = datetime.utcnow()
-
-        return render_template('index.html', 
-                             jobs_count=jobs_count,
-                             users_count=users_count,
-                             freelancers_count=freelancers_count,
-                             recent_jobs=recent_jobs,
-                             now=now)
+        # The page is static apart from the year in the footer
+        return render_template('index.html', now=datetime.utcnow())
     
     @app.route('/register', methods=['GET', 'POST'])
     def auth_register():
@@ -181,6 +197,11 @@ def create_app(config_name='development', test_config=None):
                 flash('Invalid email or password.', 'danger')
                 return redirect(url_for('auth_login'))
             
+            # Upgrade hashes made before a PASSWORD_HASH_METHOD change
+            if passwords.needs_rehash(user.password_hash):
+                user.set_password(password)
+                db.session.commit()
+            
             login_user(user, remember=True)
             next_page = request.args.get('next')
             return redirect(next_page) if next_page else redirect(url_for('index'))
@@ -218,9 +239,10 @@ def create_app(config_name='development', test_config=None):
                 file = request.files['profile_image']
                 if file and allowed_file(file.filename):
                     filename = secure_filename(f"{current_user.id}_{datetime.utcnow().timestamp()}_{file.filename}")
-                    os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
-                    file.save(os.path.join(app.config['UPLOAD_FOLDER'], filename))
+                    storage.store(file.stream, filename)
+                    avatars.release(profile.profile_image)
                     profile.profile_image = filename
+                    avatars.generate_later(profile.id)
             
             db.session.commit()
             flash('Profile updated successfully!', 'success')
@@ -249,6 +271,11 @@ def create_app(config_name='development', test_config=None):
     @login_required
     def view_freelancer_profile(user_id):
         """View public freelancer profile"""
+        version = profile_page_version(user_id, viewer_key(current_user))
+        cached = not_modified(version)
+        if cached:
+            return cached
+        
         user = User.query.get(user_id)
         if not user or not user.is_freelancer():
             flash('Freelancer not found.', 'danger')
@@ -262,7 +289,7 @@ def create_app(config_name='development', test_config=None):
         # Get reviews for this freelancer
         reviews = Review.query.filter_by(freelancer_id=user_id).all()
         
-        return render_template('view-freelancer.html', user=user, profile=profile, reviews=reviews)
+        return version.apply(make_response(render_template('view-freelancer.html', user=user, profile=profile, reviews=reviews)))
 
     @app.route('/change-password', methods=['GET', 'POST'])
     @login_required
@@ -286,7 +313,10 @@ def create_app(config_name='development', test_config=None):
                 return redirect(url_for('change_password'))
 
             current_user.set_password(new_pwd)
+            current_user.revoke_sessions()
             db.session.commit()
+            # Sign this browser back in under the new session version
+            login_user(current_user._get_current_object(), remember=True)
             flash('Password changed successfully.', 'success')
             return redirect(url_for('dashboard'))
 
@@ -294,26 +324,32 @@ def create_app(config_name='development', test_config=None):
     
     @app.route('/browse-jobs')
     @freelancer_required
+    @query_budget(7)
     def browse_jobs():
         """Browse available jobs"""
         page = request.args.get('page', 1, type=int)
         category = request.args.get('category', '')
         search = request.args.get('search', '')
         
-        query = Job.query.filter_by(status='open')
+        query = with_profile(Job.query.filter_by(status='open'), 'job_card')
         
         if category:
             query = query.filter_by(category=category)
         
+        # Relevance-ranked search results can't use the (created_at, id) cursor
         if search:
-            query = query.filter(Job.title.ilike(f'%{search}%') | Job.description.ilike(f'%{search}%'))
-        
-        pagination = query.order_by(Job.created_at.desc()).paginate(page=page, per_page=12)
+            pagination = search_jobs(query, search).paginate(page=page, per_page=12)
+        elif wants_keyset():
+            pagination = keyset_paginate(query, Job, request.args.get('cursor'), per_page=12)
+        else:
+            pagination = query.order_by(Job.created_at.desc()).paginate(page=page, per_page=12)
         jobs = pagination.items
         
-        # Get my bids
-        my_bids = Bid.query.filter_by(freelancer_id=current_user.id).all()
-        my_bid_job_ids = {bid.job_id for bid in my_bids}
+        # Which jobs on this page I've already bid on
+        my_bid_job_ids = {job_id for (job_id,) in db.session.query(Bid.job_id).filter(
+            Bid.freelancer_id == current_user.id,
+            Bid.job_id.in_([job.id for job in jobs])
+        )} if jobs else set()
         
         categories = ['web', 'mobile', 'design', 'writing', 'marketing', 'other']
         
@@ -326,14 +362,20 @@ def create_app(config_name='development', test_config=None):
                              category=category)
     
     @app.route('/job/<int:job_id>')
+    @query_budget(8)
     def job_detail(job_id):
         """View job details"""
-        job = Job.query.get_or_404(job_id)
+        version = job_page_version(job_id, viewer_key(current_user))
+        cached = not_modified(version)
+        if cached:
+            return cached
+        
+        job = with_profile(Job.query, 'job_page').get_or_404(job_id)
         
         # Get bids if user is the client (show all bids for visibility)
         bids = []
         if current_user.is_authenticated and job.client_id == current_user.id:
-            bids = Bid.query.filter_by(job_id=job_id).order_by(Bid.created_at.desc()).all()
+            bids = with_profile(Bid.query.filter_by(job_id=job_id), 'bid_card').order_by(Bid.created_at.desc()).all()
         
         # Check if current user has bid on this job (allow multiple bids)
         user_bids = []
@@ -344,7 +386,13 @@ def create_app(config_name='development', test_config=None):
         work_submission = job.work_submission
         reviews = job.reviews
         
-        return render_template('job-detail.html', job=job, bids=bids, user_bids=user_bids, work_submission=work_submission, reviews=reviews)
+        # Client sidebar: jobs posted and still open, counted rather than loaded
+        client_jobs, client_open_jobs = db.session.execute(db.select(
+            db.func.count(Job.id), db.func.count(db.case((Job.status == JobStatus.OPEN, Job.id)))
+        ).where(Job.client_id == job.client_id)).one()
+        
+        return version.apply(make_response(render_template('job-detail.html', job=job, bids=bids, user_bids=user_bids, work_submission=work_submission, reviews=reviews,
+                                                           client_jobs=client_jobs, client_open_jobs=client_open_jobs)))
     
     @app.route('/job/<int:job_id>/bid', methods=['POST'])
     @freelancer_required
@@ -356,7 +404,7 @@ def create_app(config_name='development', test_config=None):
             flash('This job is no longer open.', 'danger')
             return redirect(url_for('job_detail', job_id=job_id))
         
-        amount = request.form.get('amount', type=float)
+        amount = Money.parse(request.form.get('amount'), job.currency)
         proposal = request.form.get('proposal')
         delivery_days = request.form.get('delivery_days', type=int)
         
@@ -367,6 +415,7 @@ def create_app(config_name='development', test_config=None):
         bid = Bid(job_id=job_id, freelancer_id=current_user.id, 
                  amount=amount, proposal=proposal, delivery_days=delivery_days)
         db.session.add(bid)
+        stats.bump(current_user.id, bids_count=1)
         db.session.commit()
         
         flash('Bid placed successfully!', 'success')
@@ -374,17 +423,21 @@ def create_app(config_name='development', test_config=None):
     
     @app.route('/my-bids')
     @freelancer_required
+    @query_budget(5)
     def my_bids():
         """View my bids"""
         page = request.args.get('page', 1, type=int)
         status = request.args.get('status', '')
         
-        query = Bid.query.filter_by(freelancer_id=current_user.id)
+        query = with_profile(Bid.query.filter_by(freelancer_id=current_user.id), 'bid_with_job')
         
-        if status:
+        if BidStatus.parse(status):
             query = query.filter_by(status=status)
         
-        pagination = query.order_by(Bid.created_at.desc()).paginate(page=page, per_page=10)
+        if wants_keyset():
+            pagination = keyset_paginate(query, Bid, request.args.get('cursor'), per_page=10)
+        else:
+            pagination = query.order_by(Bid.created_at.desc()).paginate(page=page, per_page=10)
         bids = pagination.items
         
         return render_template('my-bids.html', bids=bids, pagination=pagination, status=status)
@@ -441,12 +494,14 @@ def create_app(config_name='development', test_config=None):
                 return redirect(url_for('submit_work', job_id=job_id))
             
             filename = secure_filename(f"{job_id}_{datetime.utcnow().timestamp()}_{file.filename}")
-            os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
-            file.save(os.path.join(app.config['UPLOAD_FOLDER'], filename))
+            storage.store(file.stream, filename)
             
             if work_submission:
+                storage.release(work_submission.file_path)
                 work_submission.file_path = filename
                 work_submission.description = description
+                if work_submission.status == 'rejected':
+                    work_submission.status = 'submitted'
             else:
                 work_submission = WorkSubmission(job_id=job_id, file_path=filename, description=description)
                 db.session.add(work_submission)
@@ -457,11 +512,77 @@ def create_app(config_name='development', test_config=None):
         
         return render_template('submit-work.html', job=job, work_submission=work_submission)
 
+    # ================== CHUNKED UPLOADS ==================
+    
+    def own_upload(upload_id):
+        """The current user's upload, or a JSON 404"""
+        upload = db.session.get(Upload, upload_id)
+        if upload is None or upload.user_id != current_user.id:
+            raise uploads.UploadError('Upload not found.', 404)
+        return upload
+    
+    def upload_response(upload, status=200):
+        response = jsonify(uploads.describe(upload))
+        response.headers['Upload-Offset'] = str(upload.offset)
+        return response, status
+    
+    @app.route('/upload-sessions', methods=['POST'])
+    @freelancer_required
+    def create_upload_session():
+        """Open a resumable upload for the work file of a job in progress"""
+        data = request.get_json(silent=True) or {}
+        try:
+            job_id = int(data.get('job_id'))
+            size = int(data.get('size'))
+        except (TypeError, ValueError):
+            raise uploads.UploadError('job_id and size are required.')
+        filename = data.get('filename') or ''
+        
+        job = db.session.get(Job, job_id)
+        if job is None:
+            raise uploads.UploadError('Job not found.', 404)
+        accepted_bid = db.session.get(Bid, job.accepted_bid_id) if job.accepted_bid_id else None
+        if job.status != 'in_progress' or not accepted_bid or accepted_bid.freelancer_id != current_user.id:
+            raise uploads.UploadError('You are not assigned to this job.', 403)
+        if not allowed_file(filename):
+            raise uploads.UploadError('File type not allowed.')
+        
+        upload = uploads.start(current_user.id, job_id, filename, size, data.get('description'))
+        return upload_response(upload, 201)
+    
+    @app.route('/upload-sessions/<upload_id>')
+    @freelancer_required
+    def upload_session_status(upload_id):
+        """Where to resume an upload (also answers HEAD)"""
+        return upload_response(own_upload(upload_id))
+    
+    @app.route('/upload-sessions/<upload_id>', methods=['PUT'])
+    @freelancer_required
+    def upload_chunk(upload_id):
+        """Append one chunk; the body is streamed to disk, never buffered whole"""
+        upload = own_upload(upload_id)
+        offset = request.headers.get('Upload-Offset', type=int)
+        if offset is None:
+            raise uploads.UploadError('Upload-Offset header is required.')
+        upload = uploads.write_chunk(upload, offset, request.stream, request.content_length)
+        if upload.status == 'complete':
+            flash('Work submitted successfully!', 'success')
+        return upload_response(upload)
+    
+    @app.errorhandler(uploads.UploadError)
+    def upload_error(error):
+        if error.offset is not None:
+            return jsonify(error=str(error), offset=error.offset), error.status
+        return jsonify(error=str(error)), error.status
+    
     @app.route('/uploads/<path:filename>')
     @login_required
     def uploaded_file(filename):
         """Serve uploaded files securely"""
-        return send_from_directory(app.config['UPLOAD_FOLDER'], filename, as_attachment=False)
+        path = storage.resolve(filename)
+        if path is None:
+            abort(404)
+        return delivery.deliver(path, filename)
 
     @app.route('/job/<int:job_id>/work')
     @client_required
@@ -478,6 +599,7 @@ def create_app(config_name='development', test_config=None):
 
     @app.route('/work/<int:job_id>/approve', methods=['POST'])
     @client_required
+    @idempotent
     def approve_work(job_id):
         """Approve submitted work (client action)"""
         job = Job.query.get_or_404(job_id)
@@ -489,24 +611,28 @@ def create_app(config_name='development', test_config=None):
         if not work:
             flash('No work has been submitted for this job.', 'danger')
             return redirect(url_for('job_detail', job_id=job_id))
-        # Mark work approved by client and create/ensure payment is pending
-        work.status = 'approved'
-        job.status = 'awaiting_payment'
 
-        accepted_bid = None
-        if job.accepted_bid_id:
-            accepted_bid = Bid.query.get(job.accepted_bid_id)
+        accepted_bid = db.session.get(Bid, job.accepted_bid_id) if job.accepted_bid_id else None
+        if accepted_bid is None:
+            flash('This job does not have an accepted bid.', 'danger')
+            return redirect(url_for('job_detail', job_id=job_id))
 
-        # Create payment record if not exists
-        if not job.payment:
-            amount = accepted_bid.amount if accepted_bid else job.budget
-            payment = Payment(job_id=job.id, client_id=job.client_id,
-                              freelancer_id=accepted_bid.freelancer_id if accepted_bid else None,
-                              amount=amount, status='pending')
-            db.session.add(payment)
-        else:
-            job.payment.status = 'pending'
+        # Only work in progress can be approved, so a repeated approval changes nothing
+        settled = job.payment is not None and job.payment.status != 'pending'
+        target = JobStatus.COMPLETED if settled else JobStatus.AWAITING_PAYMENT
+        approved = db.session.execute(
+            db.update(Job).where(Job.id == job.id, Job.status.in_(JobStatus.sources(target, JobStatus.IN_PROGRESS)))
+            .values(status=target)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if not approved:
+            db.session.rollback()
+            flash('This work has already been approved.', 'info')
+            return redirect(url_for('payment_page', job_id=job.id))
 
+        # Mark work approved by client and create/ensure payment is pending
+        work.status = 'approved'
+        payments.ensure_payment(job, accepted_bid)
         db.session.commit()
         flash('Work approved. Please complete payment to release funds to the freelancer.', 'success')
         return redirect(url_for('payment_page', job_id=job.id))
@@ -525,8 +651,11 @@ def create_app(config_name='development', test_config=None):
             flash('No work has been submitted for this job.', 'danger')
             return redirect(url_for('job_detail', job_id=job_id))
 
+        if work.status == 'approved':
+            flash('This work has already been approved.', 'info')
+            return redirect(url_for('my_jobs'))
+
         work.status = 'rejected'
-        job.status = 'in_progress'
         db.session.commit()
         flash('Work rejected. Freelancer notified to resubmit.', 'warning')
         return redirect(url_for('my_jobs'))
@@ -540,7 +669,7 @@ def create_app(config_name='development', test_config=None):
         if request.method == 'POST':
             title = request.form.get('title')
             description = request.form.get('description')
-            budget = request.form.get('budget', type=float)
+            budget = Money.parse(request.form.get('budget'))
             category = request.form.get('category')
             deadline = request.form.get('deadline')
             
@@ -561,6 +690,7 @@ def create_app(config_name='development', test_config=None):
             job = Job(client_id=current_user.id, title=title, description=description,
                      budget=budget, category=category, deadline=deadline)
             db.session.add(job)
+            stats.bump(current_user.id, jobs_count=1, open_jobs=1)
             db.session.commit()
             
             flash('Job posted successfully!', 'success')
@@ -571,6 +701,7 @@ def create_app(config_name='development', test_config=None):
     
     @app.route('/my-jobs')
     @client_required
+    @query_budget(8)
     def my_jobs():
         """View my posted jobs"""
         page = request.args.get('page', 1, type=int)
@@ -578,22 +709,23 @@ def create_app(config_name='development', test_config=None):
         
         query = Job.query.filter_by(client_id=current_user.id)
         
-        if status:
+        if JobStatus.parse(status):
             query = query.filter_by(status=status)
         
-        pagination = query.order_by(Job.created_at.desc()).paginate(page=page, per_page=10)
-        jobs = pagination.items
+        if wants_keyset():
+            pagination = keyset_paginate(query, Job, request.args.get('cursor'), per_page=10)
+        else:
+            pagination = query.order_by(Job.created_at.desc()).paginate(page=page, per_page=10)
+        jobs = prime(pagination.items, 'work_submission', 'payment')
         
         # Get reviews for all jobs
-        job_reviews = {}
-        for job in jobs:
-            review = Review.query.filter_by(job_id=job.id, client_id=current_user.id).first()
-            job_reviews[job.id] = review
+        job_reviews = load_many(Review, [job.id for job in jobs], key='job_id', client_id=current_user.id)
         
         return render_template('my-jobs.html', jobs=jobs, pagination=pagination, status=status, job_reviews=job_reviews)
     
     @app.route('/job/<int:job_id>/bids')
     @client_required
+    @query_budget(5)
     def view_bids(job_id):
         """View bids for a job"""
         job = Job.query.get_or_404(job_id)
@@ -602,7 +734,7 @@ def create_app(config_name='development', test_config=None):
             flash('You do not have permission to view these bids.', 'danger')
             return redirect(url_for('my_jobs'))
         
-        bids = Bid.query.filter_by(job_id=job_id).all()
+        bids = with_profile(Bid.query.filter_by(job_id=job_id), 'bid_card').all()
         
         return render_template('bids.html', job=job, bids=bids)
     
@@ -621,15 +753,32 @@ def create_app(config_name='development', test_config=None):
             flash('This job is no longer open.', 'danger')
             return redirect(url_for('view_bids', job_id=job.id))
         
-        # Reject all other bids
-        for other_bid in job.bids:
-            if other_bid.id != bid_id:
-                other_bid.status = 'rejected'
-        
-        bid.status = 'accepted'
-        job.status = 'in_progress'
-        job.accepted_bid_id = bid.id
+        newly_hired = not stats.has_hired(job.client_id, bid.freelancer_id)
+        
+        # Compare-and-set: only one accept can move the job out of 'open'
+        won = db.session.execute(
+            db.update(Job)
+            .where(Job.id == job.id, Job.client_id == current_user.id,
+                   Job.status.in_(JobStatus.sources(JobStatus.IN_PROGRESS)))
+            .values(status=JobStatus.IN_PROGRESS, accepted_bid_id=bid.id)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if not won:
+            db.session.rollback()
+            flash('Another bid was accepted for this job first.', 'warning')
+            return redirect(url_for('view_bids', job_id=job.id))
         
+        # Accept this bid and reject the rest in one statement
+        db.session.execute(
+            db.update(Bid)
+            .where(Bid.job_id == job.id, Bid.status.in_(BidStatus.sources(BidStatus.ACCEPTED)))
+            .values(status=db.case((Bid.id == bid.id, db.literal(BidStatus.ACCEPTED, Bid.status.type)),
+                                   else_=db.literal(BidStatus.REJECTED, Bid.status.type)))
+            .execution_options(synchronize_session=False)
+        )
+        
+        stats.bump(bid.freelancer_id, accepted_bids=1)
+        stats.bump(job.client_id, open_jobs=-1, hired_freelancers_count=1 if newly_hired else 0)
         db.session.commit()
         
         flash(f'Bid from {bid.freelancer.name} accepted! Job status is now in progress.', 'success')
@@ -637,6 +786,7 @@ def create_app(config_name='development', test_config=None):
     
     @app.route('/pay/<int:job_id>', methods=['GET', 'POST'])
     @client_required
+    @idempotent
     def payment_page(job_id):
         """Payment page"""
         job = Job.query.get_or_404(job_id)
@@ -658,12 +808,7 @@ def create_app(config_name='development', test_config=None):
         accepted_bid = Bid.query.get(job.accepted_bid_id)
         
         if request.method == 'POST':
-            # Create or update payment record
-            if not payment:
-                payment = Payment(job_id=job.id, client_id=job.client_id, 
-                                freelancer_id=accepted_bid.freelancer_id, amount=accepted_bid.amount)
-                db.session.add(payment)
-            
+            payment = payments.ensure_payment(job, accepted_bid)
             db.session.commit()
             
             return redirect(url_for('mock_payment', payment_id=payment.id))
@@ -672,6 +817,7 @@ def create_app(config_name='development', test_config=None):
     
     @app.route('/mock-payment/<int:payment_id>', methods=['GET', 'POST'])
     @client_required
+    @idempotent
     def mock_payment(payment_id):
         """Mock payment gateway (Card/UPI)"""
         payment = Payment.query.get_or_404(payment_id)
@@ -682,14 +828,22 @@ def create_app(config_name='development', test_config=None):
         
         if request.method == 'POST':
             payment_method = request.form.get('payment_method', 'card')
-            payment.status = 'paid'
-            payment.paid_at = datetime.utcnow()
-
-            # mark job as completed
-            job = payment.job
-            if job:
-                job.status = 'completed'
+            if not payments.transition(payment, 'paid'):
+                db.session.rollback()
+                flash('This payment has already been made.', 'info')
+                return redirect(url_for('payment_confirmation', payment_id=payment_id))
 
+            # mark job as completed, unless it has already left the states a payment can close
+            completed = db.session.execute(
+                db.update(Job)
+                .where(Job.id == payment.job_id, Job.status.in_(JobStatus.sources(JobStatus.COMPLETED)))
+                .values(status=JobStatus.COMPLETED)
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            if not completed:
+                db.session.rollback()
+                flash('This job can no longer be paid for.', 'danger')
+                return redirect(url_for('job_detail', job_id=payment.job_id))
             db.session.commit()
             
             if payment_method == 'upi':
@@ -748,12 +902,7 @@ def create_app(config_name='development', test_config=None):
                           rating=rating, comment=comment)
             db.session.add(review)
             
-            # Update freelancer profile rating
-            freelancer = accepted_bid.freelancer
-            reviews = Review.query.filter_by(freelancer_id=freelancer.id).all()
-            total_rating = sum(r.rating for r in reviews) + rating
-            freelancer.freelancer_profile.avg_rating = total_rating / (len(reviews) + 1)
-            freelancer.freelancer_profile.total_reviews = len(reviews) + 1
+            stats.add_rating(accepted_bid.freelancer_id, rating)
             
             db.session.commit()
             
@@ -766,135 +915,24 @@ def create_app(config_name='development', test_config=None):
     
     @app.route('/dashboard')
     @login_required
+    @query_budget(10)
     def dashboard():
         """User dashboard"""
         if current_user.is_freelancer():
-            bids_count = Bid.query.filter_by(freelancer_id=current_user.id).count()
-            accepted_bids = Bid.query.filter_by(freelancer_id=current_user.id, status='accepted').count()
-            earnings = db.session.query(db.func.sum(Payment.amount)).filter(
-                Payment.freelancer_id == current_user.id,
-                Payment.status == 'paid'
-            ).scalar() or 0
+            user_stats = stats.get_stats(current_user.id)
             
             # Get recent jobs by getting freelancer's bids
             freelancer_bids = Bid.query.filter_by(freelancer_id=current_user.id).order_by(Bid.created_at.desc()).limit(5).all()
-            recent_jobs = [bid.job for bid in freelancer_bids]
+            recent_jobs = [bid.job for bid in prime(freelancer_bids, 'job')]
             
             return render_template('dashboard-freelancer.html', 
-                                 bids_count=bids_count,
-                                 accepted_bids=accepted_bids,
-                                 earnings=earnings,
+                                 bids_count=user_stats.bids_count,
+                                 accepted_bids=user_stats.accepted_bids,
+                                 earnings=user_stats.earnings,
                                  recent_jobs=recent_jobs)
         else:
             # CLIENT DASHBOARD
-            jobs_count = Job.query.filter_by(client_id=current_user.id).count()
-            open_jobs = Job.query.filter_by(client_id=current_user.id, status='open').count()
-            spent = db.session.query(db.func.sum(Payment.amount)).filter(
-                Payment.client_id == current_user.id,
-                Payment.status.in_(['paid', 'released'])
-            ).scalar() or 0
-            
-            # 1. Get all client's jobs with bid counts
-            all_jobs = Job.query.filter_by(client_id=current_user.id).order_by(Job.created_at.desc()).all()
-            jobs_with_bids = []
-            for job in all_jobs:
-                jobs_with_bids.append({
-                    'id': job.id,
-                    'title': job.title,
-                    'status': job.status,
-                    'budget': job.budget,
-                    'bids_count': len(job.bids),
-                    'created_at': job.created_at
-                })
-            
-            # 2. Get all bids for client's jobs
-            client_jobs_ids = [job.id for job in all_jobs]
-            all_bids = db.session.query(Bid).filter(Bid.job_id.in_(client_jobs_ids)) if client_jobs_ids else []
-            bids_list = []
-            for bid in all_bids:
-                if bid.job:
-                    bids_list.append({
-                        'id': bid.id,
-                        'freelancer_name': bid.freelancer.name if bid.freelancer else 'Unknown',
-                        'freelancer_id': bid.freelancer_id,
-                        'job_id': bid.job_id,
-                        'job_title': bid.job.title,
-                        'amount': bid.amount,
-                        'proposal': bid.proposal,
-                        'status': bid.status,
-                        'rating': bid.freelancer.freelancer_profile.avg_rating if bid.freelancer and bid.freelancer.freelancer_profile else 0
-                    })
-            
-            # 3. Get active contracts (accepted bids)
-            active_contracts = []
-            for job in all_jobs:
-                if job.status in ['in_progress', 'awaiting_payment'] and job.accepted_bid_id:
-                    accepted_bid = Bid.query.get(job.accepted_bid_id)
-                    if accepted_bid:
-                        active_contracts.append({
-                            'job_id': job.id,
-                            'job_title': job.title,
-                            'freelancer_name': accepted_bid.freelancer.name if accepted_bid.freelancer else 'Unknown',
-                            'freelancer_id': accepted_bid.freelancer_id,
-                            'deadline': job.deadline,
-                            'work_status': job.work_submission.status if job.work_submission else 'pending',
-                            'amount': accepted_bid.amount
-                        })
-            
-            # 4. Get payments
-            payments = Payment.query.filter_by(client_id=current_user.id).order_by(Payment.created_at.desc()).limit(20).all()
-            payments_list = []
-            for payment in payments:
-                if payment.job and payment.freelancer:
-                    payments_list.append({
-                        'id': payment.id,
-                        'job_id': payment.job.id,
-                        'id': payment.id,
-                        'job_name': payment.job.title,
-                        'freelancer_name': payment.freelancer.name,
-                        'amount': payment.amount,
-                        'status': payment.status,
-                        'work_status': payment.job.work_submission.status if payment.job.work_submission else None,
-                        'created_at': payment.created_at
-                    })
-            
-            # 5. Get reviews given by client
-            reviews_given = Review.query.filter_by(client_id=current_user.id).order_by(Review.id.desc()).limit(10).all()
-            reviews_list = []
-            for review in reviews_given:
-                if review.freelancer_reviewed:
-                    reviews_list.append({
-                        'freelancer_name': review.freelancer_reviewed.name,
-                        'rating': review.rating,
-                        'comment': review.comment,
-                        'job_title': review.job.title if review.job else 'Unknown Job'
-                    })
-            
-            # 6. Count hired freelancers
-            hired_freelancers = set()
-            for job in all_jobs:
-                if job.status in ['in_progress', 'completed', 'awaiting_payment'] and job.accepted_bid_id:
-                    accepted_bid = Bid.query.get(job.accepted_bid_id)
-                    if accepted_bid:
-                        hired_freelancers.add(accepted_bid.freelancer_id)
-            
-            return render_template('dashboard-client.html',
-                                 # KPIs
-                                 jobs_count=jobs_count,
-                                 open_jobs=open_jobs,
-                                 spent=spent,
-                                 hired_freelancers_count=len(hired_freelancers),
-                                 # Jobs
-                                 jobs_with_bids=jobs_with_bids,
-                                 # Bids
-                                 bids_list=bids_list,
-                                 # Active contracts
-                                 active_contracts=active_contracts,
-                                 # Payments
-                                 payments_list=payments_list,
-                                 # Reviews
-                                 reviews_list=reviews_list,
-                                 recent_jobs=all_jobs[:5])
+            return render_template('dashboard-client.html', **client_dashboard(current_user.id))
 
     @app.route('/freelancer-dashboard')
     @login_required
@@ -905,12 +943,7 @@ def create_app(config_name='development', test_config=None):
             return redirect(url_for('dashboard'))
 
         # 1. Overview KPIs
-        bids_count = Bid.query.filter_by(freelancer_id=current_user.id).count()
-        accepted_bids = Bid.query.filter_by(freelancer_id=current_user.id, status='accepted').count()
-        earnings = db.session.query(db.func.sum(Payment.amount)).filter(
-            Payment.freelancer_id == current_user.id,
-            Payment.status == 'paid'
-        ).scalar() or 0
+        user_stats = stats.get_stats(current_user.id)
 
         # Get freelancer profile
         profile = FreelancerProfile.query.filter_by(user_id=current_user.id).first()
@@ -994,9 +1027,9 @@ def create_app(config_name='development', test_config=None):
 
         return render_template('freelancer-dashboard.html',
                              # KPIs
-                             bids_count=bids_count,
-                             accepted_bids=accepted_bids,
-                             earnings=earnings,
+                             bids_count=user_stats.bids_count,
+                             accepted_bids=user_stats.accepted_bids,
+                             earnings=user_stats.earnings,
                              avg_rating=avg_rating,
                              # Profile
                              profile_completion=profile_completion,
@@ -1012,17 +1045,168 @@ def create_app(config_name='development', test_config=None):
     
     @app.route('/transactions')
     @login_required
+    @query_budget(5)
     def transactions():
         """View transaction history"""
         page = request.args.get('page', 1, type=int)
         
+        query = with_profile(Payment.query, 'payment_row')
         if current_user.is_freelancer():
-            pagination = Payment.query.filter_by(freelancer_id=current_user.id).order_by(Payment.created_at.desc()).paginate(page=page, per_page=10)
+            query = query.filter_by(freelancer_id=current_user.id)
+        else:
+            query = query.filter_by(client_id=current_user.id)
+        
+        if wants_keyset():
+            pagination = keyset_paginate(query, Payment, request.args.get('cursor'), per_page=10)
         else:
-            pagination = Payment.query.filter_by(client_id=current_user.id).order_by(Payment.created_at.desc()).paginate(page=page, per_page=10)
+            pagination = query.order_by(Payment.created_at.desc()).paginate(page=page, per_page=10)
         
         payments = pagination.items
         return render_template('transactions.html', payments=payments, pagination=pagination)
+
+    # ================== METRICS ==================
+
+    @app.route('/metrics')
+    def metrics():
+        """Cache hit/miss counters and task queue depth/latency for this worker process"""
+        token = app.config.get('METRICS_TOKEN')
+        supplied = request.headers.get('Authorization', '').removeprefix('Bearer ')
+        if not (app.debug or (token and hmac.compare_digest(supplied, token))):
+            return render_template('404.html'), 404
+        return jsonify(pid=os.getpid(), caches=cache.stats(), tasks=tasks.metrics())
+
+    # ================== CLI COMMANDS ==================
+    
+    @app.cli.command('upgrade-db')
+    def upgrade_db_command():
+        """Create the schema or apply pending migrations."""
+        applied = migrations.upgrade()
+        for version, description in applied:
+            print(f'Applied migration {version}: {description}')
+        print(f'Database is at schema version {migrations.head()}.')
+    
+    @app.cli.command('schema-version')
+    def schema_version_command():
+        """Show the applied and latest schema versions."""
+        with db.engine.connect() as connection:
+            current = migrations.current_version(connection)
+        print(f'Current: {current}, latest: {migrations.head()}')
+        if current < migrations.head():
+            raise SystemExit(1)
+    
+    @app.cli.command('build-assets')
+    def build_assets_command():
+        """Write content-hashed copies of static files and the asset manifest."""
+        manifest = assets.build(app.static_folder)
+        for source, hashed in sorted(manifest.items()):
+            print(f'{source} -> {hashed}')
+    
+    @app.cli.command('precompile-templates')
+    def precompile_templates_command():
+        """Compile every template into the Jinja bytecode cache."""
+        if app.jinja_env.bytecode_cache is None:
+            print('Bytecode cache is disabled (JINJA_BYTECODE_CACHE); nothing to do.')
+            return
+        names = app.jinja_env.list_templates()
+        for name in names:
+            app.jinja_env.get_template(name)
+        print(f'Compiled {len(names)} templates.')
+    
+    @app.cli.command('worker')
+    @click.option('--threads', default=2, show_default=True, help='Tasks to run concurrently.')
+    @click.option('--burst', is_flag=True, help='Run the tasks that are due, then exit.')
+    def worker_command(threads, burst):
+        """Run queued background tasks until interrupted."""
+        if burst:
+            print(f'Ran {tasks.drain(app)} tasks.')
+            return
+        print(f'Running background tasks with {threads} threads; Ctrl+C to stop.')
+        tasks.serve(app, threads)
+    
+    @app.cli.command('prune-tasks')
+    def prune_tasks_command():
+        """Delete background tasks that completed more than a week ago."""
+        count = tasks.prune(timedelta(days=7))
+        print(f'Removed {count} completed tasks.')
+    
+    @app.cli.command('prune-idempotency-keys')
+    def prune_idempotency_keys_command():
+        """Delete idempotency keys older than IDEMPOTENCY_KEY_HOURS."""
+        count = idempotency.prune()
+        print(f'Removed {count} idempotency keys.')
+    
+    @app.cli.command('prune-uploads')
+    def prune_uploads_command():
+        """Delete unfinished chunked uploads idle past UPLOAD_SESSION_HOURS."""
+        count = uploads.prune(uploads.default_expiry())
+        print(f'Removed {count} stale uploads.')
+    
+    def print_storage_usage():
+        usage = storage.usage()
+        print(f"{usage['files']} files in {usage['blobs']} blobs: "
+              f"{usage['logical_bytes']} bytes stored as {usage['physical_bytes']}, "
+              f"saved {usage['saved_bytes']} bytes ({usage['garbage_bytes']} bytes awaiting storage-gc).")
+    
+    @app.cli.command('storage-import')
+    def storage_import_command():
+        """Move flat files in UPLOAD_FOLDER into the content-addressed store."""
+        count = storage.import_legacy()
+        print(f'Imported {count} files.')
+        print_storage_usage()
+    
+    @app.cli.command('storage-gc')
+    def storage_gc_command():
+        """Delete stored blobs that no upload refers to any more."""
+        removed, freed = storage.collect_garbage()
+        print(f'Removed {removed} blobs, freed {freed} bytes.')
+    
+    @app.cli.command('storage-stats')
+    def storage_stats_command():
+        """Report upload storage use and the space saved by deduplication."""
+        print_storage_usage()
+    
+    @app.cli.command('avatars-backfill')
+    def avatars_backfill_command():
+        """Generate resized avatar variants for existing profile images."""
+        if not avatars.available():
+            print('Pillow is not installed; avatar variants are disabled.')
+            raise SystemExit(1)
+        done, failed = avatars.backfill()
+        print(f'Generated avatars for {done} profiles ({failed} failed).')
+    
+    @app.cli.command('reconcile-stats')
+    def reconcile_stats_command():
+        """Rebuild the user_stats table from scratch."""
+        count = stats.reconcile()
+        print(f'Rebuilt stats for {count} users.')
+    
+    @app.cli.command('reconcile-ratings')
+    def reconcile_ratings_command():
+        """Rebuild freelancer rating sums and histograms from the reviews table."""
+        checked, fixed = stats.reconcile_ratings()
+        print(f'Checked {checked} profiles, fixed {fixed}.')
+    
+    @app.cli.command('backfill-bid-counts')
+    def backfill_bid_counts_command():
+        """Recompute jobs.bid_count from the bids table."""
+        count = stats.backfill_bid_counts()
+        print(f'Updated bid_count on {count} jobs.')
+    
+    @app.cli.command('search-reindex')
+    def search_reindex_command():
+        """Create the job search index if missing and rebuild it."""
+        backend = reindex_jobs()
+        print(f'Rebuilt job search index ({backend}).')
+    
+    @app.cli.command('check-bid-counts')
+    def check_bid_counts_command():
+        """Report jobs whose bid_count disagrees with their bids."""
+        mismatches = stats.bid_count_mismatches()
+        for job_id, stored, actual in mismatches:
+            print(f'Job {job_id}: bid_count={stored}, actual={actual}')
+        if mismatches:
+            raise SystemExit(1)
+        print('All bid counts are consistent.')
     
     # ================== ERROR HANDLERS ==================
     
@@ -1034,6 +1218,10 @@ def create_app(config_name='development', test_config=None):
     def forbidden(error):
         return render_template('403.html'), 403
     
+    @app.errorhandler(passwords.HashingBusy)
+    def hashing_busy(error):
+        return render_template('503.html'), 503, {'Retry-After': '5'}
+    
     @app.errorhandler(500)
     def server_error(error):
         db.session.rollback()
@@ -1043,4 +1231,6 @@ def create_app(config_name='development', test_config=None):
 
 if __name__ == '__main__':
     app = create_app(os.environ.get('FLASK_ENV', 'development'))
+    with app.app_context():
+        migrations.upgrade()
     app.run(debug=os.environ.get('FLASK_ENV') == 'development')
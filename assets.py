@@ -0,0 +1,82 @@
+"""
+Fingerprinted static assets.
+
+``flask build-assets`` copies every file under ``static/`` to
+``static/dist/`` with a content hash in its name (``css/styles.css`` becomes
+``dist/css/styles.3f2a9c1d0b7e.css``) and writes ``dist/manifest.json``
+mapping the original paths to the hashed ones. The manifest is read once at
+startup; templates link assets through ``asset_url()``. A hashed file never
+changes, so it is served with a one-year ``immutable`` cache lifetime.
+
+Without a manifest (or with ``ASSET_FINGERPRINTS`` off, as in development)
+``asset_url()`` falls back to the plain static URL.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+
+from flask import current_app, url_for
+
+DIST_DIR = 'dist'
+MANIFEST_NAME = 'manifest.json'
+HASH_LENGTH = 12
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+
+def fingerprint(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(65536), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:HASH_LENGTH]
+
+
+def build(static_folder):
+    """Write hashed copies of every static file and the manifest. Returns the manifest."""
+    dist = os.path.join(static_folder, DIST_DIR)
+    if os.path.isdir(dist):
+        shutil.rmtree(dist)
+
+    manifest = {}
+    for root, dirs, files in os.walk(static_folder):
+        dirs[:] = [d for d in dirs if os.path.join(root, d) != dist]
+        for name in sorted(files):
+            source = os.path.join(root, name)
+            logical = os.path.relpath(source, static_folder).replace(os.sep, '/')
+            stem, ext = os.path.splitext(logical)
+            hashed = f'{DIST_DIR}/{stem}.{fingerprint(source)}{ext}'
+            target = os.path.join(static_folder, *hashed.split('/'))
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.copy2(source, target)
+            manifest[logical] = hashed
+
+    with open(os.path.join(dist, MANIFEST_NAME), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+def load_manifest(static_folder):
+    """The manifest written by build(), or {} if there is none."""
+    try:
+        with open(os.path.join(static_folder, DIST_DIR, MANIFEST_NAME)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def is_fingerprinted(filename):
+    return filename.startswith(DIST_DIR + '/') and filename != f'{DIST_DIR}/{MANIFEST_NAME}'
+
+
+def asset_url(filename):
+    """URL for static ``filename``, fingerprinted when the manifest knows it."""
+    manifest = current_app.extensions['assets']
+    return url_for('static', filename=manifest.get(filename, filename))
+
+
+def init_app(app):
+    manifest = load_manifest(app.static_folder) if app.config.get('ASSET_FINGERPRINTS') else {}
+    app.extensions['assets'] = manifest
+    app.add_template_global(asset_url)
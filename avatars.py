@@ -0,0 +1,134 @@
+"""
+Resized avatar variants of freelancer profile images.
+
+When ``profile`` saves a new image, square WebP variants at the sizes in
+``AVATAR_SIZES`` are generated by a background task (``tasks.py``) and stored alongside
+the original (``storage.py``) as ``<image>.<size>.webp``. Once they exist,
+``FreelancerProfile.avatar_source`` is set to the image they were made from.
+The ``avatar_url(profile, size)`` template helper links a variant only when
+that matches the current ``profile_image``, and otherwise falls back to the
+original, so templates never need an extra query or a missing-file check.
+
+Pillow is optional: without it no variants are made and every avatar uses
+the original image. ``flask avatars-backfill`` generates variants for images
+uploaded earlier.
+"""
+
+import io
+import logging
+
+from flask import url_for
+
+from models import db, FreelancerProfile, StoredFile
+import storage
+import tasks
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # pragma: no cover - Pillow is optional
+    Image = None
+
+logger = logging.getLogger('freelancehub.avatars')
+
+# Two device pixels per CSS pixel of the largest place each size is shown
+AVATAR_SIZES = {
+    'small': 128,   # bids.html, profile.html
+    'large': 384,   # view-freelancer.html
+}
+QUALITY = 80
+
+
+def available():
+    return Image is not None
+
+
+def variant_name(name, size):
+    return f'{name}.{AVATAR_SIZES[size]}.webp'
+
+
+def avatar_url(profile, size='small'):
+    """URL of ``profile``'s image at ``size``, or of the original until the variant exists."""
+    name = profile.profile_image
+    if not name:
+        return None
+    if available() and size in AVATAR_SIZES and profile.avatar_source == name:
+        name = variant_name(name, size)
+    return url_for('uploaded_file', filename=name)
+
+
+def render_variant(image, pixels):
+    """Centre-cropped square of ``pixels`` as WebP bytes."""
+    variant = ImageOps.fit(image, (pixels, pixels), Image.LANCZOS)
+    buffer = io.BytesIO()
+    variant.save(buffer, 'WEBP', quality=QUALITY, method=4)
+    buffer.seek(0)
+    return buffer
+
+
+@tasks.task('avatars.generate')
+def generate(profile_id):
+    """Create any missing variants of the profile's current image. Returns True on success."""
+    profile = db.session.get(FreelancerProfile, profile_id)
+    if profile is None or not profile.profile_image or not available():
+        return False
+    source = profile.profile_image
+    path = storage.resolve(source)
+    if path is None:
+        return False
+
+    try:
+        with Image.open(path) as image:
+            image = ImageOps.exif_transpose(image)
+            image = image.convert('RGBA' if image.mode in ('RGBA', 'LA', 'P') else 'RGB')
+            for size, pixels in AVATAR_SIZES.items():
+                name = variant_name(source, size)
+                if db.session.get(StoredFile, name) is None:
+                    storage.store(render_variant(image, pixels), name)
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        db.session.rollback()
+        logger.warning('Could not make avatar variants of %s: %s', source, e)
+        return False
+
+    # The user may have uploaded another image meanwhile; only mark this one
+    db.session.execute(
+        db.update(FreelancerProfile)
+        .where(FreelancerProfile.id == profile_id, FreelancerProfile.profile_image == source)
+        .values(avatar_source=source)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    return True
+
+
+def release(name):
+    """Release an image and all of its variants from storage."""
+    storage.release(name)
+    if name:
+        for size in AVATAR_SIZES:
+            storage.release(variant_name(name, size))
+
+
+def generate_later(profile_id):
+    """Queue variant generation for after the current transaction commits."""
+    if available():
+        tasks.enqueue('avatars.generate', profile_id=profile_id)
+
+
+def backfill():
+    """Generate variants for every profile whose image has none. Returns (done, failed)."""
+    done = failed = 0
+    pending = db.session.query(FreelancerProfile.id).filter(
+        FreelancerProfile.profile_image.isnot(None),
+        db.or_(FreelancerProfile.avatar_source.is_(None),
+               FreelancerProfile.avatar_source != FreelancerProfile.profile_image),
+    ).all()
+    for (profile_id,) in pending:
+        if generate(profile_id):
+            done += 1
+        else:
+            failed += 1
+    return done, failed
+
+
+def init_app(app):
+    app.add_template_global(avatar_url)
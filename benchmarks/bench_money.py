@@ -0,0 +1,72 @@
+"""
+Benchmark SUM over payments: float amounts versus integer minor units.
+
+Seeds a throwaway SQLite database with the same random amounts stored both
+ways (REAL rupees, as payments.amount used to be, and BIGINT paise, as
+payments.amount_minor is now), then times the dashboard-style aggregates
+and reports how far the float totals drift from the exact ones.
+
+Run from the project root: python benchmarks/bench_money.py --payments 10000000
+"""
+
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+from decimal import Decimal
+
+SCHEMA = '''
+CREATE TABLE float_payments (id INTEGER PRIMARY KEY, client_id INTEGER NOT NULL, amount REAL NOT NULL);
+CREATE TABLE minor_payments (id INTEGER PRIMARY KEY, client_id INTEGER NOT NULL, amount_minor BIGINT NOT NULL);
+'''
+
+SEED = '''
+WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < ?)
+INSERT INTO minor_payments (id, client_id, amount_minor)
+SELECT i, i % ?, 100 + abs(random()) % 10000000 FROM n
+'''
+
+QUERIES = {
+    'total': 'SELECT SUM({column}) FROM {table}',
+    'per client': 'SELECT client_id, SUM({column}) FROM {table} GROUP BY client_id',
+}
+
+
+def timed(connection, sql, repeat):
+    best, result = float('inf'), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = connection.execute(sql).fetchall()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--payments', type=int, default=10_000_000)
+    parser.add_argument('--clients', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        connection = sqlite3.connect(os.path.join(tmp, 'bench.db'))
+        connection.executescript(SCHEMA)
+        start = time.perf_counter()
+        connection.execute(SEED, (args.payments, args.clients))
+        connection.execute('INSERT INTO float_payments SELECT id, client_id, amount_minor / 100.0 FROM minor_payments')
+        connection.commit()
+        print(f'seeded {args.payments:,} payments in {time.perf_counter() - start:.1f}s')
+
+        print(f'{"query":<12}{"float ms":>10}{"minor ms":>10}{"max drift (paise)":>20}')
+        for name, template in QUERIES.items():
+            float_time, float_rows = timed(connection, template.format(column='amount', table='float_payments'), args.repeat)
+            minor_time, minor_rows = timed(connection, template.format(column='amount_minor', table='minor_payments'), args.repeat)
+            # Compare each float total with the exact one, in paise
+            drift = max(abs(Decimal(repr(f[-1])) * 100 - m[-1]) for f, m in zip(float_rows, minor_rows))
+            print(f'{name:<12}{float_time * 1000:>10.1f}{minor_time * 1000:>10.1f}{drift:>20}')
+        connection.close()
+
+
+if __name__ == '__main__':
+    main()
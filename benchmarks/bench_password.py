@@ -0,0 +1,58 @@
+"""
+Benchmark password verification throughput: logins per second per core.
+
+For each hash method, times check_password_hash() on one thread and then
+through the bounded hashing pool with one worker per core, the way
+auth_login does it.
+
+Run from the project root: python benchmarks/bench_password.py --logins 200
+"""
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+from passwords import HashPool
+
+METHODS = ('pbkdf2:sha256:1000', 'pbkdf2:sha256:260000', 'pbkdf2:sha256:600000', 'scrypt:32768:8:1')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--logins', type=int, default=100, help='verifications per measurement')
+    parser.add_argument('--method', action='append', help='hash method(s) to test (default: a cost ladder)')
+    args = parser.parse_args()
+
+    cores = os.cpu_count() or 1
+    print(f'{cores} core(s)')
+    print(f'{"method":<26}{"ms/login":>10}{"1 thread/s":>12}{"pool/s":>10}{"per core/s":>12}')
+    for method in args.method or METHODS:
+        pwhash = generate_password_hash('correct horse battery staple', method)
+
+        start = time.perf_counter()
+        for _ in range(args.logins):
+            check_password_hash(pwhash, 'correct horse battery staple')
+        serial = time.perf_counter() - start
+
+        pool = HashPool(cores, args.logins)
+        # Simulate concurrent requests each waiting on the pool
+        with ThreadPoolExecutor(max_workers=args.logins) as requests:
+            start = time.perf_counter()
+            list(requests.map(lambda _: pool.run(check_password_hash, pwhash, 'correct horse battery staple'),
+                              range(args.logins)))
+            pooled = time.perf_counter() - start
+        pool.shutdown()
+
+        rate = args.logins / pooled
+        print(f'{method:<26}{serial / args.logins * 1000:>10.2f}{args.logins / serial:>12.1f}'
+              f'{rate:>10.1f}{rate / cores:>12.1f}')
+
+
+if __name__ == '__main__':
+    main()
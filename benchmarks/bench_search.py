@@ -0,0 +1,96 @@
+"""
+Benchmark job search: the ILIKE scan versus the FTS5 index.
+
+Seeds a throwaway SQLite database with open jobs, then times what
+browse_jobs does for a search (COUNT for the pager plus the first page of
+12) with each backend.
+
+Run from the project root: python benchmarks/bench_search.py --jobs 100000
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from models import db, User, Job, DEFAULT_CURRENCY
+from search import SearchBackend, SQLiteFTS5Backend
+
+WORDS = ('python flask django react vue angular node express api rest graphql mobile android ios '
+         'swift kotlin design logo brand figma seo content writing blog copy marketing social '
+         'campaign video editing data analytics dashboard scraping automation devops docker aws '
+         'database postgres mysql migration shopify wordpress ecommerce landing page website').split()
+
+TERMS = ['flask', 'logo design', 'shopify ecommerce', 'kubernetes', 'data dashboard analytics']
+
+
+def seed(count):
+    client = User(name='Bench Client', email='bench@example.com', role='client', password_hash='x')
+    db.session.add(client)
+    db.session.commit()
+
+    rng = random.Random(42)
+    deadline = datetime.utcnow() + timedelta(days=30)
+    batch = []
+    for i in range(count):
+        batch.append({
+            'client_id': client.id,
+            'title': ' '.join(rng.choices(WORDS, k=5)).capitalize(),
+            'description': ' '.join(rng.choices(WORDS, k=60)),
+            'budget_minor': rng.randint(50, 5000) * 100,
+            'currency': DEFAULT_CURRENCY,
+            'category': 'web',
+            'deadline': deadline,
+            'status': 'open',
+            'created_at': datetime.utcnow() - timedelta(minutes=i),
+        })
+        if len(batch) == 5000:
+            db.session.execute(db.insert(Job), batch)
+            batch = []
+    if batch:
+        db.session.execute(db.insert(Job), batch)
+    db.session.commit()
+
+
+def time_backend(backend, repeat):
+    timings = []
+    for term in TERMS:
+        start = time.perf_counter()
+        for _ in range(repeat):
+            query = backend.apply(Job.query.filter_by(status='open'), term)
+            query.paginate(page=1, per_page=12, error_out=False)
+        timings.append((term, (time.perf_counter() - start) / repeat * 1000))
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--jobs', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        uri = 'sqlite:///' + os.path.join(tmp, 'bench.db')
+        app = create_app('testing', test_config={'SQLALCHEMY_DATABASE_URI': uri})
+        with app.app_context():
+            db.create_all()
+            start = time.perf_counter()
+            seed(args.jobs)
+            print(f'Seeded {args.jobs} open jobs in {time.perf_counter() - start:.1f}s')
+
+            like = time_backend(SearchBackend(), args.repeat)
+            fts = time_backend(SQLiteFTS5Backend(), args.repeat)
+
+            print(f"\n{'term':<26}{'ILIKE ms':>12}{'FTS5 ms':>12}{'speedup':>10}")
+            for (term, like_ms), (_, fts_ms) in zip(like, fts):
+                print(f'{term:<26}{like_ms:>12.1f}{fts_ms:>12.1f}{like_ms / fts_ms:>9.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""
+Benchmark application startup: ``create_app()`` cold and warm.
+
+Cold runs each start in a fresh interpreter (imports included), the way a
+gunicorn worker boots. Warm calls ``create_app()`` repeatedly in one process.
+``--create-all`` adds the ``db.create_all()`` that startup used to run, for
+comparison. Uses a throwaway SQLite database.
+
+Run from the project root: python benchmarks/bench_startup.py --repeat 20
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+COLD = """
+import sys, time
+start = time.perf_counter()
+from app import create_app
+from models import db
+app = create_app('testing', test_config={'SQLALCHEMY_DATABASE_URI': sys.argv[1]})
+if sys.argv[2] == '1':
+    with app.app_context():
+        db.create_all()
+print(time.perf_counter() - start)
+"""
+
+
+def cold(uri, create_all, repeat):
+    timings = []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, '-c', COLD, uri, '1' if create_all else '0'],
+                             cwd=ROOT, capture_output=True, text=True, check=True)
+        timings.append(float(out.stdout.strip().splitlines()[-1]))
+    return timings
+
+
+def warm(uri, create_all, repeat):
+    from app import create_app
+    from models import db
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        app = create_app('testing', test_config={'SQLALCHEMY_DATABASE_URI': uri})
+        if create_all:
+            with app.app_context():
+                db.create_all()
+        timings.append(time.perf_counter() - start)
+        with app.app_context():
+            db.engine.dispose()
+    return timings
+
+
+def report(label, timings):
+    print(f'{label:<28} median {statistics.median(timings) * 1000:8.2f} ms   '
+          f'min {min(timings) * 1000:8.2f} ms')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        uri = 'sqlite:///' + os.path.join(tmp, 'bench.db')
+
+        # Give the comparison runs an existing schema to reflect, as in production
+        from app import create_app
+        import migrations
+        app = create_app('testing', test_config={'SQLALCHEMY_DATABASE_URI': uri})
+        with app.app_context():
+            migrations.upgrade()
+
+        for create_all in (False, True):
+            suffix = ' + create_all' if create_all else ''
+            report('cold create_app' + suffix, cold(uri, create_all, args.repeat))
+            report('warm create_app' + suffix, warm(uri, create_all, args.repeat))
+
+
+if __name__ == '__main__':
+    main()
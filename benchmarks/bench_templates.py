@@ -0,0 +1,82 @@
+"""
+Benchmark template loading and rendering for the largest templates.
+
+Compares the old setup (no template cache, every render re-parses and
+recompiles the source) with the in-memory cache, and a fresh worker that
+only has the on-disk bytecode cache written by ``flask precompile-templates``.
+The landing page is also rendered end to end through the test client.
+
+Run from the project root: python benchmarks/bench_templates.py --repeat 200
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+import migrations
+
+TEMPLATES = ('job-detail.html', 'index.html', 'dashboard-client.html')
+
+
+def make_app(uri, cache_size, bytecode_dir=None):
+    return create_app('testing', test_config={
+        'SQLALCHEMY_DATABASE_URI': uri,
+        'JINJA_CACHE_SIZE': cache_size,
+        'JINJA_BYTECODE_CACHE': bytecode_dir is not None,
+        'JINJA_BYTECODE_CACHE_DIR': bytecode_dir,
+    })
+
+
+def timed(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=100)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        uri = 'sqlite:///' + os.path.join(tmp, 'bench.db')
+        bytecode_dir = os.path.join(tmp, 'jinja_cache')
+
+        uncached = make_app(uri, 0)
+        cached = make_app(uri, 400)
+        with uncached.app_context():
+            migrations.upgrade()
+
+        # Populate the bytecode cache as the build step would
+        precompiled = make_app(uri, 0, bytecode_dir)
+        for name in precompiled.jinja_env.list_templates():
+            precompiled.jinja_env.get_template(name)
+
+        print(f'{"template load (ms)":<24}{"no cache":>10}{"memory":>10}{"bytecode":>10}')
+        for name in TEMPLATES:
+            # cache_size=0 on the bytecode app: every load is a fresh worker's first load
+            row = [timed(lambda app=app: app.jinja_env.get_template(name), args.repeat)
+                   for app in (uncached, cached, precompiled)]
+            print(f'{name:<24}' + ''.join(f'{ms:>10.3f}' for ms in row))
+
+        print()
+        print(f'{"GET / (ms)":<24}{"no cache":>10}{"memory":>10}')
+        row = []
+        for app in (uncached, cached):
+            client = app.test_client()
+            client.get('/')
+            row.append(timed(lambda: client.get('/'), args.repeat))
+        print(f'{"index.html":<24}' + ''.join(f'{ms:>10.3f}' for ms in row))
+
+
+if __name__ == '__main__':
+    main()
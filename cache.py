@@ -0,0 +1,117 @@
+"""
+In-process caches for hot, rarely changing read paths.
+
+``TTLCache`` holds plain Python values (never ORM instances, which would be
+bound to the request's session) for at most ``ttl`` seconds. Owners drop
+entries explicitly with ``invalidate()`` when the data behind them changes.
+
+Each worker process has its own copy, so writes made by another process are
+picked up when the entry expires. Hit/miss counters for every cache are
+available from ``stats()``.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+
+_MISSING = object()
+
+# name -> TTLCache, for stats()
+CACHES = {}
+
+
+class TTLCache:
+    """Thread-safe key/value cache with per-entry expiry"""
+
+    def __init__(self, name, ttl=60):
+        self.name = name
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._entries = {}
+        self._lock = threading.Lock()
+        CACHES[name] = self
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            return default
+
+    def set(self, key, value, ttl=None):
+        expires = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._entries[key] = (expires, value)
+
+    def get_or_set(self, key, factory, ttl=None):
+        """Return the cached value for ``key``, computing it with ``factory()`` on a miss."""
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = factory()
+            if (self.ttl if ttl is None else ttl) > 0:
+                self.set(key, value, ttl)
+        return value
+
+    def invalidate(self, key=None):
+        """Drop ``key``, or every entry if no key is given."""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+            self.invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else None,
+                'invalidations': self.invalidations,
+                'size': len(self._entries),
+                'ttl': self.ttl,
+            }
+
+
+class LRUCache(TTLCache):
+    """TTLCache holding at most ``maxsize`` entries, evicting the least recently used"""
+
+    def __init__(self, name, maxsize=1024, ttl=60):
+        super().__init__(name, ttl)
+        self.maxsize = maxsize
+        self.evictions = 0
+        self._entries = OrderedDict()
+
+    def get(self, key, default=None):
+        value = super().get(key, _MISSING)
+        if value is _MISSING:
+            return default
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+        return value
+
+    def set(self, key, value, ttl=None):
+        expires = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._entries[key] = (expires, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self):
+        stats = super().stats()
+        stats.update(maxsize=self.maxsize, evictions=self.evictions)
+        return stats
+
+
+def stats():
+    """Counters for every cache, keyed by cache name."""
+    return {name: cache.stats() for name, cache in CACHES.items()}
@@ -0,0 +1,141 @@
+"""
+Conditional GET for read-heavy detail pages.
+
+Each page has a version function that reads the ``updated_at``/``created_at``
+stamps and row counts of everything the page renders, in one statement. The
+ETag is a hash of that version plus who is looking (the page differs per
+viewer, down to the name in the header) and the release: ``RELEASE_ID``,
+the templates and the asset manifest, so a deploy that changes how a page
+renders invalidates every copy. Last-Modified is the newest stamp.
+``not_modified()`` answers ``If-None-Match``/``If-Modified-Since`` with a 304
+before any template work; ``PageVersion.apply()`` stamps the headers onto the
+full response.
+"""
+
+import hashlib
+import json
+import os
+
+from flask import current_app, request, session
+from werkzeug.http import is_resource_modified
+from werkzeug.wrappers import Response
+
+from models import db, User, FreelancerProfile, Job, Bid, WorkSubmission, Review
+
+CACHE_CONTROL = 'private, no-cache'
+
+
+class PageVersion:
+    """ETag and Last-Modified for one rendering of a page"""
+
+    def __init__(self, parts, stamps, viewer):
+        release = current_app.extensions['page_release']
+        digest = hashlib.sha1(repr((tuple(parts), viewer, release)).encode()).hexdigest()
+        self.etag = digest[:20]
+        stamps = [stamp for stamp in stamps if stamp is not None]
+        self.last_modified = max(stamps).replace(microsecond=0) if stamps else None
+
+    def apply(self, response):
+        response.set_etag(self.etag)
+        if self.last_modified is not None:
+            response.last_modified = self.last_modified
+        response.headers['Cache-Control'] = CACHE_CONTROL
+        response.vary.add('Cookie')
+        return response
+
+
+def release_token(app):
+    """Digest of what a deploy can change about rendered pages."""
+    digest = hashlib.sha1((app.config.get('RELEASE_ID') or '').encode())
+    folder = os.path.join(app.root_path, app.template_folder)
+    for root, dirs, files in os.walk(folder):
+        dirs.sort()
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            digest.update(os.path.relpath(path, folder).encode())
+            with open(path, 'rb') as f:
+                digest.update(f.read())
+    # Asset URLs are fingerprinted into the HTML
+    digest.update(json.dumps(app.extensions.get('assets', {}), sort_keys=True).encode())
+    return digest.hexdigest()[:12]
+
+
+def init_app(app):
+    app.extensions['page_release'] = release_token(app)
+
+
+def viewer_key(user):
+    return (user.id, user.role, user.name) if user.is_authenticated else None
+
+
+def _stamp(column, created):
+    return db.func.coalesce(column, created)
+
+
+def _latest(model, *criteria):
+    stamp = _stamp(model.updated_at, model.created_at) if hasattr(model, 'updated_at') else model.created_at
+    return db.select(db.func.max(stamp)).where(*criteria).scalar_subquery()
+
+
+def _count(model, *criteria):
+    return db.select(db.func.count(model.id)).where(*criteria).scalar_subquery()
+
+
+def _sum(column, *criteria):
+    return db.select(db.func.sum(column)).where(*criteria).scalar_subquery()
+
+
+def job_page_version(job_id, viewer):
+    """Version of job-detail.html, or None if the job does not exist."""
+    accepted_freelancer = db.select(Bid.freelancer_id).where(Bid.id == Job.accepted_bid_id).scalar_subquery()
+    bidders = db.select(Bid.freelancer_id).where(Bid.job_id == Job.id)
+    client_jobs = db.aliased(Job)
+    row = db.session.execute(db.select(
+        _stamp(Job.updated_at, Job.created_at),
+        Job.status,
+        _latest(User, User.id == Job.client_id),
+        _count(Bid, Bid.job_id == Job.id),
+        _latest(Bid, Bid.job_id == Job.id),
+        _latest(WorkSubmission, WorkSubmission.job_id == Job.id),
+        _count(Review, Review.job_id == Job.id),
+        _latest(Review, Review.job_id == Job.id),
+        _latest(FreelancerProfile, FreelancerProfile.user_id == accepted_freelancer),
+        # Client sidebar: jobs posted and still open
+        _count(client_jobs, client_jobs.client_id == Job.client_id),
+        _count(client_jobs, client_jobs.client_id == Job.client_id, client_jobs.status == 'open'),
+        # Bidders' names and ratings
+        _latest(User, User.id.in_(bidders)),
+        _latest(FreelancerProfile, FreelancerProfile.user_id.in_(bidders)),
+        _sum(FreelancerProfile.total_reviews, FreelancerProfile.user_id.in_(bidders)),
+        _sum(FreelancerProfile.rating_sum, FreelancerProfile.user_id.in_(bidders)),
+    ).where(Job.id == job_id)).first()
+    if row is None:
+        return None
+    return PageVersion(row, [row[0], row[2], row[4], row[5], row[7], row[8], row[11], row[12]], viewer)
+
+
+def profile_page_version(user_id, viewer):
+    """Version of view-freelancer.html, or None if the user does not exist."""
+    reviewers = db.aliased(User)
+    row = db.session.execute(db.select(
+        _stamp(User.updated_at, User.created_at),
+        User.role,
+        _latest(FreelancerProfile, FreelancerProfile.user_id == User.id),
+        _count(Review, Review.freelancer_id == User.id),
+        _latest(Review, Review.freelancer_id == User.id),
+        # Reviewers' names
+        _latest(reviewers, reviewers.id.in_(db.select(Review.client_id).where(Review.freelancer_id == User.id))),
+    ).where(User.id == user_id)).first()
+    if row is None:
+        return None
+    return PageVersion(row, [row[0], row[2], row[4], row[5]], viewer)
+
+
+def not_modified(version):
+    """A 304 response if the client's copy matches ``version``, else None."""
+    # A pending flash message has to be rendered, so never short-circuit then
+    if version is None or session.get('_flashes'):
+        return None
+    if is_resource_modified(request.environ, etag=version.etag, last_modified=version.last_modified):
+        return None
+    return version.apply(Response(status=304))
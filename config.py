@@ -25,6 +25,73 @@ class Config:
     UPLOAD_FOLDER = os.path.join(os.path.dirname(__file__), 'uploads')
     MAX_CONTENT_LENGTH = 50 * 1024 * 1024  # 50MB max file size
     ALLOWED_EXTENSIONS = {'pdf', 'doc', 'docx', 'txt', 'zip', 'jpg', 'jpeg', 'png', 'gif'}
+    
+    # Chunked work uploads (/upload-sessions): total size, largest PUT body, and
+    # how long an unfinished upload is kept (flask prune-uploads)
+    UPLOAD_MAX_SIZE = 50 * 1024 * 1024
+    UPLOAD_CHUNK_SIZE = 5 * 1024 * 1024
+    UPLOAD_SESSION_HOURS = 24
+    
+    # Who sends uploaded files after the login check: 'direct' (Flask, with
+    # Range support), 'x-accel' (nginx internal location at UPLOAD_ACCEL_PREFIX
+    # aliased to UPLOAD_FOLDER) or 'x-sendfile' (Apache/lighttpd)
+    UPLOAD_DELIVERY = os.environ.get('UPLOAD_DELIVERY', 'direct')
+    UPLOAD_ACCEL_PREFIX = '/_protected_uploads/'
+    UPLOAD_ACCEL_LOCAL_PROXY = False  # emulate nginx in-process (development only)
+    
+    # Background tasks (tasks.py): worker threads started in each web process
+    # (0 leaves everything to `flask worker`), seconds a claimed task stays
+    # hidden from other workers, attempts before it is marked failed, and the
+    # base retry delay (doubled per attempt). TASK_EAGER runs tasks right after
+    # the enqueuing commit, on a thread the request waits for.
+    TASK_WORKER_THREADS = int(os.environ.get('TASK_WORKER_THREADS', 1))
+    TASK_VISIBILITY_TIMEOUT = 300
+    TASK_MAX_ATTEMPTS = 5
+    TASK_RETRY_DELAY = 10
+    TASK_POLL_INTERVAL = 2.0
+    TASK_EAGER = False
+    
+    # SQL instrumentation (Server-Timing header + structured logs)
+    SQL_TRACE_ENABLED = True
+    SQL_TRACE_SLOWEST = 3  # slowest statements kept per request
+    SQL_TRACE_LOG_LEVEL = 'INFO'
+    
+    # Job search backend: 'auto' picks FTS5 on SQLite and tsvector on PostgreSQL
+    SEARCH_BACKEND = os.environ.get('SEARCH_BACKEND', 'auto')
+    
+    # Cursor pagination on (created_at, id) for listings; ?cursor= always opts in
+    KEYSET_PAGINATION = os.environ.get('KEYSET_PAGINATION', '').lower() in ('1', 'true', 'yes')
+    
+    # Per-worker cache of logged-in users (entries, seconds); bounds how long
+    # another worker may accept a session revoked by a password change
+    USER_CACHE_SIZE = 1024
+    USER_CACHE_TTL = 30
+    
+    # Password hashing: werkzeug method string (cost) and the bounded pool it
+    # runs on; workers defaults to the CPU count, queue to as many again. The
+    # bound is per process: keep workers + queue below gunicorn's WEB_THREADS
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:600000')
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 0)) or None
+    PASSWORD_HASH_QUEUE = int(os.environ.get('PASSWORD_HASH_QUEUE', 0)) or None
+    
+    # How long an Idempotency-Key's first response is kept for replay (idempotency.py)
+    IDEMPOTENCY_KEY_HOURS = 24
+    
+    # Bearer token for GET /metrics (open when DEBUG is on, 404 otherwise)
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+    
+    # Jinja template caching: parsed templates kept in memory (0 disables) and
+    # compiled bytecode persisted on disk (defaults to instance/jinja_cache)
+    JINJA_CACHE_SIZE = 400
+    JINJA_BYTECODE_CACHE = True
+    JINJA_BYTECODE_CACHE_DIR = os.environ.get('JINJA_BYTECODE_CACHE_DIR')
+    
+    # Link static files through static/dist/manifest.json (flask build-assets)
+    ASSET_FINGERPRINTS = True
+    
+    # Identifies the deployed code in page ETags (conditional.py); Render sets
+    # RENDER_GIT_COMMIT. Templates and assets are hashed in regardless.
+    RELEASE_ID = os.environ.get('RELEASE_ID') or os.environ.get('RENDER_GIT_COMMIT')
 
 class DevelopmentConfig(Config):
     """Development configuration"""
@@ -33,6 +100,9 @@ class DevelopmentConfig(Config):
     SESSION_COOKIE_SECURE = False
     TEMPLATES_AUTO_RELOAD = True
     SEND_FILE_MAX_AGE_DEFAULT = 0
+    JINJA_CACHE_SIZE = 0
+    JINJA_BYTECODE_CACHE = False
+    ASSET_FINGERPRINTS = False
 
 class ProductionConfig(Config):
     """Production configuration (Render)"""
@@ -44,6 +114,10 @@ class TestingConfig(Config):
     """Testing configuration"""
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    SQL_TRACE_LOG_LEVEL = 'WARNING'
+    JINJA_BYTECODE_CACHE = False
+    PASSWORD_HASH_METHOD = 'pbkdf2:sha256:1000'
+    TASK_EAGER = True
 
 config = {
     'development': DevelopmentConfig,
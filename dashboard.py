@@ -0,0 +1,122 @@
+"""
+Dashboard aggregation for the client dashboard.
+
+The KPIs come from the client's ``user_stats`` row and every other section is
+built from a single grouped or joined query, so the number of statements
+issued does not depend on how many jobs or bids a client has.
+"""
+
+from models import db, User, FreelancerProfile, Job, Bid, Payment, WorkSubmission, Review
+from stats import get_stats
+
+ACTIVE_STATUSES = ('in_progress', 'awaiting_payment')
+
+
+def _rows(query):
+    """Materialise a column query as a list of plain dicts."""
+    return [dict(row._mapping) for row in query]
+
+
+def client_kpis(client_id):
+    """Job counts, amount spent and number of distinct freelancers hired."""
+    user_stats = get_stats(client_id)
+    return {
+        'jobs_count': user_stats.jobs_count,
+        'open_jobs': user_stats.open_jobs,
+        'spent': user_stats.spent,
+        'hired_freelancers_count': user_stats.hired_freelancers_count,
+    }
+
+
+def client_jobs_with_bids(client_id):
+    """All of the client's jobs, newest first, with their bid counts."""
+    return _rows(db.session.query(
+        Job.id, Job.title, Job.status, Job.budget, Job.created_at,
+        Job.bid_count.label('bids_count'),
+    ).filter(Job.client_id == client_id).order_by(Job.created_at.desc()))
+
+
+def client_bids(client_id):
+    """Every bid placed on the client's jobs, with freelancer name and rating."""
+    return _rows(db.session.query(
+        Bid.id,
+        db.func.coalesce(User.name, 'Unknown').label('freelancer_name'),
+        Bid.freelancer_id,
+        Bid.job_id,
+        Job.title.label('job_title'),
+        Bid.amount,
+        Bid.proposal,
+        Bid.status,
+        db.func.coalesce(FreelancerProfile.avg_rating, 0).label('rating'),
+    ).join(Job, Job.id == Bid.job_id).outerjoin(
+        User, User.id == Bid.freelancer_id
+    ).outerjoin(
+        FreelancerProfile, FreelancerProfile.user_id == Bid.freelancer_id
+    ).filter(Job.client_id == client_id).order_by(Bid.id))
+
+
+def client_active_contracts(client_id):
+    """Jobs in progress or awaiting payment, joined to their accepted bid."""
+    contracts = _rows(db.session.query(
+        Job.id.label('job_id'),
+        Job.title.label('job_title'),
+        db.func.coalesce(User.name, 'Unknown').label('freelancer_name'),
+        Bid.freelancer_id,
+        Job.deadline,
+        WorkSubmission.status.label('work_status'),
+        Bid.amount,
+    ).join(Bid, Bid.id == Job.accepted_bid_id).outerjoin(
+        User, User.id == Bid.freelancer_id
+    ).outerjoin(
+        WorkSubmission, WorkSubmission.job_id == Job.id
+    ).filter(
+        Job.client_id == client_id,
+        Job.status.in_(ACTIVE_STATUSES)
+    ).order_by(Job.created_at.desc()))
+    # 'pending' is not a work status, so fill it in here rather than in SQL
+    for contract in contracts:
+        contract['work_status'] = contract['work_status'] or 'pending'
+    return contracts
+
+
+def client_payments(client_id, limit=20):
+    """Most recent payments made by the client."""
+    return _rows(db.session.query(
+        Payment.id,
+        Job.id.label('job_id'),
+        Job.title.label('job_name'),
+        User.name.label('freelancer_name'),
+        Payment.amount,
+        Payment.status,
+        WorkSubmission.status.label('work_status'),
+        Payment.created_at,
+    ).join(Job, Job.id == Payment.job_id).join(
+        User, User.id == Payment.freelancer_id
+    ).outerjoin(
+        WorkSubmission, WorkSubmission.job_id == Job.id
+    ).filter(Payment.client_id == client_id).order_by(Payment.created_at.desc()).limit(limit))
+
+
+def client_reviews(client_id, limit=10):
+    """Most recent reviews the client has written."""
+    return _rows(db.session.query(
+        User.name.label('freelancer_name'),
+        Review.rating,
+        Review.comment,
+        db.func.coalesce(Job.title, 'Unknown Job').label('job_title'),
+    ).join(User, User.id == Review.freelancer_id).outerjoin(
+        Job, Job.id == Review.job_id
+    ).filter(Review.client_id == client_id).order_by(Review.id.desc()).limit(limit))
+
+
+def client_dashboard(client_id):
+    """Build the full template context for the client dashboard."""
+    context = client_kpis(client_id)
+    context.update(
+        jobs_with_bids=client_jobs_with_bids(client_id),
+        bids_list=client_bids(client_id),
+        active_contracts=client_active_contracts(client_id),
+        payments_list=client_payments(client_id),
+        reviews_list=client_reviews(client_id),
+    )
+    return context
@@ -0,0 +1,106 @@
+"""
+Delivery of uploaded files.
+
+``UPLOAD_DELIVERY`` picks who sends the bytes once ``uploaded_file`` has done
+the login check:
+
+* ``direct`` — Flask streams the file itself, with ETag/Last-Modified
+  conditional requests and HTTP Range (resumable downloads, media seeking).
+* ``x-accel`` — an empty response with ``X-Accel-Redirect`` pointing nginx at
+  an ``internal`` location (``UPLOAD_ACCEL_PREFIX``) that maps to
+  ``UPLOAD_FOLDER``; nginx does the transfer, ranges and all.
+* ``x-sendfile`` — ``X-Sendfile`` with the absolute path, for Apache
+  mod_xsendfile and lighttpd.
+
+``LocalAccelProxy`` is a small WSGI stand-in for the nginx side, so the
+``x-accel`` mode can be exercised without a real proxy.
+"""
+
+import mimetypes
+import os
+
+from flask import current_app, send_file
+from werkzeug.datastructures import Headers
+from werkzeug.exceptions import RequestedRangeNotSatisfiable
+from werkzeug.utils import send_file as send_path
+from werkzeug.wrappers import Response
+
+MODES = ('direct', 'x-accel', 'x-sendfile')
+
+
+def _content_type(name):
+    return mimetypes.guess_type(name)[0] or 'application/octet-stream'
+
+
+def deliver(path, name):
+    """Response sending the file at ``path`` under the logical ``name``."""
+    mode = current_app.config.get('UPLOAD_DELIVERY', 'direct')
+    if mode not in MODES:
+        raise ValueError(f'Unknown UPLOAD_DELIVERY: {mode}')
+
+    if mode == 'direct':
+        # The blob has no extension; the type comes from the logical name
+        return send_file(path, download_name=name, as_attachment=False, conditional=True)
+
+    response = Response(status=200, content_type=_content_type(name))
+    response.headers['Content-Disposition'] = 'inline'
+    if mode == 'x-accel':
+        relative = os.path.relpath(path, current_app.config['UPLOAD_FOLDER']).replace(os.sep, '/')
+        response.headers['X-Accel-Redirect'] = current_app.config['UPLOAD_ACCEL_PREFIX'].rstrip('/') + '/' + relative
+    else:
+        response.headers['X-Sendfile'] = os.path.abspath(path)
+    return response
+
+
+class LocalAccelProxy:
+    """WSGI middleware that serves X-Accel-Redirect responses like nginx would.
+
+    ``root`` is the directory the internal ``prefix`` maps to. Only for local
+    development and checks; in production nginx does this.
+    """
+
+    # Headers of the application's response that are kept on the file response
+    PASSED_HEADERS = ('Cache-Control', 'Content-Disposition', 'Vary', 'Set-Cookie')
+
+    def __init__(self, app, prefix, root):
+        self.app = app
+        self.prefix = prefix.rstrip('/') + '/'
+        self.root = os.path.abspath(root)
+
+    def __call__(self, environ, start_response):
+        # Internal locations are not reachable from outside
+        if environ.get('PATH_INFO', '').startswith(self.prefix):
+            return Response('Not Found', status=404)(environ, start_response)
+
+        captured = {}
+
+        def capture(status, headers, exc_info=None):
+            captured.update(status=status, headers=headers)
+            return lambda data: None
+
+        body = self.app(environ, capture)
+        # A list, not a dict: Set-Cookie and friends may appear more than once
+        headers = Headers(captured['headers'])
+        target = headers.get('X-Accel-Redirect')
+        if not target:
+            start_response(captured['status'], captured['headers'])
+            return body
+        if hasattr(body, 'close'):
+            body.close()
+
+        path = os.path.abspath(os.path.join(self.root, target[len(self.prefix):]))
+        if not target.startswith(self.prefix) or not path.startswith(self.root + os.sep) or not os.path.isfile(path):
+            return Response('Not Found', status=404)(environ, start_response)
+
+        # Streamed from disk in blocks, with conditional and Range handling
+        try:
+            response = send_path(path, environ, mimetype=headers.get('Content-Type'), conditional=True)
+        except RequestedRangeNotSatisfiable as e:
+            return e(environ, start_response)
+        for name in self.PASSED_HEADERS:
+            values = headers.getlist(name)
+            if values:
+                del response.headers[name]
+                for value in values:
+                    response.headers.add(name, value)
+        return response(environ, start_response)
@@ -4,17 +4,31 @@ Run this from the project root: python demo_data.py
 """
 
 from app import create_app, db
-from models import User, FreelancerProfile, Job, Bid, Payment, Review, WorkSubmission
+import stats
+import migrations
+from models import User, FreelancerProfile, Job, Bid, Payment, Review, WorkSubmission, Money
 from datetime import datetime, timedelta
 
 
+def ratings(*histogram):
+    """Profile rating columns for ``histogram`` reviews of 1 to 5 stars."""
+    total = sum(histogram)
+    rating_sum = sum(stars * count for stars, count in enumerate(histogram, start=1))
+    columns = {}
+    for stars, count in enumerate(histogram, start=1):
+        columns[f'rating_{stars}'] = columns[f'seeded_{stars}'] = count
+    # There are no review rows behind these, so they are the seeded baseline too
+    return dict(columns, rating_sum=rating_sum, total_reviews=total, avg_rating=rating_sum / total,
+                seeded_sum=rating_sum, seeded_count=total)
+
+
 def create_demo_data():
     app = create_app()
 
     with app.app_context():
         # Reset database
         db.drop_all()
-        db.create_all()
+        migrations.upgrade()
 
         # Create 5 clients
         clients = []
@@ -37,11 +51,11 @@ def create_demo_data():
 
         # Create freelancer profiles
         profiles = []
-        profiles.append(FreelancerProfile(user_id=freelancers[0].id, bio="Backend developer with 5+ years building APIs and integrations.", skills="Python,Flask,SQL", avg_rating=4.6, total_reviews=12))
-        profiles.append(FreelancerProfile(user_id=freelancers[1].id, bio="Mobile and web developer focused on performance and UX.", skills="JavaScript,React,React Native", avg_rating=4.5, total_reviews=9))
-        profiles.append(FreelancerProfile(user_id=freelancers[2].id, bio="Full-stack engineer experienced in MERN stack and cloud deployment.", skills="Node,Express,React,AWS", avg_rating=4.7, total_reviews=15))
-        profiles.append(FreelancerProfile(user_id=freelancers[3].id, bio="UI/UX specialist and prototyper who designs clear user journeys.", skills="Figma,Prototyping,Design Systems", avg_rating=4.4, total_reviews=7))
-        profiles.append(FreelancerProfile(user_id=freelancers[4].id, bio="SEO & content strategist delivering measurable traffic growth.", skills="SEO,Content,Analytics", avg_rating=4.8, total_reviews=18))
+        profiles.append(FreelancerProfile(user_id=freelancers[0].id, bio="Backend developer with 5+ years building APIs and integrations.", skills="Python,Flask,SQL", **ratings(0, 0, 1, 3, 8)))
+        profiles.append(FreelancerProfile(user_id=freelancers[1].id, bio="Mobile and web developer focused on performance and UX.", skills="JavaScript,React,React Native", **ratings(0, 0, 0, 4, 5)))
+        profiles.append(FreelancerProfile(user_id=freelancers[2].id, bio="Full-stack engineer experienced in MERN stack and cloud deployment.", skills="Node,Express,React,AWS", **ratings(0, 0, 0, 4, 11)))
+        profiles.append(FreelancerProfile(user_id=freelancers[3].id, bio="UI/UX specialist and prototyper who designs clear user journeys.", skills="Figma,Prototyping,Design Systems", **ratings(0, 0, 1, 2, 4)))
+        profiles.append(FreelancerProfile(user_id=freelancers[4].id, bio="SEO & content strategist delivering measurable traffic growth.", skills="SEO,Content,Analytics", **ratings(0, 0, 0, 3, 15)))
 
         db.session.add_all(profiles)
         db.session.commit()
@@ -81,7 +95,7 @@ def create_demo_data():
                     client_id=client.id,
                     title=title,
                     description=desc,
-                    budget=budget,
+                    budget=Money.from_major(budget),
                     category=category,
                     deadline=datetime.utcnow() + timedelta(days=days),
                     status="open",
@@ -99,7 +113,7 @@ def create_demo_data():
 
         for job in jobs:
             for idx, freelancer in enumerate(freelancers, start=1):
-                amount = max(100, int(job.budget * (0.75 + 0.05 * idx)))
+                amount = max(Money.from_major(100), job.budget * (0.75 + 0.05 * idx))
                 proposal = f"Proposal by {freelancer_names[idx-1]} for {job.title}"
                 b = Bid(job_id=job.id, freelancer_id=freelancer.id, amount=amount, proposal=proposal, delivery_days=7 + idx, status='pending')
                 bids.append(b)
@@ -107,6 +121,9 @@ def create_demo_data():
         db.session.add_all(bids)
         db.session.commit()
 
+        # Seed rows bypass the routes, so rebuild the dashboard counters
+        stats.reconcile()
+
         print("Demo data created successfully!")
         print("\nTest Accounts:")
         print("Clients:")
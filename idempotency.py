@@ -0,0 +1,137 @@
+"""
+Idempotent POSTs.
+
+A client sends an ``Idempotency-Key`` header with a money-moving POST. The
+payment forms send an ``idempotency_key`` field instead, generated per
+rendered form. The first request with a given key runs the view and stores
+its response in ``idempotency_keys``. A retry with the same key gets that
+response back without running the view again. A retry that arrives while
+the first request is still running gets 409, and reusing a key for a
+different URL gets 422.
+
+Keys belong to the logged-in user and are kept for
+``IDEMPOTENCY_KEY_HOURS``; ``flask prune-idempotency-keys`` removes older ones.
+"""
+
+import secrets
+from datetime import datetime, timedelta
+from functools import wraps
+
+from flask import current_app, request, make_response
+from flask_login import current_user
+from sqlalchemy.exc import IntegrityError
+
+from models import db, IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+FIELD = 'idempotency_key'
+MAX_KEY_LENGTH = 64
+# A first request that has not finished in this long is presumed dead
+IN_FLIGHT_TIMEOUT = timedelta(minutes=5)
+
+
+def new_key():
+    """A fresh key for a form (template global ``idempotency_key()``)."""
+    return secrets.token_urlsafe(24)
+
+
+def _request_key():
+    return request.headers.get(HEADER) or request.form.get(FIELD)
+
+
+def _claim(key):
+    """Insert the key as in flight. Returns (record, True) if this request owns it."""
+    record = IdempotencyKey(user_id=current_user.id, key=key, request_path=request.path)
+    try:
+        with db.session.begin_nested():
+            db.session.add(record)
+        db.session.commit()
+        return record, True
+    except IntegrityError:
+        db.session.rollback()
+    existing = IdempotencyKey.query.filter_by(user_id=current_user.id, key=key).one()
+    stale = datetime.utcnow() - IN_FLIGHT_TIMEOUT
+    if existing.status_code is None and existing.created_at < stale:
+        # Take over from a request that died before storing its response
+        taken = db.session.execute(
+            db.update(IdempotencyKey)
+            .where(IdempotencyKey.id == existing.id, IdempotencyKey.status_code.is_(None),
+                   IdempotencyKey.created_at < stale)
+            .values(created_at=datetime.utcnow(), request_path=request.path)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        db.session.commit()
+        if taken:
+            return db.session.get(IdempotencyKey, existing.id), True
+    return existing, False
+
+
+def _replay(record):
+    if record.request_path != request.path:
+        return make_response(f'{HEADER} was already used for a different request.', 422)
+    if record.status_code is None:
+        response = make_response('A request with this idempotency key is still being processed.', 409)
+        response.headers['Retry-After'] = '1'
+        return response
+    response = make_response(record.body or '', record.status_code)
+    if record.content_type:
+        response.content_type = record.content_type
+    if record.location:
+        response.headers['Location'] = record.location
+    response.headers['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def _finish(record_id, response):
+    """Store the response, or forget the key after a server error so a retry runs again."""
+    db.session.rollback()
+    if response is None or response.status_code >= 500:
+        db.session.execute(db.delete(IdempotencyKey).where(IdempotencyKey.id == record_id))
+    else:
+        # Redirects are replayed as-is; a rendered page only by status
+        body = None if response.is_streamed or response.status_code >= 300 else response.get_data(as_text=True)
+        db.session.execute(
+            db.update(IdempotencyKey).where(IdempotencyKey.id == record_id)
+            .values(status_code=response.status_code, location=response.headers.get('Location'),
+                    body=body, content_type=response.content_type)
+        )
+    db.session.commit()
+
+
+def idempotent(view):
+    """Run ``view`` at most once per (user, idempotency key); replay its response for retries."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key = _request_key()
+        if request.method != 'POST' or not key or not current_user.is_authenticated:
+            return view(*args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return make_response(f'{HEADER} must be at most {MAX_KEY_LENGTH} characters.', 400)
+
+        record, owner = _claim(key)
+        if not owner:
+            return _replay(record)
+
+        record_id = record.id
+        response = None
+        try:
+            response = make_response(view(*args, **kwargs))
+        finally:
+            _finish(record_id, response)
+        return response
+    return wrapper
+
+
+def prune(older_than=None):
+    """Delete keys older than ``older_than`` (default IDEMPOTENCY_KEY_HOURS). Returns the count."""
+    older_than = older_than or timedelta(hours=current_app.config.get('IDEMPOTENCY_KEY_HOURS', 24))
+    count = db.session.execute(
+        db.delete(IdempotencyKey).where(IdempotencyKey.created_at < datetime.utcnow() - older_than)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.session.commit()
+    return count
+
+
+def init_app(app):
+    app.add_template_global(new_key, 'idempotency_key')
@@ -0,0 +1,155 @@
+"""
+Per-request SQL instrumentation.
+
+Engine events count every statement executed while a request is active and
+time it. After the request the totals are sent back in a ``Server-Timing``
+header and written to the ``freelancehub.sql`` logger as one JSON line.
+Views may declare a query budget with ``@query_budget(n)``; tests can wrap
+requests in ``assert_query_budget(app)`` to fail when a view goes over it.
+"""
+
+import heapq
+import json
+import logging
+import time
+from contextlib import contextmanager
+
+from flask import g, has_app_context, request
+from flask.logging import default_handler
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger('freelancehub.sql')
+
+_listening = False
+
+
+class RequestTrace:
+    """Statement count, total DB time and the slowest statements for one request"""
+
+    def __init__(self, keep):
+        self.keep = keep
+        self.count = 0
+        self.total = 0.0
+        self.slowest = []  # min-heap of (duration, sequence, statement)
+
+    def record(self, statement, duration):
+        self.count += 1
+        self.total += duration
+        entry = (duration, self.count, statement)
+        if len(self.slowest) < self.keep:
+            heapq.heappush(self.slowest, entry)
+        elif self.keep:
+            heapq.heappushpop(self.slowest, entry)
+
+    def slowest_statements(self):
+        return [{'ms': round(duration * 1000, 2), 'sql': ' '.join(statement.split())[:300]}
+                for duration, _, statement in sorted(self.slowest, reverse=True)]
+
+    def as_dict(self):
+        return {'queries': self.count, 'db_ms': round(self.total * 1000, 2),
+                'slowest': self.slowest_statements()}
+
+
+def query_budget(max_queries):
+    """Declare the maximum number of SQL statements a view may issue per request."""
+    def decorator(f):
+        f.query_budget = max_queries
+        return f
+    return decorator
+
+
+def _current_trace():
+    if has_app_context():
+        return g.get('sql_trace')
+    return None
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current_trace() is not None:
+        conn.info.setdefault('sql_trace_start', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    trace = _current_trace()
+    starts = conn.info.get('sql_trace_start')
+    if trace is not None and starts:
+        trace.record(statement, time.perf_counter() - starts.pop())
+
+
+def init_app(app):
+    """Attach SQL tracing to every request handled by ``app``."""
+    global _listening
+    if not app.config.get('SQL_TRACE_ENABLED', True):
+        return
+
+    state = app.extensions['sqltrace'] = {'listeners': []}
+    keep = app.config.get('SQL_TRACE_SLOWEST', 3)
+
+    if not _listening:
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        _listening = True
+
+    if not logger.handlers:
+        logger.addHandler(default_handler)
+    logger.setLevel(app.config.get('SQL_TRACE_LOG_LEVEL', 'INFO'))
+
+    @app.before_request
+    def start_sql_trace():
+        g.sql_trace = RequestTrace(keep)
+
+    @app.after_request
+    def finish_sql_trace(response):
+        trace = g.pop('sql_trace', None)
+        if trace is None:
+            return response
+
+        view = app.view_functions.get(request.endpoint)
+        budget = getattr(view, 'query_budget', None)
+        timing = f'db;dur={trace.total * 1000:.2f};desc="{trace.count} queries"'
+        existing = response.headers.get('Server-Timing')
+        response.headers['Server-Timing'] = f'{existing}, {timing}' if existing else timing
+
+        record = {
+            'endpoint': request.endpoint,
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'budget': budget,
+        }
+        record.update(trace.as_dict())
+        if budget is not None and trace.count > budget:
+            logger.warning(json.dumps(dict(record, event='query_budget_exceeded')))
+        elif trace.count:
+            logger.info(json.dumps(dict(record, event='sql_trace')))
+
+        for listener in state['listeners']:
+            listener(record)
+        return response
+
+
+@contextmanager
+def assert_query_budget(app, max_queries=None):
+    """Fail with AssertionError if a request made inside the block is over budget.
+
+    Each request is checked against ``max_queries`` if given, otherwise
+    against the budget its view declared with ``@query_budget``. Yields the
+    list of per-request records so tests can inspect them.
+    """
+    records = []
+    listeners = app.extensions['sqltrace']['listeners']
+    listeners.append(records.append)
+    try:
+        yield records
+    finally:
+        listeners.remove(records.append)
+
+    over = []
+    for record in records:
+        budget = record['budget'] if max_queries is None else max_queries
+        if budget is not None and record['queries'] > budget:
+            over.append(f"{record['method']} {record['path']} ({record['endpoint']}): "
+                        f"{record['queries']} queries, budget {budget}")
+    if over:
+        raise AssertionError('Query budget exceeded:\n  ' + '\n  '.join(over))
@@ -0,0 +1,151 @@
+"""
+Relationship loading for list views.
+
+Two tools, both leaving templates untouched:
+
+* Named loading profiles (``LOAD_PROFILES``) describe which relationships a
+  view renders. ``with_profile(query, name)`` turns one into
+  ``joinedload``/``selectinload``/``load_only`` options on the query.
+* ``prime()`` works on a page of objects that is already loaded (for example
+  through ``paginate()``). It collects the keys each relationship needs and
+  resolves them with one ``IN (...)`` query, writing the results straight
+  into the instances' relationship attributes.
+"""
+
+from sqlalchemy import inspect
+from sqlalchemy.orm import joinedload, selectinload
+from sqlalchemy.orm.interfaces import MANYTOONE
+from sqlalchemy.orm.attributes import set_committed_value
+
+from models import db, User, Job, Bid, Payment, Review
+
+# ================== LOADING PROFILES ==================
+
+# Each profile is a callable returning loader options; it is evaluated on
+# use because backref attributes only exist once the mappers are configured.
+LOAD_PROFILES = {
+    # Bid with the bidder's name and profile (bids.html, job-detail.html)
+    'bid_card': lambda: (
+        joinedload(Bid.freelancer).joinedload(User.freelancer_profile),
+    ),
+    # Freelancer's own bid with the job's timeline (my-bids.html)
+    'bid_with_job': lambda: (
+        joinedload(Bid.job).joinedload(Job.work_submission),
+        joinedload(Bid.job).joinedload(Job.payment),
+    ),
+    # Job listing card with the client's name (bid count is a column)
+    'job_card': lambda: (
+        joinedload(Job.client).load_only(User.id, User.name),
+    ),
+    # Everything job-detail.html shows around the job itself
+    'job_page': lambda: (
+        joinedload(Job.client),
+        joinedload(Job.work_submission),
+        joinedload(Job.accepted_bid).joinedload(Bid.freelancer).joinedload(User.freelancer_profile),
+        selectinload(Job.reviews).joinedload(Review.client_reviewer).load_only(User.id, User.name),
+    ),
+    # Transaction row with the job title and both parties' names
+    'payment_row': lambda: (
+        joinedload(Payment.job).load_only(Job.id, Job.title),
+        joinedload(Payment.client).load_only(User.id, User.name),
+        joinedload(Payment.freelancer).load_only(User.id, User.name),
+    ),
+}
+
+
+def register_profile(name, options):
+    """Add or replace a named loading profile (a callable returning options)."""
+    LOAD_PROFILES[name] = options
+
+
+def with_profile(query, name):
+    """Apply the loader options of profile ``name`` to ``query``."""
+    try:
+        options = LOAD_PROFILES[name]
+    except KeyError:
+        raise KeyError(f'Unknown loading profile: {name}') from None
+    return query.options(*options())
+
+
+# ================== BATCH LOADING ==================
+
+
+def load_many(model, keys, key='id', **filters):
+    """Fetch rows of ``model`` whose ``key`` column is in ``keys`` with one query.
+
+    Returns a dict mapping each key to the first matching row.
+    """
+    keys = {k for k in keys if k is not None}
+    if not keys:
+        return {}
+    column = getattr(model, key)
+    found = {}
+    for obj in model.query.filter(column.in_(keys)).filter_by(**filters):
+        found.setdefault(getattr(obj, key), obj)
+    return found
+
+
+def _prime_relationship(instances, name):
+    """Load relationship ``name`` for the instances that have not loaded it yet.
+
+    Returns the distinct related objects of all ``instances``.
+    """
+    pending = [obj for obj in instances if name in inspect(obj).unloaded]
+    if pending:
+        mapper = inspect(type(pending[0]))
+        rel = mapper.relationships[name]
+        if len(rel.local_remote_pairs) != 1:
+            raise ValueError(f'Cannot batch-load composite relationship {mapper.class_.__name__}.{name}')
+        local_col, remote_col = rel.local_remote_pairs[0]
+        target = rel.mapper
+        local_key = mapper.get_property_by_column(local_col).key
+        remote_key = target.get_property_by_column(remote_col).key
+        keys = {getattr(obj, local_key) for obj in pending} - {None}
+
+        if rel.direction is MANYTOONE:
+            by_key = {}
+            missing = set()
+            for k in keys:
+                # Rows already in the identity map need no query
+                cached = None
+                if any(remote_col is col for col in target.primary_key):
+                    cached = db.session.identity_map.get(target.identity_key_from_primary_key([k]))
+                if cached is not None:
+                    by_key[k] = cached
+                else:
+                    missing.add(k)
+            by_key.update(load_many(target.class_, missing, key=remote_key))
+            for obj in pending:
+                set_committed_value(obj, name, by_key.get(getattr(obj, local_key)))
+        else:
+            grouped = {}
+            if keys:
+                for related in target.class_.query.filter(remote_col.in_(keys)):
+                    grouped.setdefault(getattr(related, remote_key), []).append(related)
+            for obj in pending:
+                rows = grouped.get(getattr(obj, local_key), [])
+                set_committed_value(obj, name, rows if rel.uselist else (rows[0] if rows else None))
+
+    related = {}
+    for obj in instances:
+        value = getattr(obj, name)
+        for item in (value if isinstance(value, list) else [value]):
+            if item is not None:
+                related[id(item)] = item
+    return list(related.values())
+
+
+def prime(instances, *paths):
+    """Batch-load relationship ``paths`` (e.g. ``'freelancer.freelancer_profile'``).
+
+    Each segment of each path costs at most one query for the whole list.
+    Returns ``instances`` for convenience.
+    """
+    instances = list(instances)
+    for path in paths:
+        level = instances
+        for name in path.split('.'):
+            if not level:
+                break
+            level = _prime_relationship(level, name)
+    return instances
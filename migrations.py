@@ -0,0 +1,279 @@
+"""
+Versioned schema migrations.
+
+``create_app()`` never touches the database; the schema is created and
+upgraded explicitly with ``flask --app wsgi upgrade-db`` (run once per deploy,
+before the web workers start). Applied versions are recorded in the
+``schema_version`` table.
+
+Each migration is a function taking a Connection, registered in order with
+``@migration(version, description)``. Migrations must be idempotent: a fresh
+database gets the current models from the baseline ``create_all`` and then
+runs every later step, which must find nothing left to do.
+"""
+
+from datetime import datetime
+
+from sqlalchemy import inspect
+
+from models import db, DEFAULT_CURRENCY, JobStatus, BidStatus, PaymentStatus, WorkStatus, Job, Bid, Payment, WorkSubmission, Review, FreelancerProfile, Upload, Blob, StoredFile, Task, IdempotencyKey
+import search
+import stats
+
+schema_version = db.Table(
+    'schema_version', db.metadata,
+    db.Column('version', db.Integer, primary_key=True, autoincrement=False),
+    db.Column('description', db.String(200), nullable=False),
+    db.Column('applied_at', db.DateTime, nullable=False),
+)
+
+MIGRATIONS = []
+
+
+def migration(version, description):
+    """Register the decorated function as schema migration ``version``."""
+    def register(fn):
+        if MIGRATIONS and version <= MIGRATIONS[-1][0]:
+            raise ValueError(f'Migration {version} is out of order')
+        MIGRATIONS.append((version, description, fn))
+        return fn
+    return register
+
+
+def has_column(connection, table, column):
+    return column in {c['name'] for c in inspect(connection).get_columns(table)}
+
+
+def column_type(connection, table, column):
+    return {c['name']: c['type'] for c in inspect(connection).get_columns(table)}[column]
+
+
+def add_column(connection, table, column, ddl):
+    """``ALTER TABLE ... ADD COLUMN`` unless the column already exists."""
+    if not has_column(connection, table, column):
+        connection.exec_driver_sql(f'ALTER TABLE {table} ADD COLUMN {column} {ddl}')
+
+
+# ================== MIGRATIONS ==================
+
+@migration(1, 'Baseline schema')
+def baseline(connection):
+    db.metadata.create_all(connection)
+
+
+@migration(2, 'Denormalized jobs.bid_count')
+def jobs_bid_count(connection):
+    add_column(connection, 'jobs', 'bid_count', 'INTEGER NOT NULL DEFAULT 0')
+    actual = db.select(db.func.count(Bid.id)).where(Bid.job_id == Job.id).scalar_subquery()
+    connection.execute(db.update(Job.__table__).where(Job.bid_count != actual).values(bid_count=actual))
+
+
+@migration(3, 'Listing indexes for keyset pagination')
+def listing_indexes(connection):
+    for table in db.metadata.tables.values():
+        for index in table.indexes:
+            index.create(connection, checkfirst=True)
+
+
+@migration(4, 'Job full-text search index')
+def job_search_index(connection):
+    backend = search.get_backend(connection.dialect.name)
+    backend.install(connection)
+    backend.rebuild(connection)
+
+
+@migration(5, 'updated_at on users, bids, profiles and work submissions')
+def row_update_stamps(connection):
+    for table in ('users', 'bids', 'freelancer_profiles', 'work_submissions'):
+        add_column(connection, table, 'updated_at', 'DATETIME')
+
+
+@migration(6, 'users.session_version')
+def users_session_version(connection):
+    add_column(connection, 'users', 'session_version', 'INTEGER NOT NULL DEFAULT 1')
+
+
+@migration(7, 'Resumable uploads')
+def resumable_uploads(connection):
+    Upload.__table__.create(connection, checkfirst=True)
+
+
+@migration(8, 'Content-addressed upload storage')
+def upload_blobs(connection):
+    for model in (Blob, StoredFile):
+        model.__table__.create(connection, checkfirst=True)
+
+
+@migration(9, 'freelancer_profiles.avatar_source')
+def avatar_source(connection):
+    add_column(connection, 'freelancer_profiles', 'avatar_source', 'VARCHAR(255)')
+
+
+@migration(10, 'Background task queue')
+def task_queue(connection):
+    Task.__table__.create(connection, checkfirst=True)
+
+
+@migration(11, 'Running rating sums and histogram on freelancer_profiles')
+def rating_aggregates(connection):
+    columns = ['rating_sum'] + [f'rating_{stars}' for stars in range(1, 6)]
+    for column in columns:
+        add_column(connection, 'freelancer_profiles', column, 'INTEGER NOT NULL DEFAULT 0')
+
+    profiles = FreelancerProfile.__table__
+    reviews = Review.__table__
+
+    def aggregate(value, *criteria):
+        return db.select(db.func.coalesce(value, 0)).where(
+            reviews.c.freelancer_id == profiles.c.user_id, *criteria).scalar_subquery()
+
+    rating_sum = aggregate(db.func.sum(reviews.c.rating))
+    count = aggregate(db.func.count(reviews.c.id))
+    reviewed = db.exists().where(reviews.c.freelancer_id == profiles.c.user_id)
+    connection.execute(profiles.update().where(reviewed).values(
+        rating_sum=rating_sum, total_reviews=count, avg_rating=rating_sum * 1.0 / count,
+        **{f'rating_{stars}': aggregate(db.func.count(reviews.c.id), reviews.c.rating == stars)
+           for stars in range(1, 6)},
+    ))
+    # Profiles without review rows (seeded data) keep their totals; the
+    # running sum is derived so later reviews average in correctly
+    total = db.func.coalesce(profiles.c.total_reviews, 0)
+    average = db.func.coalesce(profiles.c.avg_rating, 0)
+    connection.execute(profiles.update().where(~reviewed).values(
+        rating_sum=db.cast(db.func.round(average * total), db.Integer), total_reviews=total, avg_rating=average,
+    ))
+
+
+@migration(12, 'One payment per job; idempotency keys')
+def payment_idempotency(connection):
+    index = next(index for index in Payment.__table__.indexes if index.name == 'ix_payments_job_id')
+    existing = {found['name']: found for found in inspect(connection).get_indexes('payments')}
+    if not existing.get(index.name, {}).get('unique'):
+        duplicated = connection.execute(
+            db.select(Payment.job_id).group_by(Payment.job_id).having(db.func.count() > 1).limit(10)
+        ).scalars().all()
+        if duplicated:
+            raise RuntimeError(f'Jobs {duplicated} have more than one payment; resolve them and upgrade again')
+        if index.name in existing:
+            index.drop(connection)
+        index.create(connection)
+    IdempotencyKey.__table__.create(connection, checkfirst=True)
+
+
+@migration(13, 'Money as integer minor units with a currency')
+def money_minor_units(connection):
+    # (table, old float column, new minor-unit column, currency column?)
+    for table, old, new, priced in (
+        ('jobs', 'budget', 'budget_minor', True),
+        ('bids', 'amount', 'amount_minor', True),
+        ('payments', 'amount', 'amount_minor', True),
+        ('user_stats', 'earnings', 'earnings_minor', False),
+        ('user_stats', 'spent', 'spent_minor', False),
+    ):
+        add_column(connection, table, new, 'BIGINT NOT NULL DEFAULT 0')
+        if priced:
+            add_column(connection, table, 'currency', f"VARCHAR(3) NOT NULL DEFAULT '{DEFAULT_CURRENCY}'")
+        if has_column(connection, table, old):
+            # Amounts were entered with at most two decimals, so rounding x * 100 is exact
+            connection.exec_driver_sql(
+                f'UPDATE {table} SET {new} = CAST(ROUND({old} * 100) AS BIGINT) WHERE {old} IS NOT NULL')
+            connection.exec_driver_sql(f'ALTER TABLE {table} DROP COLUMN {old}')
+
+
+@migration(14, 'Statuses as small integer codes; partial status indexes')
+def status_codes(connection):
+    connection.exec_driver_sql('DROP INDEX IF EXISTS ix_jobs_status_created')
+    for model, statuses in ((Job, JobStatus), (Bid, BidStatus), (Payment, PaymentStatus), (WorkSubmission, WorkStatus)):
+        table = model.__tablename__
+        # Partial indexes name the status column in their WHERE clause
+        indexes = [index for index in model.__table__.indexes
+                   if 'status' in index.columns or index.dialect_options['sqlite']['where'] is not None]
+        if isinstance(column_type(connection, table, 'status'), db.String):
+            for index in indexes:
+                index.drop(connection, checkfirst=True)
+            names = ', '.join(f"'{status.value}'" for status in statuses)
+            unknown = connection.exec_driver_sql(
+                f'SELECT DISTINCT status FROM {table} WHERE status NOT IN ({names})').scalars().all()
+            if unknown:
+                raise RuntimeError(f'{table}.status has unknown values {unknown}; fix them and rerun upgrade-db')
+            default = model.__table__.c.status.default.arg
+            cases = ' '.join(f"WHEN '{status.value}' THEN {status.code}" for status in statuses)
+            add_column(connection, table, 'status_code', f'SMALLINT NOT NULL DEFAULT {default.code}')
+            connection.exec_driver_sql(f'UPDATE {table} SET status_code = CASE status {cases} ELSE {default.code} END')
+            connection.exec_driver_sql(f'ALTER TABLE {table} DROP COLUMN status')
+            connection.exec_driver_sql(f'ALTER TABLE {table} RENAME COLUMN status_code TO status')
+        for index in indexes:
+            index.create(connection, checkfirst=True)
+
+
+@migration(15, 'Populate user_stats')
+def populate_user_stats(connection):
+    # Databases upgraded past the counters' introduction never got them filled in
+    stats.rebuild(connection)
+
+
+@migration(16, 'Seeded rating baselines on freelancer_profiles')
+def seeded_ratings(connection):
+    for column in stats.SEEDED_COLUMNS:
+        add_column(connection, 'freelancer_profiles', column, 'INTEGER NOT NULL DEFAULT 0')
+
+    profiles = FreelancerProfile.__table__
+    reviews = Review.__table__
+
+    def aggregate(value, *criteria):
+        return db.select(db.func.coalesce(value, 0)).where(
+            reviews.c.freelancer_id == profiles.c.user_id, *criteria).scalar_subquery()
+
+    def surplus(stored, reviewed):
+        # Whatever the stored total holds beyond the review rows is seeded
+        extra = db.func.coalesce(stored, 0) - reviewed
+        return db.case((extra > 0, extra), else_=0)
+
+    reviewed = [aggregate(db.func.sum(reviews.c.rating)), aggregate(db.func.count(reviews.c.id))] + [
+        aggregate(db.func.count(reviews.c.id), reviews.c.rating == stars) for stars in stats.STARS]
+    connection.execute(profiles.update().values({
+        profiles.c[seeded]: surplus(profiles.c[name], count)
+        for seeded, name, count in zip(stats.SEEDED_COLUMNS, stats.RATING_COLUMNS, reviewed)
+    }))
+    # Migration 11 kept the seeded average beside a rounded rating_sum; from
+    # here on the average is always rating_sum / total_reviews
+    connection.execute(profiles.update().where(profiles.c.total_reviews > 0).values(
+        avg_rating=profiles.c.rating_sum * 1.0 / profiles.c.total_reviews))
+
+
+# ================== RUNNER ==================
+
+def head():
+    return MIGRATIONS[-1][0] if MIGRATIONS else 0
+
+
+def current_version(connection):
+    """Highest applied migration, or 0 for an unversioned database."""
+    if not inspect(connection).has_table('schema_version'):
+        return 0
+    return connection.execute(db.select(db.func.max(schema_version.c.version))).scalar() or 0
+
+
+def pending(connection):
+    version = current_version(connection)
+    return [m for m in MIGRATIONS if m[0] > version]
+
+
+def upgrade(engine=None):
+    """Apply every pending migration, each in its own transaction.
+
+    Returns the list of ``(version, description)`` applied.
+    """
+    engine = engine or db.engine
+    with engine.begin() as connection:
+        schema_version.create(connection, checkfirst=True)
+        todo = pending(connection)
+
+    applied = []
+    for version, description, fn in todo:
+        with engine.begin() as connection:
+            fn(connection)
+            connection.execute(schema_version.insert().values(
+                version=version, description=description, applied_at=datetime.utcnow()))
+        applied.append((version, description))
+    return applied
@@ -1,10 +1,234 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.orm import validates
+from sqlalchemy.types import TypeDecorator
 from flask_login import UserMixin
-from werkzeug.security import generate_password_hash, check_password_hash
+import passwords
 from datetime import datetime
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+import enum
+from functools import total_ordering
 
 db = SQLAlchemy()
 
+DEFAULT_CURRENCY = 'INR'
+# Digits after the decimal point where a currency does not use two (ISO 4217)
+CURRENCY_EXPONENTS = {'JPY': 0, 'KRW': 0, 'BHD': 3, 'KWD': 3}
+# Largest amount a BigInteger minor-unit column can hold
+MAX_MINOR = 2 ** 63 - 1
+
+
+@total_ordering
+class Money:
+    """Exact amount of money: a whole number of minor units (paise, cents) in ``currency``.
+
+    Mapped with ``db.composite`` onto a ``*_minor`` BigInteger column and a
+    ``currency`` column, so sums in SQL are exact integer sums. ``float()``
+    is for display only.
+    """
+    __slots__ = ('minor', 'currency')
+
+    def __init__(self, minor, currency=DEFAULT_CURRENCY):
+        self.minor = minor if minor is None else int(minor)
+        self.currency = currency
+
+    @staticmethod
+    def exponent(currency):
+        return CURRENCY_EXPONENTS.get(currency, 2)
+
+    @classmethod
+    def from_major(cls, value, currency=DEFAULT_CURRENCY):
+        """Money for ``value`` in major units (rupees), rounded half-up to the minor unit."""
+        exponent = cls.exponent(currency)
+        amount = Decimal(str(value)).quantize(Decimal(1).scaleb(-exponent), rounding=ROUND_HALF_UP)
+        return cls(amount.scaleb(exponent), currency)
+
+    @classmethod
+    def parse(cls, text, currency=DEFAULT_CURRENCY):
+        """Positive Money from user input such as ``'1500.50'``, or None if it is not one.
+
+        Amounts that would not fit the BIGINT ``*_minor`` columns are rejected too.
+        """
+        try:
+            value = Decimal(str(text).strip())
+            if not value.is_finite() or value <= 0:
+                return None
+            money = cls.from_major(value, currency)
+        except InvalidOperation:
+            # Too many digits to quantize
+            return None
+        return money if 0 < money.minor <= MAX_MINOR else None
+
+    @property
+    def amount(self):
+        """Major units as an exact Decimal"""
+        return Decimal(self.minor).scaleb(-self.exponent(self.currency))
+
+    def __composite_values__(self):
+        return self.minor, self.currency
+
+    def __float__(self):
+        return float(self.amount)
+
+    def __bool__(self):
+        return bool(self.minor)
+
+    def _same_currency(self, other):
+        if other.currency != self.currency:
+            raise ValueError(f'Cannot combine {self.currency} with {other.currency}')
+
+    def __add__(self, other):
+        if not isinstance(other, Money):
+            return NotImplemented
+        self._same_currency(other)
+        return Money(self.minor + other.minor, self.currency)
+
+    def __radd__(self, other):
+        # sum() starts from 0
+        return self if other == 0 else self.__add__(other)
+
+    def __sub__(self, other):
+        if not isinstance(other, Money):
+            return NotImplemented
+        self._same_currency(other)
+        return Money(self.minor - other.minor, self.currency)
+
+    def __neg__(self):
+        return Money(-self.minor, self.currency)
+
+    def __mul__(self, factor):
+        if isinstance(factor, int):
+            return Money(self.minor * factor, self.currency)
+        if isinstance(factor, (float, Decimal)):
+            return Money.from_major(self.amount * Decimal(str(factor)), self.currency)
+        return NotImplemented
+
+    __rmul__ = __mul__
+
+    def __eq__(self, other):
+        return isinstance(other, Money) and (self.minor, self.currency) == (other.minor, other.currency)
+
+    def __lt__(self, other):
+        if not isinstance(other, Money):
+            return NotImplemented
+        self._same_currency(other)
+        return self.minor < other.minor
+
+    def __hash__(self):
+        return hash((self.minor, self.currency))
+
+    def __str__(self):
+        return f'{self.amount:,} {self.currency}'
+
+    def __repr__(self):
+        return f'Money({self.minor}, {self.currency!r})'
+
+
+class Status(str, enum.Enum):
+    """Base for the status of a job, bid, payment or work submission.
+
+    Members compare equal to and render as their string value, so code and
+    templates keep writing ``'open'``. In the database they are the small
+    integer ``code`` (see ``StatusType``). ``moves`` are the statuses a row
+    may change to next; anything else is rejected by ``check`` on attribute
+    assignment, and bulk UPDATEs match only ``sources()`` of their target.
+    """
+
+    def __new__(cls, value, code, moves=()):
+        member = str.__new__(cls, value)
+        member._value_ = value
+        member.code = code
+        member.moves = frozenset(moves)
+        return member
+
+    __hash__ = str.__hash__
+
+    def __str__(self):
+        return self.value
+
+    @classmethod
+    def parse(cls, text):
+        """The member for ``text`` (e.g. a query string filter), or None"""
+        try:
+            return cls(text)
+        except ValueError:
+            return None
+
+    @classmethod
+    def from_code(cls, code):
+        for member in cls:
+            if member.code == code:
+                return member
+        raise ValueError(f'{code!r} is not a {cls.__name__} code')
+
+    @classmethod
+    def check(cls, current, new):
+        """``new`` as a member if a row in ``current`` may change to it, else ValueError"""
+        new = cls(new)
+        if current is not None and new != current and new.value not in cls(current).moves:
+            raise ValueError(f'{cls.__name__} cannot change from {current} to {new}')
+        return new
+
+    @classmethod
+    def sources(cls, target, *among):
+        """Members a row may change to ``target`` from (only those in ``among``, if given).
+
+        Bulk UPDATEs skip ``check``, so they guard with
+        ``status.in_(Status.sources(target))`` to follow the same ``moves``.
+        """
+        target = cls(target)
+        return tuple(member for member in cls
+                     if target.value in member.moves and (not among or member in among))
+
+
+class JobStatus(Status):
+    OPEN = 'open', 1, ('in_progress', 'cancelled')
+    IN_PROGRESS = 'in_progress', 2, ('awaiting_payment', 'completed')
+    AWAITING_PAYMENT = 'awaiting_payment', 3, ('completed',)
+    COMPLETED = 'completed', 4
+    CANCELLED = 'cancelled', 5
+
+
+class BidStatus(Status):
+    PENDING = 'pending', 1, ('accepted', 'rejected')
+    ACCEPTED = 'accepted', 2
+    REJECTED = 'rejected', 3
+
+
+class PaymentStatus(Status):
+    PENDING = 'pending', 1, ('paid',)
+    PAID = 'paid', 2, ('released',)
+    RELEASED = 'released', 3
+
+
+class WorkStatus(Status):
+    SUBMITTED = 'submitted', 1, ('approved', 'rejected')
+    APPROVED = 'approved', 2
+    REJECTED = 'rejected', 3, ('submitted', 'approved')
+
+
+class StatusType(TypeDecorator):
+    """A ``Status`` enum stored as its SmallInteger code; accepts members or their strings."""
+    impl = db.SmallInteger
+    cache_ok = True
+
+    def __init__(self, enum_class):
+        super().__init__()
+        self.enum_class = enum_class
+
+    def process_bind_param(self, value, dialect):
+        return None if value is None else self.enum_class(value).code
+
+    def process_result_value(self, value, dialect):
+        return None if value is None else self.enum_class.from_code(value)
+
+
+def status_is(status):
+    """Partial index options: only rows in ``status`` (SQLite and PostgreSQL)."""
+    predicate = db.column('status') == status.code
+    return {'sqlite_where': predicate, 'postgresql_where': predicate}
+
+
 class User(UserMixin, db.Model):
     """User model for both clients and freelancers"""
     __tablename__ = 'users'
@@ -14,7 +238,9 @@ class User(UserMixin, db.Model):
     email = db.Column(db.String(120), unique=True, nullable=False, index=True)
     password_hash = db.Column(db.String(255), nullable=False)
     role = db.Column(db.String(20), nullable=False)  # 'client' or 'freelancer'
+    session_version = db.Column(db.Integer, nullable=False, default=1, server_default='1')  # bumped to revoke sessions
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Relationships
     freelancer_profile = db.relationship('FreelancerProfile', uselist=False, backref='user', cascade='all, delete-orphan')
@@ -25,13 +251,25 @@ class User(UserMixin, db.Model):
     reviews_given = db.relationship('Review', foreign_keys='Review.client_id', backref='client_reviewer')
     reviews_received = db.relationship('Review', foreign_keys='Review.freelancer_id', backref='freelancer_reviewed')
     
+    def get_id(self):
+        """Session id for Flask-Login: the user id plus the session version"""
+        return f'{self.id}:{self.session_version or 1}'
+    
+    def revoke_sessions(self):
+        """Invalidate every existing login, e.g. after a password change"""
+        self.session_version = (self.session_version or 1) + 1
+        # Drop this worker's cached copy on commit (see user_cache.py)
+        session = db.session.object_session(self)
+        if session is not None:
+            session.info.setdefault('dirty_users', set()).add(self.id)
+    
     def set_password(self, password):
-        """Hash and set password"""
-        self.password_hash = generate_password_hash(password, method='pbkdf2:sha256')
+        """Hash and set password (PASSWORD_HASH_METHOD, on the hashing pool)"""
+        self.password_hash = passwords.hash_password(password)
     
     def check_password(self, password):
         """Check password"""
-        return check_password_hash(self.password_hash, password)
+        return passwords.verify_password(self.password_hash, password)
     
     def is_freelancer(self):
         return self.role == 'freelancer'
@@ -53,9 +291,32 @@ class FreelancerProfile(db.Model):
     skills = db.Column(db.String(500))  # comma-separated
     portfolio_link = db.Column(db.String(255))
     profile_image = db.Column(db.String(255))  # filename
-    avg_rating = db.Column(db.Float, default=0)
+    avatar_source = db.Column(db.String(255))  # profile_image the avatar variants were made from
+    avg_rating = db.Column(db.Float, default=0)  # rating_sum / total_reviews
     total_reviews = db.Column(db.Integer, default=0)
+    rating_sum = db.Column(db.Integer, nullable=False, default=0)  # running sum of review ratings
+    # Histogram: number of reviews with each star rating
+    rating_1 = db.Column(db.Integer, nullable=False, default=0)
+    rating_2 = db.Column(db.Integer, nullable=False, default=0)
+    rating_3 = db.Column(db.Integer, nullable=False, default=0)
+    rating_4 = db.Column(db.Integer, nullable=False, default=0)
+    rating_5 = db.Column(db.Integer, nullable=False, default=0)
+    # Reviews carried over without rows in the reviews table (seeded or legacy
+    # data). The aggregates above are always these plus the reviews table.
+    seeded_count = db.Column(db.Integer, nullable=False, default=0)
+    seeded_sum = db.Column(db.Integer, nullable=False, default=0)
+    seeded_1 = db.Column(db.Integer, nullable=False, default=0)
+    seeded_2 = db.Column(db.Integer, nullable=False, default=0)
+    seeded_3 = db.Column(db.Integer, nullable=False, default=0)
+    seeded_4 = db.Column(db.Integer, nullable=False, default=0)
+    seeded_5 = db.Column(db.Integer, nullable=False, default=0)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    @property
+    def rating_histogram(self):
+        """{stars: review count}, five stars first"""
+        return {stars: getattr(self, f'rating_{stars}') or 0 for stars in range(5, 0, -1)}
     
     def __repr__(self):
         return f'<FreelancerProfile {self.user_id}>'
@@ -64,16 +325,24 @@ class FreelancerProfile(db.Model):
 class Job(db.Model):
     """Job postings by clients"""
     __tablename__ = 'jobs'
+    __table_args__ = (
+        # Keyset pagination / newest-first listings
+        db.Index('ix_jobs_open_created', 'created_at', 'id', **status_is(JobStatus.OPEN)),
+        db.Index('ix_jobs_client_created', 'client_id', 'created_at', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     client_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
     title = db.Column(db.String(200), nullable=False)
     description = db.Column(db.Text, nullable=False)
-    budget = db.Column(db.Float, nullable=False)
+    budget_minor = db.Column(db.BigInteger, nullable=False)
+    currency = db.Column(db.String(3), nullable=False, default=DEFAULT_CURRENCY)
+    budget = db.composite(Money, budget_minor, currency)
     category = db.Column(db.String(50), nullable=False)  # web, mobile, design, writing, etc
     deadline = db.Column(db.DateTime, nullable=False)
-    status = db.Column(db.String(20), default='open')  # open, in_progress, completed, cancelled
+    status = db.Column(StatusType(JobStatus), nullable=False, default=JobStatus.OPEN)
     accepted_bid_id = db.Column(db.Integer, db.ForeignKey('bids.id'), nullable=True)
+    bid_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # maintained by Bid insert/delete events
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -84,6 +353,10 @@ class Job(db.Model):
     work_submission = db.relationship('WorkSubmission', uselist=False, backref='job', cascade='all, delete-orphan')
     reviews = db.relationship('Review', backref='job', cascade='all, delete-orphan')
     
+    @validates('status')
+    def _validate_status(self, key, status):
+        return JobStatus.check(self.status, status)
+
     def __repr__(self):
         return f'<Job {self.title}>'
 
@@ -91,34 +364,71 @@ class Job(db.Model):
 class Bid(db.Model):
     """Bids placed by freelancers on jobs"""
     __tablename__ = 'bids'
+    __table_args__ = (
+        db.Index('ix_bids_freelancer_created', 'freelancer_id', 'created_at', 'id'),
+        db.Index('ix_bids_freelancer_accepted', 'freelancer_id', **status_is(BidStatus.ACCEPTED)),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     job_id = db.Column(db.Integer, db.ForeignKey('jobs.id'), nullable=False, index=True)
     freelancer_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
-    amount = db.Column(db.Float, nullable=False)
+    amount_minor = db.Column(db.BigInteger, nullable=False)
+    currency = db.Column(db.String(3), nullable=False, default=DEFAULT_CURRENCY)
+    amount = db.composite(Money, amount_minor, currency)
     proposal = db.Column(db.Text, nullable=False)
     delivery_days = db.Column(db.Integer)
-    status = db.Column(db.String(20), default='pending')  # pending, accepted, rejected
+    status = db.Column(StatusType(BidStatus), nullable=False, default=BidStatus.PENDING)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    @validates('status')
+    def _validate_status(self, key, status):
+        return BidStatus.check(self.status, status)
+
     def __repr__(self):
         return f'<Bid job_id={self.job_id} freelancer_id={self.freelancer_id}>'
 
 
+def _adjust_bid_count(connection, job_id, delta):
+    """Atomically add delta to jobs.bid_count inside the flushing transaction"""
+    jobs = Job.__table__
+    connection.execute(jobs.update().where(jobs.c.id == job_id).values(bid_count=jobs.c.bid_count + delta))
+
+
+@event.listens_for(Bid, 'after_insert')
+def _bid_inserted(mapper, connection, target):
+    _adjust_bid_count(connection, target.job_id, 1)
+
+
+@event.listens_for(Bid, 'after_delete')
+def _bid_deleted(mapper, connection, target):
+    _adjust_bid_count(connection, target.job_id, -1)
+
+
 class Payment(db.Model):
     """Payment records"""
     __tablename__ = 'payments'
+    __table_args__ = (
+        db.Index('ix_payments_client_created', 'client_id', 'created_at', 'id'),
+        db.Index('ix_payments_freelancer_created', 'freelancer_id', 'created_at', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
-    job_id = db.Column(db.Integer, db.ForeignKey('jobs.id'), nullable=False, index=True)
+    job_id = db.Column(db.Integer, db.ForeignKey('jobs.id'), nullable=False, index=True, unique=True)  # one payment per job
     client_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
     freelancer_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
-    amount = db.Column(db.Float, nullable=False)
-    status = db.Column(db.String(20), default='pending')  # pending, paid, released
+    amount_minor = db.Column(db.BigInteger, nullable=False)
+    currency = db.Column(db.String(3), nullable=False, default=DEFAULT_CURRENCY)
+    amount = db.composite(Money, amount_minor, currency)
+    status = db.Column(StatusType(PaymentStatus), nullable=False, default=PaymentStatus.PENDING)  # moved by payments.py
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     paid_at = db.Column(db.DateTime)
     released_at = db.Column(db.DateTime)
     
+    @validates('status')
+    def _validate_status(self, key, status):
+        return PaymentStatus.check(self.status, status)
+
     def __repr__(self):
         return f'<Payment job_id={self.job_id}>'
 
@@ -131,13 +441,39 @@ class WorkSubmission(db.Model):
     job_id = db.Column(db.Integer, db.ForeignKey('jobs.id'), nullable=False, index=True, unique=True)
     file_path = db.Column(db.String(255), nullable=False)  # file path
     description = db.Column(db.Text)
-    status = db.Column(db.String(20), default='submitted')  # submitted, approved, rejected
+    status = db.Column(StatusType(WorkStatus), nullable=False, default=WorkStatus.SUBMITTED)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    @validates('status')
+    def _validate_status(self, key, status):
+        return WorkStatus.check(self.status, status)
+
     def __repr__(self):
         return f'<WorkSubmission job_id={self.job_id}>'
 
 
+class Upload(db.Model):
+    """Resumable chunked upload of a work file; attached to the job's WorkSubmission when complete"""
+    __tablename__ = 'uploads'
+    
+    id = db.Column(db.String(32), primary_key=True)  # random hex token
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    job_id = db.Column(db.Integer, db.ForeignKey('jobs.id'), nullable=False, index=True)
+    filename = db.Column(db.String(255), nullable=False)  # client's original name
+    description = db.Column(db.Text)
+    size = db.Column(db.BigInteger, nullable=False)  # declared total bytes
+    offset = db.Column(db.BigInteger, nullable=False, default=0)  # bytes received so far
+    sha256 = db.Column(db.String(64))  # set on completion
+    stored_name = db.Column(db.String(255))  # file under UPLOAD_FOLDER once complete
+    status = db.Column(db.String(20), nullable=False, default='uploading')  # uploading, complete
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<Upload {self.id} {self.offset}/{self.size}>'
+
+
 class Review(db.Model):
     """Reviews and ratings"""
     __tablename__ = 'reviews'
@@ -152,3 +488,103 @@ class Review(db.Model):
     
     def __repr__(self):
         return f'<Review job_id={self.job_id}>'
+
+
+class UserStats(db.Model):
+    """Denormalized dashboard counters, maintained alongside the writes that change them"""
+    __tablename__ = 'user_stats'
+    
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    # freelancer counters
+    bids_count = db.Column(db.Integer, nullable=False, default=0)
+    accepted_bids = db.Column(db.Integer, nullable=False, default=0)
+    earnings_minor = db.Column(db.BigInteger, nullable=False, default=0)  # in DEFAULT_CURRENCY
+    # client counters
+    jobs_count = db.Column(db.Integer, nullable=False, default=0)
+    open_jobs = db.Column(db.Integer, nullable=False, default=0)
+    spent_minor = db.Column(db.BigInteger, nullable=False, default=0)  # in DEFAULT_CURRENCY
+    hired_freelancers_count = db.Column(db.Integer, nullable=False, default=0)
+    
+    @property
+    def earnings(self):
+        return Money(self.earnings_minor or 0)
+    
+    @property
+    def spent(self):
+        return Money(self.spent_minor or 0)
+    
+    def __repr__(self):
+        return f'<UserStats {self.user_id}>'
+
+
+class Blob(db.Model):
+    """Content-addressed file body under UPLOAD_FOLDER/blobs, shared by every StoredFile with the same SHA-256"""
+    __tablename__ = 'blobs'
+    
+    sha256 = db.Column(db.String(64), primary_key=True)
+    size = db.Column(db.BigInteger, nullable=False)
+    refcount = db.Column(db.Integer, nullable=False, default=0)  # StoredFile rows pointing here
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<Blob {self.sha256[:12]} refs={self.refcount}>'
+
+
+class StoredFile(db.Model):
+    """Logical upload name (as kept in file_path / profile_image) mapped to its blob"""
+    __tablename__ = 'stored_files'
+    
+    name = db.Column(db.String(255), primary_key=True)
+    sha256 = db.Column(db.String(64), db.ForeignKey('blobs.sha256'), nullable=False, index=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    blob = db.relationship('Blob')
+    
+    def __repr__(self):
+        return f'<StoredFile {self.name}>'
+
+
+class Task(db.Model):
+    """Background task queued by a request and run by a worker (tasks.py)"""
+    __tablename__ = 'tasks'
+    __table_args__ = (
+        db.Index('ix_tasks_status_run_at', 'status', 'run_at'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)  # registered handler
+    payload = db.Column(db.Text, nullable=False, default='{}')  # JSON keyword arguments
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, done, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=5)
+    run_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)  # not before
+    lease = db.Column(db.String(32))  # token of the worker that claimed it
+    locked_until = db.Column(db.DateTime)  # visibility timeout of the current claim
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    
+    def __repr__(self):
+        return f'<Task {self.id} {self.name} {self.status}>'
+
+
+class IdempotencyKey(db.Model):
+    """First response to a POST carrying an Idempotency-Key, replayed for retries (idempotency.py)"""
+    __tablename__ = 'idempotency_keys'
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'key', name='uq_idempotency_keys_user_key'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    key = db.Column(db.String(64), nullable=False)
+    request_path = db.Column(db.String(255), nullable=False)
+    status_code = db.Column(db.Integer)  # None while the first request is still running
+    location = db.Column(db.String(500))
+    body = db.Column(db.Text)
+    content_type = db.Column(db.String(100))
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+    
+    def __repr__(self):
+        return f'<IdempotencyKey {self.user_id}:{self.key}>'
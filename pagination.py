@@ -0,0 +1,89 @@
+"""
+Keyset (cursor) pagination for listings ordered newest first.
+
+Instead of ``COUNT(*)`` plus ``OFFSET``, each page is fetched with a
+``WHERE (created_at, id) < cursor`` range on the ordering key, so page 500
+costs the same as page 1. Cursors are opaque URL-safe tokens; there is no
+total count and no jumping to an arbitrary page number.
+"""
+
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from flask import current_app, request
+
+
+class KeysetPage:
+    """One page of a keyset-paginated query"""
+    cursor_mode = True
+    total = None
+
+    def __init__(self, items, next_cursor=None, prev_cursor=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+
+def encode_cursor(item, direction):
+    """Opaque token pointing just past ``item`` in ``direction`` ('next' or 'prev')."""
+    payload = json.dumps([direction, item.created_at.isoformat(), item.id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Return ``(direction, created_at, id)``, or None if the token is malformed."""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        direction, created_at, item_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if direction not in ('next', 'prev'):
+            return None
+        return direction, datetime.fromisoformat(created_at), int(item_id)
+    except (ValueError, TypeError, binascii.Error):
+        return None
+
+
+def wants_keyset():
+    """True if this request should use cursor pagination."""
+    return current_app.config.get('KEYSET_PAGINATION', False) or 'cursor' in request.args
+
+
+def keyset_paginate(query, model, cursor=None, per_page=10):
+    """Paginate ``query`` (unordered) newest first by ``(created_at, id)``."""
+    created_at, item_id = model.created_at, model.id
+    position = decode_cursor(cursor) if cursor else None
+
+    if position is None:
+        direction = 'next'
+    else:
+        direction, at, after_id = position
+        if direction == 'next':
+            query = query.filter((created_at < at) | ((created_at == at) & (item_id < after_id)))
+        else:
+            query = query.filter((created_at > at) | ((created_at == at) & (item_id > after_id)))
+
+    if direction == 'next':
+        rows = query.order_by(created_at.desc(), item_id.desc()).limit(per_page + 1).all()
+        more = len(rows) > per_page
+        items = rows[:per_page]
+        has_next, has_prev = more, position is not None
+    else:
+        rows = query.order_by(created_at.asc(), item_id.asc()).limit(per_page + 1).all()
+        more = len(rows) > per_page
+        items = list(reversed(rows[:per_page]))
+        has_next, has_prev = True, more
+
+    return KeysetPage(
+        items,
+        next_cursor=encode_cursor(items[-1], 'next') if has_next and items else None,
+        prev_cursor=encode_cursor(items[0], 'prev') if has_prev and items else None,
+    )
@@ -0,0 +1,108 @@
+"""
+Password hashing off the request thread.
+
+Hashes are computed on a bounded thread pool (``PASSWORD_HASH_WORKERS``
+threads, at most ``PASSWORD_HASH_QUEUE`` jobs waiting). hashlib releases the
+GIL while deriving keys, so the pool hashes in parallel without starving the
+threads serving other pages. When the queue is full ``HashingBusy`` is raised
+straight away instead of piling up work during a login storm.
+
+The bound is per process, so it only protects a process that serves more
+requests at once than the pool admits: gunicorn runs ``gthread`` workers with
+``WEB_THREADS`` threads (Procfile). The queue defaults to the worker count, so
+at most twice as many threads as cores are tied up hashing.
+
+The cost comes from ``PASSWORD_HASH_METHOD`` (any werkzeug method string,
+e.g. ``pbkdf2:sha256:600000`` or ``scrypt:32768:8:1``). ``needs_rehash()``
+tells the login view when a stored hash was made with a different method.
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app, has_app_context
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, check_password_hash, generate_password_hash
+
+DEFAULT_METHOD = f'pbkdf2:sha256:{DEFAULT_PBKDF2_ITERATIONS}'
+
+
+class HashingBusy(Exception):
+    """Raised when the hashing queue is full"""
+
+
+class HashPool:
+    """Thread pool that refuses work beyond a fixed backlog"""
+
+    def __init__(self, workers, queue):
+        self.workers = workers
+        self.queue = queue
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='pwhash')
+        self._slots = threading.BoundedSemaphore(workers + queue)
+        self.rejected = 0
+
+    def run(self, fn, *args, timeout=None):
+        """Run ``fn(*args)`` on the pool and wait for the result."""
+        if not self._slots.acquire(blocking=False):
+            self.rejected += 1
+            raise HashingBusy()
+        try:
+            future = self._executor.submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future.result(timeout=timeout)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _config(name, default):
+    return current_app.config.get(name, default) if has_app_context() else default
+
+
+def get_pool():
+    """The process-wide pool, created on first use (after any gunicorn fork)."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            workers = _config('PASSWORD_HASH_WORKERS', None) or os.cpu_count() or 1
+            _pool = HashPool(workers, _config('PASSWORD_HASH_QUEUE', None) or workers)
+        return _pool
+
+
+def configured_method():
+    return _config('PASSWORD_HASH_METHOD', None) or DEFAULT_METHOD
+
+
+def normalize_method(method):
+    """Spell out werkzeug's implicit parameters so methods compare reliably."""
+    parts = method.split(':')
+    if parts[0] == 'pbkdf2':
+        if len(parts) == 1:
+            parts.append('sha256')
+        if len(parts) == 2:
+            parts.append(str(DEFAULT_PBKDF2_ITERATIONS))
+    elif parts == ['scrypt']:
+        parts = ['scrypt', '32768', '8', '1']
+    return ':'.join(parts)
+
+
+def hash_password(password):
+    """Hash ``password`` with the configured method on the pool."""
+    return get_pool().run(generate_password_hash, password, configured_method())
+
+
+def verify_password(pwhash, password):
+    """Check ``password`` against ``pwhash`` on the pool."""
+    return get_pool().run(check_password_hash, pwhash, password)
+
+
+def needs_rehash(pwhash):
+    """True if ``pwhash`` was not made with the configured method."""
+    return normalize_method(pwhash.split('$', 1)[0]) != normalize_method(configured_method())
@@ -0,0 +1,66 @@
+"""
+Payment state machine.
+
+A payment only moves forward: ``pending`` -> ``paid`` -> ``released``
+(``PaymentStatus.moves``). Each move is a single conditional ``UPDATE ...
+WHERE status = <previous>``, so a double-click, a proxy retry or a second
+tab cannot apply it twice (or rewrite ``paid_at``): one request moves the
+payment and the others find it has already moved. The dashboard counters in
+``user_stats`` are bumped by the request that wins, in the same transaction.
+"""
+
+from datetime import datetime
+
+from sqlalchemy.exc import IntegrityError
+
+from models import db, Payment, PaymentStatus, DEFAULT_CURRENCY
+import stats
+
+TIMESTAMPS = {
+    'paid': 'paid_at',
+    'released': 'released_at',
+}
+
+
+def transition(payment, status):
+    """Move ``payment`` to ``status`` if it is still in the state that leads there.
+
+    Returns True if this call made the move. Not committed; rides on the
+    caller's transaction.
+    """
+    # PaymentStatus.moves is a straight line, so each status has one source
+    source, = PaymentStatus.sources(status)
+    values = {'status': status}
+    if status in TIMESTAMPS:
+        values[TIMESTAMPS[status]] = datetime.utcnow()
+    moved = db.session.execute(
+        db.update(Payment).where(Payment.id == payment.id, Payment.status == source)
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if not moved:
+        return False
+
+    # The dashboard counters are kept in the default currency only
+    if payment.currency == DEFAULT_CURRENCY:
+        earned = (status in stats.EARNED_STATUSES) - (source in stats.EARNED_STATUSES)
+        spent = (status in stats.SPENT_STATUSES) - (source in stats.SPENT_STATUSES)
+        stats.bump(payment.freelancer_id, earnings_minor=earned * payment.amount_minor)
+        stats.bump(payment.client_id, spent_minor=spent * payment.amount_minor)
+    db.session.expire(payment)
+    return True
+
+
+def ensure_payment(job, bid):
+    """The job's payment, created as ``pending`` for the accepted ``bid`` if it has none."""
+    if job.payment is not None:
+        return job.payment
+    payment = Payment(job_id=job.id, client_id=job.client_id, freelancer_id=bid.freelancer_id,
+                      amount=bid.amount, status='pending')
+    try:
+        with db.session.begin_nested():
+            db.session.add(payment)
+    except IntegrityError:
+        # A concurrent request created it first (payments.job_id is unique)
+        payment = Payment.query.filter_by(job_id=job.id).one()
+    return payment
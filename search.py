@@ -0,0 +1,170 @@
+"""
+Full-text search over job titles and descriptions.
+
+The backend is chosen from the database dialect (or ``SEARCH_BACKEND``):
+
+* ``fts5`` — SQLite FTS5 external-content table ``jobs_fts``, kept in sync
+  with ``jobs`` by triggers, ranked with ``bm25()``.
+* ``postgres`` — GIN expression index over ``to_tsvector()``, ranked with
+  ``ts_rank()``.
+* ``like`` — the original ``ILIKE '%term%'`` scan, unranked.
+
+Every backend's ``install()`` is idempotent. It runs automatically when the
+``jobs`` table is created and can be re-run with ``flask search-reindex``.
+"""
+
+import re
+
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import Join
+
+from models import db, Job
+
+TITLE_WEIGHT = 10.0
+DESCRIPTION_WEIGHT = 1.0
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def tokenize(text):
+    """Split user input into search terms, dropping punctuation and operators."""
+    return _TOKEN_RE.findall(text or '')
+
+
+class SearchBackend:
+    """Unranked substring search; also the base class for real backends"""
+    name = 'like'
+
+    def install(self, connection):
+        """Create whatever index structures the backend needs."""
+
+    def rebuild(self, connection):
+        """Re-index every job from the jobs table."""
+
+    def apply(self, query, text):
+        """Filter ``query`` to jobs matching ``text``, best matches first."""
+        for term in tokenize(text):
+            pattern = f'%{term}%'
+            query = query.filter(Job.title.ilike(pattern) | Job.description.ilike(pattern))
+        return query.order_by(Job.created_at.desc())
+
+
+class CrossJoin(Join):
+    """Inner join that SQLite must run left table first (spelled ``CROSS JOIN``)"""
+    inherit_cache = True
+
+
+@compiles(CrossJoin)
+def _compile_cross_join(join, compiler, **kw):
+    kw['asfrom'] = True
+    return (f'{compiler.process(join.left, **kw)} CROSS JOIN {compiler.process(join.right, **kw)} '
+            f'ON {compiler.process(join.onclause, **kw)}')
+
+
+class SQLiteFTS5Backend(SearchBackend):
+    """SQLite FTS5 external-content index ranked by bm25"""
+    name = 'fts5'
+
+    DDL = (
+        "CREATE VIRTUAL TABLE IF NOT EXISTS jobs_fts USING fts5("
+        "title, description, content='jobs', content_rowid='id', tokenize='porter unicode61')",
+        "CREATE TRIGGER IF NOT EXISTS jobs_fts_ai AFTER INSERT ON jobs BEGIN "
+        "INSERT INTO jobs_fts(rowid, title, description) VALUES (new.id, new.title, new.description); END",
+        "CREATE TRIGGER IF NOT EXISTS jobs_fts_ad AFTER DELETE ON jobs BEGIN "
+        "INSERT INTO jobs_fts(jobs_fts, rowid, title, description) VALUES ('delete', old.id, old.title, old.description); END",
+        "CREATE TRIGGER IF NOT EXISTS jobs_fts_au AFTER UPDATE OF title, description ON jobs BEGIN "
+        "INSERT INTO jobs_fts(jobs_fts, rowid, title, description) VALUES ('delete', old.id, old.title, old.description); "
+        "INSERT INTO jobs_fts(rowid, title, description) VALUES (new.id, new.title, new.description); END",
+    )
+
+    fts = db.table('jobs_fts', db.column('rowid'))
+
+    def install(self, connection):
+        for statement in self.DDL:
+            connection.exec_driver_sql(statement)
+
+    def rebuild(self, connection):
+        connection.exec_driver_sql("INSERT INTO jobs_fts(jobs_fts) VALUES ('rebuild')")
+
+    def apply(self, query, text):
+        terms = tokenize(text)
+        if not terms:
+            return query.order_by(Job.created_at.desc())
+        # Quote every term so user input can't inject FTS5 syntax; prefix-match the last
+        match = ' '.join('"%s"' % term for term in terms) + '*'
+        table = db.literal_column('jobs_fts')
+        rank = db.func.bm25(table, TITLE_WEIGHT, DESCRIPTION_WEIGHT)
+        # Drive the query from the FTS match; left to itself the planner may
+        # walk a jobs listing index and probe the match once per row
+        return query.enable_assertions(False).select_from(CrossJoin(self.fts, Job.__table__, self.fts.c.rowid == Job.id)).filter(
+            table.op('MATCH')(match)
+        ).order_by(rank, Job.created_at.desc())
+
+
+class PostgresBackend(SearchBackend):
+    """PostgreSQL tsvector search backed by a GIN expression index"""
+    name = 'postgres'
+
+    DDL = ("CREATE INDEX IF NOT EXISTS ix_jobs_search ON jobs USING GIN ("
+           "(setweight(to_tsvector('english', title), 'A') || "
+           "setweight(to_tsvector('english', description), 'D')))")
+
+    def install(self, connection):
+        connection.exec_driver_sql(self.DDL)
+
+    def rebuild(self, connection):
+        connection.exec_driver_sql('REINDEX INDEX ix_jobs_search')
+
+    def apply(self, query, text):
+        terms = tokenize(text)
+        if not terms:
+            return query.order_by(Job.created_at.desc())
+        # Must match the indexed expression exactly for the index to be used
+        vector = db.func.setweight(db.func.to_tsvector('english', Job.title), 'A').op('||')(
+            db.func.setweight(db.func.to_tsvector('english', Job.description), 'D'))
+        tsquery = db.func.to_tsquery('english', ' & '.join(terms) + ':*')
+        return query.filter(vector.op('@@')(tsquery)).order_by(
+            db.func.ts_rank(vector, tsquery).desc(), Job.created_at.desc())
+
+
+BACKENDS = {
+    'like': SearchBackend,
+    'fts5': SQLiteFTS5Backend,
+    'postgres': PostgresBackend,
+}
+
+DIALECT_BACKENDS = {
+    'sqlite': 'fts5',
+    'postgresql': 'postgres',
+}
+
+
+def get_backend(dialect_name, configured='auto'):
+    """Return the backend instance for ``configured`` or, if 'auto', the dialect."""
+    name = configured if configured and configured != 'auto' else DIALECT_BACKENDS.get(dialect_name, 'like')
+    return BACKENDS[name]()
+
+
+def current_backend():
+    return get_backend(db.engine.dialect.name, current_app.config.get('SEARCH_BACKEND', 'auto'))
+
+
+def search_jobs(query, text):
+    """Restrict a Job query to matches for ``text``, ordered by relevance."""
+    return current_backend().apply(query, text)
+
+
+def reindex():
+    """Install the index if needed and rebuild it from the jobs table."""
+    backend = current_backend()
+    with db.engine.begin() as connection:
+        backend.install(connection)
+        backend.rebuild(connection)
+    return backend.name
+
+
+@event.listens_for(Job.__table__, 'after_create')
+def _install_search_index(table, connection, **kw):
+    get_backend(connection.dialect.name).install(connection)
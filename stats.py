@@ -0,0 +1,224 @@
+"""
+Denormalized counters.
+
+Per-user dashboard counters live in ``user_stats``. Routes call ``bump()``
+in the same transaction as the write that changes a counter, so reading the
+dashboard KPIs is a single primary-key lookup. ``reconcile()`` rebuilds the
+whole table from the source rows (``rebuild()`` is the same on a migration's
+connection).
+
+``jobs.bid_count`` is kept up to date by the Bid insert/delete events in
+``models.py``; ``backfill_bid_counts()`` and ``bid_count_mismatches()`` repair
+and audit it.
+
+A freelancer's rating aggregates on ``freelancer_profiles`` (running
+``rating_sum``, ``total_reviews``, ``avg_rating`` and the per-star histogram)
+are bumped by ``add_rating()`` in the review's transaction;
+``reconcile_ratings()`` rebuilds them from the reviews. Both count the
+profile's ``seeded_*`` baseline (reviews that predate the reviews table) on
+top of the review rows.
+"""
+
+from sqlalchemy import inspect
+from sqlalchemy.exc import IntegrityError
+
+from models import db, Job, Bid, Payment, UserStats, Review, FreelancerProfile, DEFAULT_CURRENCY
+
+# earnings_minor and spent_minor are minor units of DEFAULT_CURRENCY
+COUNTERS = ('bids_count', 'accepted_bids', 'earnings_minor',
+            'jobs_count', 'open_jobs', 'spent_minor', 'hired_freelancers_count')
+
+EARNED_STATUSES = ('paid',)
+SPENT_STATUSES = ('paid', 'released')
+HIRED_STATUSES = ('in_progress', 'completed', 'awaiting_payment')
+
+STARS = (1, 2, 3, 4, 5)
+
+
+def get_stats(user_id):
+    """Return the user's counters, or an all-zero row if none exist yet."""
+    stats = db.session.get(UserStats, user_id)
+    if stats is None:
+        stats = UserStats(user_id=user_id, **dict.fromkeys(COUNTERS, 0))
+    return stats
+
+
+def bump(user_id, **deltas):
+    """Atomically add ``deltas`` to the user's counters (creating the row if needed).
+
+    The change is not committed; it rides on the caller's transaction.
+    """
+    deltas = {name: delta for name, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    values = {name: getattr(UserStats, name) + delta for name, delta in deltas.items()}
+    stmt = db.update(UserStats).where(UserStats.user_id == user_id).values(**values)
+    if db.session.execute(stmt).rowcount:
+        return
+    try:
+        with db.session.begin_nested():
+            db.session.add(UserStats(user_id=user_id, **deltas))
+    except IntegrityError:
+        # Another transaction created the row first
+        db.session.execute(stmt)
+
+
+def has_hired(client_id, freelancer_id):
+    """True if the client already has a hired job with this freelancer."""
+    return db.session.query(
+        db.session.query(Job.id).join(Bid, Bid.id == Job.accepted_bid_id).filter(
+            Job.client_id == client_id,
+            Job.status.in_(HIRED_STATUSES),
+            Bid.freelancer_id == freelancer_id
+        ).exists()
+    ).scalar()
+
+
+def rebuild(executor):
+    """Recompute the whole table from bids, jobs and payments. Returns the row count.
+
+    ``executor`` is a Session or a Connection (migrations); not committed.
+    """
+    rows = {}
+
+    def row(user_id):
+        if user_id not in rows:
+            rows[user_id] = dict(dict.fromkeys(COUNTERS, 0), user_id=user_id)
+        return rows[user_id]
+
+    for user_id, bids_count, accepted_bids in executor.execute(db.select(
+        Bid.freelancer_id,
+        db.func.count(Bid.id),
+        db.func.sum(db.case((Bid.status == 'accepted', 1), else_=0)),
+    ).group_by(Bid.freelancer_id)):
+        row(user_id).update(bids_count=bids_count, accepted_bids=accepted_bids or 0)
+
+    for user_id, earnings in executor.execute(db.select(
+        Payment.freelancer_id, db.func.sum(Payment.amount_minor)
+    ).where(Payment.status.in_(EARNED_STATUSES), Payment.currency == DEFAULT_CURRENCY).group_by(Payment.freelancer_id)):
+        row(user_id)['earnings_minor'] = earnings or 0
+
+    for user_id, jobs_count, open_jobs in executor.execute(db.select(
+        Job.client_id,
+        db.func.count(Job.id),
+        db.func.sum(db.case((Job.status == 'open', 1), else_=0)),
+    ).group_by(Job.client_id)):
+        row(user_id).update(jobs_count=jobs_count, open_jobs=open_jobs or 0)
+
+    for user_id, spent in executor.execute(db.select(
+        Payment.client_id, db.func.sum(Payment.amount_minor)
+    ).where(Payment.status.in_(SPENT_STATUSES), Payment.currency == DEFAULT_CURRENCY).group_by(Payment.client_id)):
+        row(user_id)['spent_minor'] = spent or 0
+
+    for user_id, hired in executor.execute(db.select(
+        Job.client_id, db.func.count(db.distinct(Bid.freelancer_id))
+    ).join(Bid, Bid.id == Job.accepted_bid_id).where(
+        Job.status.in_(HIRED_STATUSES)
+    ).group_by(Job.client_id)):
+        row(user_id)['hired_freelancers_count'] = hired
+
+    rows.pop(None, None)
+    executor.execute(db.delete(UserStats.__table__))
+    if rows:
+        executor.execute(db.insert(UserStats.__table__), list(rows.values()))
+    return len(rows)
+
+
+def reconcile():
+    """Rebuild the whole table from bids, jobs and payments. Returns the row count."""
+    count = rebuild(db.session)
+    db.session.commit()
+    return count
+
+
+def _bid_count_subquery():
+    return db.select(db.func.count(Bid.id)).where(Bid.job_id == Job.id).scalar_subquery()
+
+
+def backfill_bid_counts():
+    """Add jobs.bid_count if the column is missing and recompute it. Returns jobs updated."""
+    columns = {column['name'] for column in inspect(db.engine).get_columns('jobs')}
+    if 'bid_count' not in columns:
+        db.session.execute(db.text('ALTER TABLE jobs ADD COLUMN bid_count INTEGER NOT NULL DEFAULT 0'))
+    result = db.session.execute(
+        db.update(Job).where(Job.bid_count != _bid_count_subquery())
+        .values(bid_count=_bid_count_subquery())
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    return result.rowcount
+
+
+def bid_count_mismatches(limit=50):
+    """Jobs whose stored bid_count disagrees with their Bid rows, as (id, stored, actual)."""
+    actual = _bid_count_subquery()
+    return db.session.query(Job.id, Job.bid_count, actual).filter(Job.bid_count != actual).order_by(Job.id).limit(limit).all()
+
+
+def add_rating(freelancer_id, rating):
+    """Count one more review of ``rating`` stars in the freelancer's profile aggregates.
+
+    A single UPDATE of running sums, so concurrent reviews cannot overwrite
+    each other. Not committed; rides on the caller's transaction.
+    """
+    star = getattr(FreelancerProfile, f'rating_{rating}')
+    updated = db.session.execute(
+        db.update(FreelancerProfile).where(FreelancerProfile.user_id == freelancer_id)
+        .values({
+            FreelancerProfile.rating_sum: FreelancerProfile.rating_sum + rating,
+            FreelancerProfile.total_reviews: db.func.coalesce(FreelancerProfile.total_reviews, 0) + 1,
+            FreelancerProfile.avg_rating: (FreelancerProfile.rating_sum + rating) * 1.0
+                                          / (db.func.coalesce(FreelancerProfile.total_reviews, 0) + 1),
+            star: star + 1,
+        })
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if not updated:
+        # Freelancers only get a profile row once they edit it
+        db.session.add(FreelancerProfile(user_id=freelancer_id, rating_sum=rating, total_reviews=1,
+                                         avg_rating=float(rating), **{star.key: 1}))
+
+
+RATING_COLUMNS = ('rating_sum', 'total_reviews') + tuple(f'rating_{stars}' for stars in STARS)
+# Seeded baseline added to each of RATING_COLUMNS (see FreelancerProfile)
+SEEDED_COLUMNS = ('seeded_sum', 'seeded_count') + tuple(f'seeded_{stars}' for stars in STARS)
+
+
+def reconcile_ratings(batch_size=1000):
+    """Rebuild every profile's rating aggregates from the reviews table.
+
+    Each aggregate is the profile's seeded baseline plus its reviews, the
+    same invariant ``add_rating()`` keeps. One grouped query streamed in
+    batches; only rows that differ are written. Returns (profiles checked,
+    profiles fixed).
+    """
+    reviewed = [
+        db.func.coalesce(db.func.sum(Review.rating), 0),
+        db.func.count(Review.id),
+    ] + [db.func.count(db.case((Review.rating == stars, Review.id))) for stars in STARS]
+    actual = [getattr(FreelancerProfile, seeded) + count for seeded, count in zip(SEEDED_COLUMNS, reviewed)]
+    stored = [db.func.coalesce(getattr(FreelancerProfile, name), 0) for name in RATING_COLUMNS]
+    query = (
+        db.select(FreelancerProfile.id, FreelancerProfile.avg_rating, *stored, *actual)
+        .outerjoin(Review, Review.freelancer_id == FreelancerProfile.user_id)
+        .group_by(FreelancerProfile.id)
+        .order_by(FreelancerProfile.id)
+        .execution_options(yield_per=batch_size)
+    )
+
+    checked = fixed = 0
+    width = len(RATING_COLUMNS)
+    for batch in db.session.execute(query).partitions():
+        updates = []
+        for profile_id, avg_rating, *values in batch:
+            checked += 1
+            have, want = values[:width], values[width:]
+            average = want[0] / want[1] if want[1] else 0.0
+            if have != want or abs((avg_rating or 0) - average) > 1e-9:
+                updates.append(dict(zip(RATING_COLUMNS, want), id=profile_id, avg_rating=average))
+        if updates:
+            # Bulk UPDATE by primary key: one executemany per batch
+            db.session.execute(db.update(FreelancerProfile), updates)
+            fixed += len(updates)
+    db.session.commit()
+    return checked, fixed
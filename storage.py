@@ -0,0 +1,198 @@
+"""
+Content-addressed upload storage.
+
+File bodies are stored once per SHA-256 under ``UPLOAD_FOLDER/blobs/ab/cd/<sha256>``
+(``Blob``, with a reference count). The names the rest of the app already
+uses (``WorkSubmission.file_path``, ``FreelancerProfile.profile_image``) are
+``StoredFile`` rows pointing at a blob, so a resubmitted file or a logo
+uploaded twice costs one copy on disk.
+
+``store()`` and ``store_file()`` add a name, ``release()`` drops one, and
+``collect_garbage()`` deletes blobs nobody references any more. Files
+uploaded before this store existed keep working: ``resolve()`` falls back to
+the flat file in ``UPLOAD_FOLDER`` and ``import_legacy()`` moves them in.
+
+Changes ride on the caller's transaction, like ``stats.bump()``. A new body
+is moved into ``blobs/`` only after that transaction commits; on rollback it
+is left where it was (or deleted, if it was our own temp file), so the blob
+directory never holds a file without a row.
+"""
+
+import hashlib
+import os
+import tempfile
+
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from models import db, Blob, StoredFile
+
+BUFFER_SIZE = 64 * 1024
+BLOB_DIR = 'blobs'
+TMP_DIR = '.tmp'
+PENDING_KEY = 'pending_blobs'
+
+
+def _folder():
+    return current_app.config['UPLOAD_FOLDER']
+
+
+def blob_path(sha256):
+    return os.path.join(_folder(), BLOB_DIR, sha256[:2], sha256[2:4], sha256)
+
+
+def _spool(stream):
+    """Copy ``stream`` to a temp file in the upload folder. Returns (path, sha256, size)."""
+    tmp_dir = os.path.join(_folder(), TMP_DIR)
+    os.makedirs(tmp_dir, exist_ok=True)
+    digest = hashlib.sha256()
+    size = 0
+    fd, path = tempfile.mkstemp(dir=tmp_dir)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            for block in iter(lambda: stream.read(BUFFER_SIZE), b''):
+                f.write(block)
+                digest.update(block)
+                size += len(block)
+    except BaseException:
+        os.remove(path)
+        raise
+    return path, digest.hexdigest(), size
+
+
+def _file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(BUFFER_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _add_reference(path, sha256, size, spooled=False):
+    """Take one reference on blob ``sha256``; ``path`` becomes its body when the caller commits."""
+    stmt = db.update(Blob).where(Blob.sha256 == sha256).values(refcount=Blob.refcount + 1)
+    exists = db.session.execute(stmt).rowcount
+    if not exists:
+        try:
+            with db.session.begin_nested():
+                db.session.add(Blob(sha256=sha256, size=size, refcount=1))
+        except IntegrityError:
+            # Another transaction stored the same content first
+            db.session.execute(stmt)
+    db.session.info.setdefault(PENDING_KEY, []).append((path, blob_path(sha256), spooled))
+
+
+@event.listens_for(Session, 'after_commit')
+def _place_pending(session):
+    """Move bodies into blobs/ only once their rows are committed, so a rollback can't orphan one."""
+    for path, target, _ in session.info.pop(PENDING_KEY, ()):
+        if os.path.exists(target):
+            os.remove(path)
+        else:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.replace(path, target)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _drop_pending(session, previous_transaction):
+    if previous_transaction.parent is not None:
+        return
+    # Our own spool files go; a caller's file (an upload, a legacy file) stays put
+    for path, _, spooled in session.info.pop(PENDING_KEY, ()):
+        if spooled:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+def store(stream, name):
+    """Store the bytes of ``stream`` under logical ``name``. Returns the sha256."""
+    path, sha256, size = _spool(stream)
+    _add_reference(path, sha256, size, spooled=True)
+    db.session.add(StoredFile(name=name, sha256=sha256))
+    return sha256
+
+
+def store_file(path, name, sha256=None):
+    """Move the file at ``path`` into the store under ``name``. Returns the sha256."""
+    sha256 = sha256 or _file_digest(path)
+    _add_reference(path, sha256, os.path.getsize(path))
+    db.session.add(StoredFile(name=name, sha256=sha256))
+    return sha256
+
+
+def release(name):
+    """Drop logical ``name``; its blob is deleted by collect_garbage() once unreferenced."""
+    if not name:
+        return
+    stored = db.session.get(StoredFile, name)
+    if stored is None:
+        return
+    db.session.execute(db.update(Blob).where(Blob.sha256 == stored.sha256).values(refcount=Blob.refcount - 1))
+    db.session.delete(stored)
+
+
+def resolve(name):
+    """Absolute path of the body for logical ``name``, or None if there is none."""
+    stored = db.session.get(StoredFile, name)
+    if stored is not None:
+        return blob_path(stored.sha256)
+    legacy = os.path.join(_folder(), name)
+    if os.path.basename(name) == name and os.path.isfile(legacy):
+        return legacy
+    return None
+
+
+def collect_garbage():
+    """Delete blobs with no references. Returns (blobs removed, bytes freed)."""
+    removed, freed = 0, 0
+    for sha256, size in db.session.query(Blob.sha256, Blob.size).filter(Blob.refcount <= 0).all():
+        # Conditional so a concurrent store() that just re-referenced it wins
+        deleted = db.session.execute(
+            db.delete(Blob).where(Blob.sha256 == sha256, Blob.refcount <= 0)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        db.session.commit()
+        if deleted:
+            try:
+                os.remove(blob_path(sha256))
+            except FileNotFoundError:
+                pass
+            removed += 1
+            freed += size
+    return removed, freed
+
+
+def import_legacy():
+    """Move flat files in UPLOAD_FOLDER into the store under their current names."""
+    imported = 0
+    folder = _folder()
+    for name in sorted(os.listdir(folder)):
+        path = os.path.join(folder, name)
+        if not os.path.isfile(path) or name.startswith('.') or db.session.get(StoredFile, name):
+            continue
+        store_file(path, name)
+        db.session.commit()
+        imported += 1
+    return imported
+
+
+def usage():
+    """Logical versus physical bytes, and what deduplication saves."""
+    def total(*criteria):
+        return int(db.session.query(db.func.coalesce(db.func.sum(Blob.size), 0)).filter(*criteria).scalar())
+
+    logical = int(db.session.query(db.func.coalesce(db.func.sum(Blob.size), 0)).select_from(StoredFile).join(
+        Blob, Blob.sha256 == StoredFile.sha256).scalar())
+    physical = total(Blob.refcount > 0)
+    return {
+        'files': db.session.query(db.func.count(StoredFile.name)).scalar(),
+        'blobs': db.session.query(db.func.count(Blob.sha256)).filter(Blob.refcount > 0).scalar(),
+        'logical_bytes': logical,
+        'physical_bytes': physical,
+        'saved_bytes': logical - physical,
+        'garbage_bytes': total(Blob.refcount <= 0),
+    }
@@ -0,0 +1,305 @@
+"""
+Durable background tasks.
+
+Request handlers ``enqueue()`` slow side effects (such as avatar resizing)
+as ``Task`` rows in the same transaction as the write that needs them, and
+return straight away; nothing is queued if that transaction rolls back.
+Workers claim a due task with a conditional UPDATE that gives it a lease
+and a visibility timeout (``TASK_VISIBILITY_TIMEOUT``). If a worker dies
+mid-task the lease expires and another worker runs it again, so handlers
+must be safe to repeat. Failures are retried with exponential backoff up to
+``max_attempts`` and then left ``failed`` with the error.
+
+Workers run as threads inside each web process (``TASK_WORKER_THREADS``,
+started on first use so they are created after gunicorn forks), as a
+separate ``flask worker`` process, or both. With ``TASK_EAGER`` (testing)
+tasks run as soon as the enqueuing transaction commits.
+"""
+
+import json
+import logging
+import os
+import secrets
+import signal
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+
+from flask import current_app, has_app_context
+from sqlalchemy import event, func
+from sqlalchemy.orm import Session
+
+from models import db, Task
+
+logger = logging.getLogger('freelancehub.tasks')
+
+HANDLERS = {}
+
+_FLAG = 'tasks_enqueued'
+_start_lock = threading.Lock()
+
+# Outcomes of tasks run by this process, for /metrics
+_metrics_lock = threading.Lock()
+_counters = {'completed': 0, 'retried': 0, 'failed': 0}
+_waits = deque(maxlen=500)     # seconds from run_at to claim
+_runtimes = deque(maxlen=500)  # seconds spent in the handler
+
+
+def task(name):
+    """Register the decorated function as the handler for tasks called ``name``."""
+    def register(fn):
+        HANDLERS[name] = fn
+        return fn
+    return register
+
+
+def enqueue(name, delay=0, **payload):
+    """Queue ``name(**payload)`` to run after the current transaction commits.
+
+    ``payload`` must be JSON-serialisable. Not committed; rides on the
+    caller's transaction.
+    """
+    if name not in HANDLERS:
+        raise KeyError(f'Unknown task: {name}')
+    entry = Task(name=name, payload=json.dumps(payload),
+                 max_attempts=current_app.config['TASK_MAX_ATTEMPTS'],
+                 run_at=datetime.utcnow() + timedelta(seconds=delay))
+    db.session.add(entry)
+    db.session.info[_FLAG] = True
+    return entry
+
+
+@event.listens_for(Session, 'after_commit')
+def _dispatch(session):
+    if not session.info.pop(_FLAG, False) or not has_app_context():
+        return
+    app = current_app._get_current_object()
+    if app.config.get('TASK_EAGER'):
+        # The committing session cannot run SQL from inside this hook, so
+        # drain on a thread with its own app context and wait for it
+        thread = threading.Thread(target=drain, args=(app,))
+        thread.start()
+        thread.join()
+        return
+    worker = start_workers(app)
+    if worker is not None:
+        worker.wake()
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _forget(session, previous_transaction):
+    if previous_transaction.parent is None:
+        session.info.pop(_FLAG, None)
+
+
+# ================== RUNNING ==================
+
+def _due(now):
+    return db.or_(
+        db.and_(Task.status == 'queued', Task.run_at <= now),
+        # Claimed by a worker that has not finished within the visibility timeout
+        db.and_(Task.status == 'running', Task.locked_until < now),
+    )
+
+
+def claim():
+    """Lease the next due task to this worker. Returns the Task or None."""
+    now = datetime.utcnow()
+    timeout = timedelta(seconds=current_app.config['TASK_VISIBILITY_TIMEOUT'])
+    candidates = db.session.scalars(
+        db.select(Task.id).where(_due(now)).order_by(Task.run_at, Task.id).limit(10)
+    ).all()
+    for task_id in candidates:
+        lease = secrets.token_hex(16)
+        # Only one worker wins a task; the others move on to the next candidate
+        claimed = db.session.execute(
+            db.update(Task).where(Task.id == task_id, _due(now))
+            .values(status='running', lease=lease, attempts=Task.attempts + 1,
+                    started_at=now, locked_until=now + timeout)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        db.session.commit()
+        if claimed:
+            return db.session.get(Task, task_id)
+    return None
+
+
+def _settle(task_id, lease, **values):
+    """Record a task's outcome, unless its lease expired and another worker took it."""
+    settled = db.session.execute(
+        db.update(Task).where(Task.id == task_id, Task.lease == lease)
+        .values(lease=None, locked_until=None, **values)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.session.commit()
+    if not settled:
+        logger.warning('Task %s outlived its visibility timeout and was claimed again', task_id)
+
+
+def run_one():
+    """Claim and run one due task. Returns False if there was none."""
+    entry = claim()
+    if entry is None:
+        return False
+    task_id, name, lease = entry.id, entry.name, entry.lease
+    attempts, max_attempts = entry.attempts, entry.max_attempts
+    with _metrics_lock:
+        _waits.append((entry.started_at - entry.run_at).total_seconds())
+
+    started = time.perf_counter()
+    try:
+        handler = HANDLERS.get(name)
+        if handler is None:
+            raise LookupError(f'No handler registered for {name}')
+        if attempts > max_attempts:
+            raise TimeoutError('Visibility timeout expired on every attempt')
+        handler(**json.loads(entry.payload))
+    except Exception as e:
+        db.session.rollback()
+        error = f'{type(e).__name__}: {e}'
+        now = datetime.utcnow()
+        if attempts < max_attempts:
+            delay = current_app.config['TASK_RETRY_DELAY'] * 2 ** (attempts - 1)
+            logger.warning('Task %s (%s) failed, retrying in %ss: %s', task_id, name, delay, error)
+            _settle(task_id, lease, status='queued', last_error=error, run_at=now + timedelta(seconds=delay))
+            outcome = 'retried'
+        else:
+            logger.exception('Task %s (%s) failed after %s attempts', task_id, name, attempts)
+            _settle(task_id, lease, status='failed', last_error=error, finished_at=now)
+            outcome = 'failed'
+    else:
+        _settle(task_id, lease, status='done', last_error=None, finished_at=datetime.utcnow())
+        outcome = 'completed'
+
+    with _metrics_lock:
+        _counters[outcome] += 1
+        _runtimes.append(time.perf_counter() - started)
+    return True
+
+
+def drain(app, stopping=None):
+    """Run due tasks until none are left (or ``stopping`` is set). Returns how many ran."""
+    count = 0
+    while stopping is None or not stopping.is_set():
+        # A fresh app context per task, so each gets a clean session
+        with app.app_context():
+            if not run_one():
+                break
+        count += 1
+    return count
+
+
+class Worker:
+    """Threads that run due tasks, polling every TASK_POLL_INTERVAL or when woken."""
+
+    def __init__(self, app, threads):
+        self.app = app
+        self.pid = os.getpid()
+        self.wakeup = threading.Event()
+        self.stopping = threading.Event()
+        self.threads = [threading.Thread(target=self._loop, name=f'tasks-{i}', daemon=True)
+                        for i in range(threads)]
+
+    def start(self):
+        for thread in self.threads:
+            thread.start()
+        return self
+
+    def wake(self):
+        self.wakeup.set()
+
+    def stop(self, timeout=None):
+        """Stop after the tasks in progress finish."""
+        self.stopping.set()
+        self.wakeup.set()
+        for thread in self.threads:
+            thread.join(timeout)
+
+    def _loop(self):
+        interval = self.app.config['TASK_POLL_INTERVAL']
+        while not self.stopping.is_set():
+            self.wakeup.clear()
+            try:
+                drain(self.app, self.stopping)
+            except Exception:
+                # Database unavailable or similar; try again on the next poll
+                logger.exception('Task worker error')
+            self.wakeup.wait(interval)
+
+
+def start_workers(app):
+    """This process's in-process Worker, started on first call. None if disabled."""
+    threads = app.config.get('TASK_WORKER_THREADS', 0)
+    if not threads or app.config.get('TASK_EAGER'):
+        return None
+    worker = app.extensions.get('tasks')
+    if worker is None or worker.pid != os.getpid():
+        with _start_lock:
+            worker = app.extensions.get('tasks')
+            # Threads do not survive a fork, so a forked child starts its own
+            if worker is None or worker.pid != os.getpid():
+                worker = app.extensions['tasks'] = Worker(app, threads).start()
+    return worker
+
+
+def serve(app, threads):
+    """Run a Worker in the foreground until SIGINT or SIGTERM."""
+    worker = Worker(app, threads).start()
+    signal.signal(signal.SIGTERM, lambda signum, frame: worker.stopping.set())
+    try:
+        while not worker.stopping.wait(1):
+            pass
+    except KeyboardInterrupt:
+        pass
+    worker.stop()
+
+
+def prune(older_than):
+    """Delete tasks that finished successfully longer than ``older_than`` ago. Returns the count."""
+    cutoff = datetime.utcnow() - older_than
+    count = db.session.execute(
+        db.delete(Task).where(Task.status == 'done', Task.finished_at < cutoff)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.session.commit()
+    return count
+
+
+def _summary(samples):
+    if not samples:
+        return {'count': 0}
+    ordered = sorted(samples)
+    return {
+        'count': len(ordered),
+        'avg_ms': round(1000 * sum(ordered) / len(ordered), 2),
+        'p95_ms': round(1000 * ordered[int(0.95 * (len(ordered) - 1))], 2),
+        'max_ms': round(1000 * ordered[-1], 2),
+    }
+
+
+def metrics():
+    """Queue depth (whole database) and latency of tasks this process ran."""
+    now = datetime.utcnow()
+    by_status = dict(db.session.query(Task.status, func.count(Task.id)).group_by(Task.status).all())
+    queued = dict(db.session.query(Task.name, func.count(Task.id))
+                  .filter(Task.status == 'queued').group_by(Task.name).all())
+    oldest = db.session.query(func.min(Task.run_at)).filter(
+        Task.status == 'queued', Task.run_at <= now).scalar()
+    with _metrics_lock:
+        counters = dict(_counters)
+        waits, runtimes = list(_waits), list(_runtimes)
+    return {
+        'depth': {status: by_status.get(status, 0) for status in ('queued', 'running', 'failed', 'done')},
+        'queued_by_name': queued,
+        'oldest_due_seconds': round((now - oldest).total_seconds(), 3) if oldest else 0,
+        'process': dict(counters, wait=_summary(waits), run=_summary(runtimes)),
+    }
+
+
+def init_app(app):
+    # Start in-process workers with the first request, so tasks left over
+    # from before a restart run without waiting for a new enqueue
+    @app.before_request
+    def start_task_workers():
+        start_workers(app)
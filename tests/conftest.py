@@ -0,0 +1,71 @@
+"""
+Shared fixtures: each test gets an app on its own migrated SQLite file.
+"""
+
+import os
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cache
+import migrations
+from app import create_app
+from models import db, User, FreelancerProfile, Job, Bid, Money
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app('testing', test_config={
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path / "test.db"}',
+        # Threaded tests share the file; wait on the write lock instead of failing
+        'SQLALCHEMY_ENGINE_OPTIONS': {'connect_args': {'timeout': 30}},
+        'UPLOAD_FOLDER': str(tmp_path / 'uploads'),
+        'SESSION_COOKIE_SECURE': False,
+    })
+    os.makedirs(app.config['UPLOAD_FOLDER'])
+    # Per-process caches outlive a test's database
+    for each in cache.CACHES.values():
+        each.invalidate()
+    with app.app_context():
+        migrations.upgrade()
+    yield app
+    with app.app_context():
+        db.engine.dispose()
+
+
+def make_user(name, role, password='pw'):
+    user = User(name=name, email=f'{name.lower()}@example.com', role=role)
+    user.set_password(password)
+    db.session.add(user)
+    if role == 'freelancer':
+        user.freelancer_profile = FreelancerProfile(bio=f'{name} bio', skills='Python')
+    db.session.commit()
+    return user
+
+
+def make_job(client, title='Build a Flask app', budget=1000, **fields):
+    job = Job(client_id=client.id, title=title, description=f'{title}, details inside',
+              budget=Money.from_major(budget), category='web',
+              deadline=datetime.utcnow() + timedelta(days=14), **fields)
+    db.session.add(job)
+    db.session.commit()
+    return job
+
+
+def make_bid(job, freelancer, amount=900):
+    bid = Bid(job_id=job.id, freelancer_id=freelancer.id, amount=Money.from_major(amount),
+              proposal='I can do this', delivery_days=7)
+    db.session.add(bid)
+    db.session.commit()
+    return bid
+
+
+def login(app, email, password='pw'):
+    """A test client logged in as the user with ``email``."""
+    client = app.test_client()
+    response = client.post('/login', data={'email': email, 'password': password})
+    assert response.status_code == 302, response.status_code
+    return client
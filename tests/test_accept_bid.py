@@ -0,0 +1,50 @@
+import threading
+
+from models import db, Bid, Job, UserStats
+
+from conftest import make_user, make_job, make_bid, login
+
+THREADS = 8
+
+
+def hiring(app, bidders):
+    """An open job with one bid per freelancer. Returns (job id, bid ids)."""
+    with app.app_context():
+        client = make_user('Client', 'client')
+        job = make_job(client)
+        bids = [make_bid(job, make_user(f'Freelancer{n}', 'freelancer'), amount=500 + n) for n in range(bidders)]
+        return job.id, [bid.id for bid in bids]
+
+
+def flashed(test_client, category):
+    with test_client.session_transaction() as session:
+        return [message for each, message in session.get('_flashes', []) if each == category]
+
+
+def test_concurrent_accepts_hire_exactly_one_bid(app):
+    job_id, bid_ids = hiring(app, THREADS)
+    clients = [login(app, 'client@example.com') for _ in bid_ids]
+    start = threading.Barrier(THREADS)
+    statuses = [None] * THREADS
+
+    def accept(n):
+        start.wait()
+        statuses[n] = clients[n].post(f'/bid/{bid_ids[n]}/accept').status_code
+
+    threads = [threading.Thread(target=accept, args=(n,)) for n in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert statuses == [302] * THREADS
+    assert sum(len(flashed(test_client, 'success')) for test_client in clients) == 1
+    with app.app_context():
+        bids = Bid.query.filter(Bid.id.in_(bid_ids)).all()
+        accepted = [bid.id for bid in bids if bid.status == 'accepted']
+        assert len(accepted) == 1
+        assert sum(bid.status == 'rejected' for bid in bids) == THREADS - 1
+        job = db.session.get(Job, job_id)
+        assert (job.status, job.accepted_bid_id) == ('in_progress', accepted[0])
+        assert sum(stats.accepted_bids for stats in UserStats.query.all()) == 1
+
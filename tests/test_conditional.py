@@ -0,0 +1,82 @@
+import pytest
+
+import stats
+from models import db, User, Review
+
+from conftest import make_user, make_job, make_bid, login
+
+
+@pytest.fixture
+def page(app):
+    """A job with one bid, and the client's logged-in test client."""
+    with app.app_context():
+        client = make_user('Client', 'client')
+        freelancer = make_user('Freelancer', 'freelancer')
+        job = make_job(client)
+        make_bid(job, freelancer)
+        ids = {'client': client.id, 'freelancer': freelancer.id, 'job': job.id}
+    return login(app, 'client@example.com'), ids
+
+
+def etag(test_client, job_id):
+    response = test_client.get(f'/job/{job_id}')
+    assert response.status_code == 200
+    return response.headers['ETag']
+
+
+def test_unchanged_page_is_not_modified(page):
+    test_client, ids = page
+    tag = etag(test_client, ids['job'])
+    assert test_client.get(f"/job/{ids['job']}", headers={'If-None-Match': tag}).status_code == 304
+
+
+def test_client_posting_another_job_changes_the_version(app, page):
+    test_client, ids = page
+    tag = etag(test_client, ids['job'])
+    with app.app_context():
+        make_job(db.session.get(User, ids['client']), title='Second job')
+    assert etag(test_client, ids['job']) != tag
+
+
+def test_bidder_rating_changes_the_version(app, page):
+    test_client, ids = page
+    tag = etag(test_client, ids['job'])
+    with app.app_context():
+        stats.add_rating(ids['freelancer'], 4)
+        db.session.commit()
+    assert etag(test_client, ids['job']) != tag
+
+
+def test_viewer_name_changes_the_version(app, page):
+    test_client, ids = page
+    tag = etag(test_client, ids['job'])
+    with app.app_context():
+        db.session.get(User, ids['client']).name = 'Renamed'
+        db.session.commit()
+    assert etag(test_client, ids['job']) != tag
+
+
+def test_reviewer_name_changes_the_profile_version(app, page):
+    _, ids = page
+    with app.app_context():
+        db.session.add(Review(job_id=ids['job'], client_id=ids['client'], freelancer_id=ids['freelancer'],
+                              rating=5, comment='Great'))
+        db.session.commit()
+    # Viewed by the freelancer, so only the reviewer's row changes
+    viewer = login(app, 'freelancer@example.com')
+    path = f"/freelancer/{ids['freelancer']}"
+    tag = viewer.get(path).headers['ETag']
+    assert viewer.get(path, headers={'If-None-Match': tag}).status_code == 304
+    with app.app_context():
+        db.session.get(User, ids['client']).name = 'Renamed'
+        db.session.commit()
+    response = viewer.get(path, headers={'If-None-Match': tag})
+    assert response.status_code == 200
+    assert b'Renamed' in response.data
+
+
+def test_new_release_changes_the_version(app, page):
+    test_client, ids = page
+    tag = etag(test_client, ids['job'])
+    app.extensions['page_release'] = 'next-release'
+    assert test_client.get(f"/job/{ids['job']}", headers={'If-None-Match': tag}).status_code == 200
@@ -0,0 +1,68 @@
+import io
+
+import pytest
+
+import delivery
+import storage
+from models import db
+
+from conftest import make_user, login
+
+BODY = bytes(range(256)) * 1024  # several read blocks
+
+
+@pytest.fixture
+def accel(app):
+    """The app in x-accel mode behind LocalAccelProxy, with one stored file."""
+    app.config['UPLOAD_DELIVERY'] = 'x-accel'
+    app.wsgi_app = delivery.LocalAccelProxy(app.wsgi_app, app.config['UPLOAD_ACCEL_PREFIX'],
+                                            app.config['UPLOAD_FOLDER'])
+
+    @app.after_request
+    def two_cookies(response):
+        response.set_cookie('first', '1')
+        response.set_cookie('second', '2')
+        return response
+
+    with app.app_context():
+        make_user('Client', 'client')
+        storage.store(io.BytesIO(BODY), 'brief.pdf')
+        db.session.commit()
+    return login(app, 'client@example.com')
+
+
+def test_whole_file(accel):
+    response = accel.get('/uploads/brief.pdf')
+    assert response.status_code == 200
+    assert response.data == BODY
+    assert response.headers['Content-Type'] == 'application/pdf'
+    assert response.headers['Content-Disposition'] == 'inline'
+    assert 'X-Accel-Redirect' not in response.headers
+
+
+def test_range_request(accel):
+    response = accel.get('/uploads/brief.pdf', headers={'Range': 'bytes=100000-100009'})
+    assert response.status_code == 206
+    assert response.data == BODY[100000:100010]
+    assert response.headers['Content-Range'] == f'bytes 100000-100009/{len(BODY)}'
+
+
+def test_unsatisfiable_range(accel):
+    response = accel.get('/uploads/brief.pdf', headers={'Range': f'bytes={len(BODY)}-'})
+    assert response.status_code == 416
+
+
+def test_conditional_request(accel):
+    etag = accel.get('/uploads/brief.pdf').headers['ETag']
+    assert accel.get('/uploads/brief.pdf', headers={'If-None-Match': etag}).status_code == 304
+
+
+def test_every_set_cookie_is_kept(accel):
+    cookies = accel.get('/uploads/brief.pdf').headers.getlist('Set-Cookie')
+    assert any(cookie.startswith('first=') for cookie in cookies)
+    assert any(cookie.startswith('second=') for cookie in cookies)
+
+
+def test_internal_location_is_not_public(accel):
+    blob = accel.application.config['UPLOAD_ACCEL_PREFIX'] + storage.BLOB_DIR + '/'
+    assert accel.get(blob).status_code == 404
@@ -0,0 +1,97 @@
+from datetime import datetime
+
+import pytest
+
+from idempotency import HEADER, idempotent
+from models import db, Job, Payment, IdempotencyKey, User
+
+from conftest import make_user, make_job, make_bid, login
+
+
+@pytest.fixture
+def billing(app):
+    """A job in progress with a pending payment. Returns (client's test client, job id, payment id)."""
+    @app.route('/test/fails', methods=['POST'])
+    @idempotent
+    def fails():
+        return 'Gateway exploded', 500
+
+    with app.app_context():
+        client = make_user('Client', 'client')
+        job = make_job(client)
+        bid = make_bid(job, make_user('Freelancer', 'freelancer'))
+        job.status = 'in_progress'
+        job.accepted_bid_id = bid.id
+        bid.status = 'accepted'
+        payment = Payment(job_id=job.id, client_id=client.id, freelancer_id=bid.freelancer_id,
+                          amount=bid.amount, status='pending')
+        db.session.add(payment)
+        db.session.commit()
+        job_id, payment_id = job.id, payment.id
+    return login(app, 'client@example.com'), job_id, payment_id
+
+
+def pay(test_client, payment_id, key):
+    return test_client.post(f'/mock-payment/{payment_id}', data={'payment_method': 'card'}, headers={HEADER: key})
+
+
+def test_retry_replays_the_stored_redirect(app, billing):
+    test_client, job_id, payment_id = billing
+    first = pay(test_client, payment_id, 'pay-once')
+    assert first.status_code == 302
+    with app.app_context():
+        paid_at = db.session.get(Payment, payment_id).paid_at
+
+    retry = pay(test_client, payment_id, 'pay-once')
+    assert retry.status_code == 302
+    assert retry.headers['Location'] == first.headers['Location']
+    assert retry.headers['Idempotent-Replayed'] == 'true'
+    with app.app_context():
+        payment = db.session.get(Payment, payment_id)
+        assert (payment.status, payment.paid_at) == ('paid', paid_at)
+        assert db.session.get(Job, job_id).status == 'completed'
+
+
+def test_retry_while_in_flight_is_409(app, billing):
+    test_client, _, payment_id = billing
+    with app.app_context():
+        client_id = User.query.filter_by(email='client@example.com').one().id
+        db.session.add(IdempotencyKey(user_id=client_id, key='in-flight', request_path=f'/mock-payment/{payment_id}',
+                                      created_at=datetime.utcnow()))
+        db.session.commit()
+
+    response = pay(test_client, payment_id, 'in-flight')
+    assert response.status_code == 409
+    assert response.headers['Retry-After'] == '1'
+    with app.app_context():
+        assert db.session.get(Payment, payment_id).status == 'pending'
+
+
+def test_key_reused_on_another_path_is_422(billing):
+    test_client, job_id, payment_id = billing
+    assert pay(test_client, payment_id, 'shared').status_code == 302
+    assert test_client.post(f'/pay/{job_id}', headers={HEADER: 'shared'}).status_code == 422
+
+
+def test_key_is_forgotten_after_a_server_error(app, billing):
+    test_client, _, _ = billing
+    assert test_client.post('/test/fails', headers={HEADER: 'flaky'}).status_code == 500
+    with app.app_context():
+        assert IdempotencyKey.query.filter_by(key='flaky').count() == 0
+    # So the retry runs the view again instead of replaying the failure
+    retry = test_client.post('/test/fails', headers={HEADER: 'flaky'})
+    assert retry.status_code == 500
+    assert 'Idempotent-Replayed' not in retry.headers
+
+
+def test_payment_does_not_reopen_a_cancelled_job(app, billing):
+    test_client, job_id, payment_id = billing
+    with app.app_context():
+        # Not a move the app makes; written directly to stand in for any state a payment can't close
+        db.session.execute(db.update(Job).where(Job.id == job_id).values(status='cancelled'))
+        db.session.commit()
+
+    assert pay(test_client, payment_id, 'late').status_code == 302
+    with app.app_context():
+        assert db.session.get(Job, job_id).status == 'cancelled'
+        assert db.session.get(Payment, payment_id).status == 'pending'
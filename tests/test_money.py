@@ -0,0 +1,28 @@
+import pytest
+
+from models import db, Job, Money
+
+from conftest import make_user, login
+
+
+@pytest.mark.parametrize('text', ['1e30', '99999999999999999999', '-50', '0', '0.001', 'nan', 'inf', 'abc', '', None])
+def test_parse_rejects_invalid_amounts(text):
+    assert Money.parse(text) is None
+
+
+def test_parse_rounds_to_minor_units():
+    assert Money.parse(' 1500.505 ') == Money(150051)
+
+
+@pytest.mark.parametrize('budget', ['1e30', '99999999999999999999', '-50'])
+def test_post_job_flashes_invalid_budget(app, budget):
+    with app.app_context():
+        email = make_user('Client', 'client').email
+    client = login(app, email)
+    response = client.post('/post-job', data={'title': 'Logo', 'description': 'A logo', 'budget': budget,
+                                              'category': 'design', 'deadline': '2030-01-01'},
+                           follow_redirects=True)
+    assert response.status_code == 200
+    assert b'All fields are required.' in response.data
+    with app.app_context():
+        assert db.session.query(Job).count() == 0
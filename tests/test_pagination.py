@@ -0,0 +1,91 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from models import Job
+from pagination import decode_cursor, keyset_paginate
+
+from conftest import make_user, make_job
+
+START = datetime(2024, 1, 1, 12, 0)
+
+
+@pytest.fixture
+def jobs(app):
+    """Seven jobs, newest first by title J6..J0; J2, J3 and J4 share a created_at."""
+    with app.app_context():
+        client = make_user('Client', 'client')
+        for n in range(7):
+            minute = 2 if 2 <= n <= 4 else n
+            make_job(client, title=f'J{n}', created_at=START + timedelta(minutes=minute))
+    return app
+
+
+def page(cursor=None, per_page=3):
+    return keyset_paginate(Job.query, Job, cursor, per_page=per_page)
+
+
+def titles(result):
+    return [job.title for job in result.items]
+
+
+def test_next_then_prev_round_trip(jobs):
+    with jobs.app_context():
+        first = page()
+        assert titles(first) == ['J6', 'J5', 'J4']
+        assert (first.has_prev, first.has_next) == (False, True)
+
+        second = page(first.next_cursor)
+        assert titles(second) == ['J3', 'J2', 'J1']
+        assert (second.has_prev, second.has_next) == (True, True)
+
+        back = page(second.prev_cursor)
+        assert titles(back) == titles(first)
+        assert (back.has_prev, back.has_next) == (False, True)
+        assert titles(page(back.next_cursor)) == titles(second)
+
+
+def test_ties_on_created_at_are_broken_by_id(jobs):
+    with jobs.app_context():
+        # Page boundaries inside the J2..J4 tie neither skip nor repeat a row
+        seen, cursor = [], None
+        while True:
+            result = page(cursor, per_page=2)
+            seen += titles(result)
+            if not result.has_next:
+                break
+            cursor = result.next_cursor
+        assert seen == ['J6', 'J5', 'J4', 'J3', 'J2', 'J1', 'J0']
+
+        middle = page(page(per_page=3).next_cursor, per_page=1)
+        assert titles(middle) == ['J3']
+        assert titles(page(middle.prev_cursor, per_page=1)) == ['J4']
+
+
+def test_last_page_has_no_next(jobs):
+    with jobs.app_context():
+        last = page(page(page().next_cursor).next_cursor)
+        assert titles(last) == ['J0']
+        assert (last.has_prev, last.has_next, last.next_cursor) == (True, False, None)
+
+
+def test_exact_fit_has_no_empty_next_page(jobs):
+    with jobs.app_context():
+        only = page(per_page=7)
+        assert len(only.items) == 7
+        assert (only.has_prev, only.has_next) == (False, False)
+
+
+@pytest.mark.parametrize('cursor', ['garbage', '', '!!!', 'W10', 'WyJ1cCIsIjIwMjQtMDEtMDEiLDFd'])
+def test_malformed_cursor_falls_back_to_first_page(jobs, cursor):
+    with jobs.app_context():
+        result = page(cursor)
+        assert titles(result) == ['J6', 'J5', 'J4']
+        assert not result.has_prev
+
+
+def test_decode_rejects_bad_payloads():
+    assert decode_cursor('W10') is None  # []
+    assert decode_cursor('WyJ1cCIsIjIwMjQtMDEtMDEiLDFd') is None  # ["up", "2024-01-01", 1]
+    assert decode_cursor('WyJuZXh0Iiwibm90IGEgZGF0ZSIsMV0') is None  # ["next", "not a date", 1]
+
@@ -0,0 +1,27 @@
+import threading
+import time
+
+import pytest
+
+from passwords import HashPool, HashingBusy
+
+
+def test_pool_refuses_work_beyond_its_backlog():
+    pool = HashPool(workers=1, queue=1)
+    release = threading.Event()
+    started = [threading.Thread(target=pool.run, args=(release.wait,)) for _ in range(2)]
+    for thread in started:
+        thread.start()
+    try:
+        # Both slots are taken (one running, one queued), as they would be by
+        # two gthread requests hashing at once
+        while pool._slots._value:
+            time.sleep(0.001)
+        with pytest.raises(HashingBusy):
+            pool.run(lambda: None)
+        assert pool.rejected == 1
+    finally:
+        release.set()
+        for thread in started:
+            thread.join()
+        pool.shutdown()
@@ -0,0 +1,105 @@
+"""
+N+1 regression tests: dashboard and listing routes issue a fixed number of
+statements, within their ``@query_budget``, however much data there is.
+"""
+
+import pytest
+from sqlalchemy import event
+
+import stats
+from instrumentation import assert_query_budget
+from models import db, Job, Payment, Review, WorkSubmission
+
+from conftest import make_user, make_job, make_bid, login
+
+
+def seed(client, freelancers, jobs):
+    """``jobs`` jobs for ``client``, each bid on by every freelancer; every other one hired, paid and reviewed."""
+    for n in range(jobs):
+        job = make_job(client, title=f'Flask job {n}')
+        bids = [make_bid(job, freelancer, amount=500 + n) for freelancer in freelancers]
+        if n % 2:
+            winner = bids[n % len(bids)]
+            job.status = 'in_progress'
+            job.accepted_bid_id = winner.id
+            winner.status = 'accepted'
+            db.session.add(WorkSubmission(job_id=job.id, file_path=f'work_{n}.zip'))
+            db.session.add(Payment(job_id=job.id, client_id=client.id, freelancer_id=winner.freelancer_id,
+                                   amount=winner.amount, status='paid'))
+            db.session.add(Review(job_id=job.id, client_id=client.id, freelancer_id=winner.freelancer_id,
+                                  rating=5, comment='Great'))
+    db.session.commit()
+    stats.reconcile()
+
+
+def query_counts(app, jobs):
+    """Statements per route for a client and a freelancer, after seeding ``jobs`` jobs."""
+    with app.app_context():
+        client = make_user(f'Client{jobs}', 'client')
+        freelancers = [make_user(f'Freelancer{jobs}x{n}', 'freelancer') for n in range(3)]
+        seed(client, freelancers, jobs)
+        job_id = Job.query.filter_by(client_id=client.id).order_by(Job.id).first().id
+        client_email, freelancer_email = client.email, freelancers[0].email
+
+    as_client = login(app, client_email)
+    as_freelancer = login(app, freelancer_email)
+    requests = [
+        (as_client, '/dashboard'),
+        (as_client, '/my-jobs'),
+        (as_client, f'/job/{job_id}/bids'),
+        (as_client, '/transactions'),
+        (as_freelancer, '/dashboard'),
+        (as_freelancer, '/browse-jobs'),
+        (as_freelancer, '/my-bids'),
+        (as_freelancer, f'/job/{job_id}'),
+    ]
+    with assert_query_budget(app) as records:
+        for test_client, path in requests:
+            assert test_client.get(path).status_code == 200, path
+    return [(role, record['endpoint'], record['queries'])
+            for role, record in zip(['client'] * 4 + ['freelancer'] * 4, records)]
+
+
+def test_routes_stay_within_their_query_budget(app):
+    query_counts(app, jobs=4)
+
+
+@pytest.mark.parametrize('more', [24])
+def test_query_counts_do_not_grow_with_data(app, more):
+    small = query_counts(app, jobs=2)
+    large = query_counts(app, jobs=more)
+    assert large == small
+
+
+def test_landing_page_issues_no_queries(app):
+    with app.app_context():
+        seed(make_user('Client', 'client'), [make_user('Freelancer', 'freelancer')], 2)
+    with assert_query_budget(app) as records:
+        assert app.test_client().get('/').status_code == 200
+    assert records[0]['queries'] == 0
+
+
+def test_job_page_counts_the_clients_jobs(app):
+    with app.app_context():
+        client = make_user('Client', 'client')
+        jobs = [make_job(client, title=f'Job {n}') for n in range(3)]
+        db.session.execute(db.update(Job).where(Job.id == jobs[0].id).values(status='in_progress'))
+        db.session.commit()
+        job_id = jobs[1].id
+        engine = db.engine
+    test_client = login(app, 'client@example.com')
+
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        page = test_client.get(f'/job/{job_id}').get_data(as_text=True)
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+
+    assert '<span class="font-bold">3</span>' in page  # jobs posted
+    assert '<span class="font-bold">2</span>' in page  # still open
+    # The client's jobs are counted, never loaded as a collection
+    assert not any('jobs.client_id IN' in statement for statement in statements)
@@ -0,0 +1,104 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from loaders import with_profile
+from models import db, Job
+from search import search_jobs
+
+from conftest import make_user, make_job, login
+
+
+def open_jobs():
+    """The browse-jobs base query."""
+    return with_profile(Job.query.filter_by(status='open'), 'job_card')
+
+
+def titles(query):
+    return [job.title for job in query.all()]
+
+
+def posted(client, title, description=None, age_days=0):
+    job = make_job(client, title=title, created_at=datetime.utcnow() - timedelta(days=age_days))
+    if description is not None:
+        job.description = description
+        db.session.commit()
+    return job
+
+
+def test_title_match_outranks_description_match(app):
+    with app.app_context():
+        client = make_user('Client', 'client')
+        posted(client, 'Django migration', 'Move the models over', age_days=3)
+        posted(client, 'Website refresh', 'New pages; the backend is Django', age_days=0)
+        posted(client, 'Logo design', 'Vector artwork')
+        assert titles(search_jobs(open_jobs(), 'django')) == ['Django migration', 'Website refresh']
+
+
+def test_every_term_must_match_and_the_last_is_a_prefix(app):
+    with app.app_context():
+        client = make_user('Client', 'client')
+        posted(client, 'Kubernetes cluster', 'Helm charts for staging')
+        posted(client, 'Kubernetes docs', 'Write the runbook')
+        assert titles(search_jobs(open_jobs(), 'kube')) == ['Kubernetes docs', 'Kubernetes cluster']
+        assert titles(search_jobs(open_jobs(), 'kubernetes hel')) == ['Kubernetes cluster']
+
+
+@pytest.mark.parametrize('text, found', [
+    ('"flask', True), ('flask*', True), ('-flask', True), ('flask)', True),
+    # Operators are plain words that this job doesn't contain
+    ('NOT flask', False), ('title:flask', False), ('NEAR(flask api)', False),
+])
+def test_operator_looking_input_is_searched_as_words(app, text, found):
+    with app.app_context():
+        client = make_user('Client', 'client')
+        posted(client, 'Flask API', 'REST endpoints')
+        assert titles(search_jobs(open_jobs(), text)) == (['Flask API'] if found else [])
+
+
+def test_blank_search_lists_newest_first(app):
+    with app.app_context():
+        client = make_user('Client', 'client')
+        posted(client, 'Older', age_days=2)
+        posted(client, 'Newer')
+        assert titles(search_jobs(open_jobs(), '  ')) == ['Newer', 'Older']
+
+
+def test_paginate_counts_only_matches(app):
+    with app.app_context():
+        client = make_user('Client', 'client')
+        for n in range(15):
+            posted(client, f'Flask job {n}')
+        for n in range(5):
+            posted(client, f'Logo {n}')
+        closed = posted(client, 'Flask job closed')
+        db.session.execute(db.update(Job).where(Job.id == closed.id).values(status='cancelled'))
+        db.session.commit()
+
+        first = search_jobs(open_jobs(), 'flask').paginate(page=1, per_page=12)
+        assert (first.total, first.pages, len(first.items)) == (15, 2, 12)
+        second = search_jobs(open_jobs(), 'flask').paginate(page=2, per_page=12)
+        assert len(second.items) == 3
+        assert {job.id for job in first.items}.isdisjoint(job.id for job in second.items)
+
+
+def test_like_backend_matches_substrings(app):
+    app.config['SEARCH_BACKEND'] = 'like'
+    with app.app_context():
+        client = make_user('Client', 'client')
+        posted(client, 'Kubernetes cluster', age_days=1)
+        posted(client, 'Cluster upgrade', 'On kubernetes')
+        posted(client, 'Logo design')
+        assert titles(search_jobs(open_jobs(), 'ubern')) == ['Cluster upgrade', 'Kubernetes cluster']
+        assert search_jobs(open_jobs(), 'ubern').paginate(page=1, per_page=12).total == 2
+
+
+def test_browse_jobs_search(app):
+    with app.app_context():
+        client = make_user('Client', 'client')
+        posted(client, 'Django migration')
+        posted(client, 'Logo design')
+        make_user('Freelancer', 'freelancer')
+    page = login(app, 'freelancer@example.com').get('/browse-jobs?search=djan').get_data(as_text=True)
+    assert 'Django migration' in page
+    assert 'Logo design' not in page
@@ -0,0 +1,65 @@
+import stats
+from models import db, User, Review
+
+from conftest import make_user, make_job
+
+
+def profile(user_id):
+    return db.session.get(User, user_id).freelancer_profile
+
+
+def ratings(user_id):
+    found = profile(user_id)
+    return (found.total_reviews, found.rating_sum, found.avg_rating, found.rating_histogram)
+
+
+def seed(user, count, total):
+    """Give ``user`` ``count`` carried-over reviews summing to ``total`` stars."""
+    found = user.freelancer_profile
+    found.seeded_count = found.total_reviews = count
+    found.seeded_sum = found.rating_sum = total
+    found.avg_rating = total / count
+    db.session.commit()
+
+
+def review(client, freelancer, rating):
+    db.session.add(Review(job_id=make_job(client).id, client_id=client.id,
+                          freelancer_id=freelancer.id, rating=rating, comment='Good'))
+    stats.add_rating(freelancer.id, rating)
+    db.session.commit()
+
+
+def test_seeded_review_then_reconcile_changes_nothing(app):
+    with app.app_context():
+        client = make_user('Client', 'client')
+        freelancer = make_user('Seeded', 'freelancer')
+        seed(freelancer, 12, 55)
+        assert stats.reconcile_ratings() == (1, 0)
+
+        review(client, freelancer, 5)
+        db.session.expire_all()
+        after_review = ratings(freelancer.id)
+        assert after_review[:3] == (13, 60, 60 / 13)
+        assert after_review[3][5] == 1
+
+        assert stats.reconcile_ratings() == (1, 0)
+        db.session.expire_all()
+        assert ratings(freelancer.id) == after_review
+
+
+def test_reconcile_ratings_rebuilds_from_reviews(app):
+    with app.app_context():
+        client = make_user('Client', 'client')
+        reviewed = make_user('Reviewed', 'freelancer')
+        for rating in (5, 4):
+            review(client, reviewed, rating)
+        # Drift the stored aggregates, as a lost update would
+        profile(reviewed.id).total_reviews = 7
+        profile(reviewed.id).rating_4 = 0
+        db.session.commit()
+
+        assert stats.reconcile_ratings() == (1, 1)
+        db.session.expire_all()
+        rebuilt = profile(reviewed.id)
+        assert (rebuilt.total_reviews, rebuilt.rating_sum, rebuilt.avg_rating) == (2, 9, 4.5)
+        assert (rebuilt.rating_4, rebuilt.rating_5) == (1, 1)
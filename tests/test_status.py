@@ -0,0 +1,95 @@
+import os
+import shutil
+import sqlite3
+
+import pytest
+
+import migrations
+from app import create_app
+from models import db, Job, Bid, JobStatus, BidStatus, PaymentStatus, WorkStatus
+
+from conftest import make_user, make_job
+
+LEGACY_DB = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'instance', 'freelancing.db')
+
+
+@pytest.mark.parametrize('current, new', [
+    ('open', 'in_progress'), ('open', 'cancelled'), ('in_progress', 'awaiting_payment'),
+    ('awaiting_payment', 'completed'), ('open', 'open'), (None, 'completed'),
+])
+def test_check_allows_moves(current, new):
+    assert JobStatus.check(current, new) is JobStatus(new)
+
+
+@pytest.mark.parametrize('current, new', [
+    ('completed', 'open'), ('in_progress', 'open'), ('cancelled', 'in_progress'), ('open', 'sideways'),
+])
+def test_check_rejects_other_moves(current, new):
+    with pytest.raises(ValueError):
+        JobStatus.check(current, new)
+
+
+def test_sources_follow_moves():
+    assert JobStatus.sources('completed') == (JobStatus.IN_PROGRESS, JobStatus.AWAITING_PAYMENT)
+    assert JobStatus.sources('completed', JobStatus.IN_PROGRESS) == (JobStatus.IN_PROGRESS,)
+    assert JobStatus.sources('open') == ()
+    assert BidStatus.sources('rejected') == (BidStatus.PENDING,)
+    assert PaymentStatus.sources('released') == (PaymentStatus.PAID,)
+    assert WorkStatus.sources('approved') == (WorkStatus.SUBMITTED, WorkStatus.REJECTED)
+
+
+def test_assignment_is_validated(app):
+    with app.app_context():
+        job = make_job(make_user('Client', 'client'))
+        with pytest.raises(ValueError):
+            job.status = 'completed'
+
+
+def test_status_type_round_trip(app):
+    with app.app_context():
+        job_id = make_job(make_user('Client', 'client'), status=JobStatus.OPEN).id
+        db.session.execute(db.update(Job).where(Job.id == job_id).values(status='in_progress'))
+        db.session.commit()
+        raw = db.session.execute(db.text('SELECT status FROM jobs WHERE id = :id'), {'id': job_id}).scalar()
+        assert raw == JobStatus.IN_PROGRESS.code
+        db.session.expire_all()
+        status = db.session.get(Job, job_id).status
+        assert status is JobStatus.IN_PROGRESS and status == 'in_progress'
+        assert db.session.query(Job).filter(Job.status == 'in_progress').count() == 1
+
+
+def legacy_app(tmp_path, edit=None):
+    """An app on a copy of the pre-migration database, after ``edit(sqlite connection)``."""
+    path = tmp_path / 'legacy.db'
+    shutil.copy(LEGACY_DB, path)
+    if edit:
+        with sqlite3.connect(path) as connection:
+            edit(connection)
+    return create_app('testing', test_config={'SQLALCHEMY_DATABASE_URI': f'sqlite:///{path}'})
+
+
+def test_migration_14_converts_status_strings(tmp_path):
+    def edit(connection):
+        connection.execute("UPDATE jobs SET status = 'in_progress' WHERE id = (SELECT MIN(id) FROM jobs)")
+        connection.execute("UPDATE bids SET status = 'accepted' WHERE id = (SELECT MIN(id) FROM bids)")
+
+    with sqlite3.connect(LEGACY_DB) as connection:
+        jobs_before = connection.execute('SELECT COUNT(*) FROM jobs').fetchone()[0]
+    app = legacy_app(tmp_path, edit)
+    with app.app_context():
+        migrations.upgrade()
+        raw = dict(db.session.execute(db.text('SELECT status, COUNT(*) FROM jobs GROUP BY status')).all())
+        assert raw == {JobStatus.OPEN.code: jobs_before - 1, JobStatus.IN_PROGRESS.code: 1}
+        assert Bid.query.filter_by(status='accepted').count() == 1
+        indexes = {row[0] for row in db.session.execute(db.text(
+            "SELECT name FROM sqlite_master WHERE type = 'index' AND sql LIKE '%WHERE%'"))}
+        assert 'ix_jobs_open_created' in indexes
+        db.engine.dispose()
+
+
+def test_migration_14_refuses_unknown_statuses(tmp_path):
+    app = legacy_app(tmp_path, lambda connection: connection.execute("UPDATE jobs SET status = 'paused'"))
+    with app.app_context():
+        with pytest.raises(RuntimeError, match='paused'):
+            migrations.upgrade()
+        db.engine.dispose()
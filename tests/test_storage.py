@@ -0,0 +1,41 @@
+import io
+import os
+
+import storage
+from models import db, Blob
+
+BODY = b'portfolio.pdf contents'
+
+
+def blob_files(app):
+    root = os.path.join(app.config['UPLOAD_FOLDER'], storage.BLOB_DIR)
+    return [name for _, _, names in os.walk(root) for name in names]
+
+
+def test_body_is_placed_on_commit(app):
+    with app.app_context():
+        sha256 = storage.store(io.BytesIO(BODY), 'portfolio.pdf')
+        assert blob_files(app) == []
+        db.session.commit()
+        with open(storage.resolve('portfolio.pdf'), 'rb') as f:
+            assert f.read() == BODY
+        assert blob_files(app) == [sha256]
+
+
+def test_rollback_leaves_no_orphan_blob(app):
+    with app.app_context():
+        storage.store(io.BytesIO(BODY), 'portfolio.pdf')
+        db.session.rollback()
+        assert blob_files(app) == []
+        assert os.listdir(os.path.join(app.config['UPLOAD_FOLDER'], storage.TMP_DIR)) == []
+        assert db.session.query(Blob).count() == 0
+
+
+def test_rollback_keeps_the_callers_file(app, tmp_path):
+    source = tmp_path / 'work.zip'
+    source.write_bytes(BODY)
+    with app.app_context():
+        storage.store_file(str(source), 'work.zip')
+        db.session.rollback()
+        assert blob_files(app) == []
+    assert source.read_bytes() == BODY
@@ -0,0 +1,84 @@
+import pytest
+
+from models import db, Job, Upload, WorkSubmission
+
+from conftest import make_user, make_job, make_bid, login
+
+BODY = b'final deliverable'
+
+
+@pytest.fixture
+def hired(app):
+    """A job in progress with one submission, and the hired freelancer's test client."""
+    with app.app_context():
+        client = make_user('Client', 'client')
+        freelancer = make_user('Freelancer', 'freelancer')
+        job = make_job(client)
+        bid = make_bid(job, freelancer)
+        job.status = 'in_progress'
+        job.accepted_bid_id = bid.id
+        bid.status = 'accepted'
+        db.session.add(WorkSubmission(job_id=job.id, file_path='first.zip'))
+        db.session.commit()
+        job_id = job.id
+    return login(app, 'freelancer@example.com'), job_id
+
+
+def upload(test_client, job_id, finish_before=None):
+    """Upload BODY in one chunk, calling ``finish_before`` just before sending it."""
+    response = test_client.post('/upload-sessions', json={'job_id': job_id, 'filename': 'work.zip', 'size': len(BODY)})
+    assert response.status_code == 201
+    upload_id = response.get_json()['id']
+    if finish_before:
+        finish_before()
+    return test_client.put(f'/upload-sessions/{upload_id}', data=BODY, headers={'Upload-Offset': '0'})
+
+
+def test_completed_upload_replaces_submission(app, hired):
+    test_client, job_id = hired
+    assert upload(test_client, job_id).status_code == 200
+    with app.app_context():
+        assert WorkSubmission.query.filter_by(job_id=job_id).one().file_path.endswith('work.zip')
+
+
+@pytest.mark.parametrize('job_status, work_status', [('in_progress', 'approved'), ('completed', 'submitted')])
+def test_upload_finishing_after_approval_is_rejected(app, hired, job_status, work_status):
+    test_client, job_id = hired
+
+    def approve():
+        with app.app_context():
+            db.session.get(Job, job_id).status = job_status
+            WorkSubmission.query.filter_by(job_id=job_id).one().status = work_status
+            db.session.commit()
+
+    assert upload(test_client, job_id, finish_before=approve).status_code == 409
+    with app.app_context():
+        assert WorkSubmission.query.filter_by(job_id=job_id).one().file_path == 'first.zip'
+        assert Upload.query.count() == 0
+
+
+def test_rejected_finish_is_final_and_json(app, hired):
+    test_client, job_id = hired
+    response = test_client.post('/upload-sessions', json={'job_id': job_id, 'filename': 'work.zip', 'size': len(BODY)})
+    upload_id = response.get_json()['id']
+    with app.app_context():
+        WorkSubmission.query.filter_by(job_id=job_id).one().status = 'approved'
+        db.session.commit()
+
+    rejected = test_client.put(f'/upload-sessions/{upload_id}', data=BODY, headers={'Upload-Offset': '0'})
+    assert rejected.status_code == 409
+    assert 'offset' not in rejected.get_json()  # nothing to resume
+    gone = test_client.get(f'/upload-sessions/{upload_id}')
+    assert gone.status_code == 404
+    assert gone.get_json() == {'error': 'Upload not found.'}
+
+
+def test_offset_conflict_says_where_to_resume(hired):
+    test_client, job_id = hired
+    response = test_client.post('/upload-sessions', json={'job_id': job_id, 'filename': 'work.zip', 'size': len(BODY)})
+    upload_id = response.get_json()['id']
+    assert test_client.put(f'/upload-sessions/{upload_id}', data=BODY[:5], headers={'Upload-Offset': '0'}).status_code == 200
+
+    conflict = test_client.put(f'/upload-sessions/{upload_id}', data=BODY[:5], headers={'Upload-Offset': '0'})
+    assert conflict.status_code == 409
+    assert conflict.get_json()['offset'] == 5
@@ -0,0 +1,217 @@
+"""
+Resumable chunked uploads for work files.
+
+A client opens an upload with the file's name and total size, then PUTs the
+bytes in pieces of at most ``UPLOAD_CHUNK_SIZE``, each tagged with the
+``Upload-Offset`` it starts at. Every piece is streamed from the request to
+``UPLOAD_FOLDER/.partial/<id>`` through a small buffer, so memory per upload
+is bounded by ``BUFFER_SIZE`` no matter how large the file is. A SHA-256 is
+updated as bytes arrive.
+
+After a dropped connection the client asks for the upload's ``offset`` and
+continues from there; any bytes written past the committed offset are
+truncated first. When the last byte arrives the file is moved into the
+content-addressed store (``storage.py``) and attached to the job's
+``WorkSubmission``.
+"""
+
+import hashlib
+import os
+import secrets
+import threading
+from datetime import datetime, timedelta
+
+from flask import current_app
+from werkzeug.utils import secure_filename
+
+from models import db, Job, Upload, WorkSubmission
+import storage
+
+BUFFER_SIZE = 64 * 1024
+PARTIAL_DIR = '.partial'
+
+
+class UploadError(Exception):
+    """A rejected upload request; ``status`` is the HTTP status to answer with.
+
+    A 409 that carries the upload's committed ``offset`` can be resumed from
+    there; one without it is final.
+    """
+
+    def __init__(self, message, status=400, offset=None):
+        super().__init__(message)
+        self.status = status
+        self.offset = offset
+
+
+# upload id -> (offset, sha256) for uploads this process has been receiving.
+# Another worker (or a restart) rebuilds the digest from the partial file.
+_digests = {}
+_digests_lock = threading.Lock()
+
+
+def partial_path(upload):
+    return os.path.join(current_app.config['UPLOAD_FOLDER'], PARTIAL_DIR, upload.id)
+
+
+def start(user_id, job_id, filename, size, description=None):
+    """Open a new upload session. Returns the Upload (committed)."""
+    if size < 1:
+        raise UploadError('File is empty.')
+    if size > current_app.config['UPLOAD_MAX_SIZE']:
+        raise UploadError('File is too large.', 413)
+    upload = Upload(id=secrets.token_hex(16), user_id=user_id, job_id=job_id,
+                    filename=filename, size=size, description=description, offset=0)
+    os.makedirs(os.path.dirname(partial_path(upload)), exist_ok=True)
+    open(partial_path(upload), 'wb').close()
+    db.session.add(upload)
+    db.session.commit()
+    return upload
+
+
+def _digest_at(upload, path):
+    """SHA-256 of the first ``upload.offset`` bytes of the partial file."""
+    with _digests_lock:
+        cached = _digests.get(upload.id)
+    if cached is not None and cached[0] == upload.offset:
+        return cached[1].copy()
+
+    digest = hashlib.sha256()
+    remaining = upload.offset
+    with open(path, 'rb') as f:
+        while remaining:
+            block = f.read(min(BUFFER_SIZE, remaining))
+            if not block:
+                raise UploadError('Partial upload is missing data; start again.', 410)
+            digest.update(block)
+            remaining -= len(block)
+    return digest
+
+
+def write_chunk(upload, offset, stream, length):
+    """Append ``length`` bytes from ``stream`` at ``offset``. Returns the Upload."""
+    if upload.status != 'uploading':
+        raise UploadError('Upload is already complete.', 409, upload.offset)
+    if offset != upload.offset:
+        raise UploadError(f'Expected offset {upload.offset}.', 409, upload.offset)
+    if length is None:
+        raise UploadError('Content-Length is required.', 411)
+    if length > current_app.config['UPLOAD_CHUNK_SIZE']:
+        raise UploadError('Chunk is too large.', 413)
+    if offset + length > upload.size:
+        raise UploadError('Chunk runs past the declared size.', 416)
+
+    path = partial_path(upload)
+    if not os.path.exists(path):
+        raise UploadError('Partial upload not found; start again.', 410)
+    digest = _digest_at(upload, path)
+
+    received = 0
+    with open(path, 'r+b') as f:
+        # Drop anything left over from an interrupted chunk
+        f.truncate(offset)
+        f.seek(offset)
+        while received < length:
+            block = stream.read(min(BUFFER_SIZE, length - received))
+            if not block:
+                break
+            f.write(block)
+            digest.update(block)
+            received += len(block)
+    if received != length:
+        raise UploadError('Connection closed before the chunk was complete.', 400)
+
+    # Only one writer wins a given offset; a loser's bytes are truncated on the next try
+    claimed = db.session.execute(
+        db.update(Upload).where(Upload.id == upload.id, Upload.offset == offset)
+        .values(offset=offset + length, updated_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if not claimed:
+        db.session.rollback()
+        raise UploadError('Another request wrote this chunk.', 409, upload.offset)
+    db.session.commit()
+    db.session.refresh(upload)
+
+    if upload.offset == upload.size:
+        _finish(upload, digest.hexdigest())
+    else:
+        with _digests_lock:
+            _digests[upload.id] = (upload.offset, digest)
+    return upload
+
+
+def _finish(upload, sha256):
+    """Move the completed file into place and attach it to the job's submission."""
+    with _digests_lock:
+        _digests.pop(upload.id, None)
+
+    # The job may have been approved (or cancelled) while the bytes were arriving.
+    # The guarded write locks the job row until commit, so an approval can't
+    # slip in between this check and the submission being replaced.
+    open_job = db.session.execute(
+        db.update(Job).where(Job.id == upload.job_id, Job.status == 'in_progress')
+        .values(updated_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    submission = WorkSubmission.query.filter_by(job_id=upload.job_id).first()
+    if not open_job or (submission and submission.status == 'approved'):
+        db.session.rollback()
+        _discard(upload)
+        db.session.commit()
+        raise UploadError('This job is no longer accepting work.', 409)
+
+    stored_name = secure_filename(f'{upload.job_id}_{datetime.utcnow().timestamp()}_{upload.filename}')
+    storage.store_file(partial_path(upload), stored_name, sha256)
+
+    upload.status = 'complete'
+    upload.sha256 = sha256
+    upload.stored_name = stored_name
+
+    if submission:
+        storage.release(submission.file_path)
+        submission.file_path = stored_name
+        submission.description = upload.description
+        if submission.status == 'rejected':
+            submission.status = 'submitted'
+    else:
+        db.session.add(WorkSubmission(job_id=upload.job_id, file_path=stored_name, description=upload.description))
+    db.session.commit()
+
+
+def _discard(upload):
+    """Delete an unfinished upload and its partial file (commit is the caller's)."""
+    try:
+        os.remove(partial_path(upload))
+    except FileNotFoundError:
+        pass
+    with _digests_lock:
+        _digests.pop(upload.id, None)
+    db.session.delete(upload)
+
+
+def prune(older_than):
+    """Delete unfinished uploads idle for longer than ``older_than``. Returns the count."""
+    cutoff = datetime.utcnow() - older_than
+    stale = Upload.query.filter(Upload.status == 'uploading', Upload.updated_at < cutoff).all()
+    for upload in stale:
+        _discard(upload)
+    db.session.commit()
+    return len(stale)
+
+
+def default_expiry():
+    return timedelta(hours=current_app.config.get('UPLOAD_SESSION_HOURS', 24))
+
+
+def describe(upload):
+    """JSON-ready status of an upload."""
+    return {
+        'id': upload.id,
+        'filename': upload.filename,
+        'size': upload.size,
+        'offset': upload.offset,
+        'status': upload.status,
+        'sha256': upload.sha256,
+        'chunk_size': current_app.config['UPLOAD_CHUNK_SIZE'],
+    }
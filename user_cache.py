@@ -0,0 +1,96 @@
+"""
+Cached Flask-Login user loader.
+
+Every authenticated request starts by loading ``current_user``. Instead of a
+``SELECT`` per request, each worker keeps the user's column values in an LRU
+cache (``USER_CACHE_SIZE`` entries, ``USER_CACHE_TTL`` seconds) and rebuilds a
+detached ``User`` from them, merged into the session without a query, so
+relationships still lazy-load as usual.
+
+The session id is ``"<id>:<session_version>"`` (see ``User.get_id``).
+Changing the password bumps ``session_version``. A session holding an older
+version is rejected as soon as the worker sees the new row: immediately on
+the worker that made the change (its entry is dropped on commit) and within
+the TTL on every other worker. A cached entry that disagrees with the
+session's version is never trusted either way; it is dropped and the row
+reloaded, so a stale entry cannot lock out a freshly issued session.
+"""
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, make_transient_to_detached
+
+from cache import LRUCache
+from models import db, User
+
+user_cache = LRUCache('users')
+
+
+def snapshot(user):
+    """Plain column values of ``user``, safe to keep across sessions."""
+    return {attr.key: getattr(user, attr.key) for attr in inspect(User).column_attrs}
+
+
+def parse_session_id(session_id):
+    """Split ``"<id>:<version>"`` into ints; legacy ids have version None."""
+    user_id, _, version = str(session_id).partition(':')
+    return int(user_id), (int(version) if version else None)
+
+
+def load_user(session_id):
+    """Flask-Login ``user_loader``: the user for ``session_id`` or None."""
+    try:
+        user_id, version = parse_session_id(session_id)
+    except ValueError:
+        return None
+
+    record = user_cache.get(user_id)
+    if record is not None and record['session_version'] != (version or 1):
+        # The entry may predate a password change made on another worker;
+        # only the database can say whether this session was revoked
+        user_cache.invalidate(user_id)
+        record = None
+    if record is None:
+        user = db.session.get(User, user_id)
+        if user is None:
+            return None
+        record = snapshot(user)
+        user_cache.set(user_id, record)
+    else:
+        user = User(**record)
+        make_transient_to_detached(user)
+        user = db.session.merge(user, load=False)
+
+    # Sessions issued before versioning are valid until the first password change
+    if record['session_version'] != (version or 1):
+        return None
+    return user
+
+
+def invalidate_user(user_id):
+    user_cache.invalidate(user_id)
+
+
+def configure(app):
+    user_cache.maxsize = app.config.get('USER_CACHE_SIZE', 1024)
+    user_cache.ttl = app.config.get('USER_CACHE_TTL', 30)
+
+
+# Drop cached rows after any commit that wrote them, whichever view did it
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def _mark_user_dirty(mapper, connection, target):
+    session = Session.object_session(target)
+    if session is not None:
+        session.info.setdefault('dirty_users', set()).add(target.id)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_dirty_users(session):
+    for user_id in session.info.pop('dirty_users', ()):
+        invalidate_user(user_id)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _forget_dirty_users(session, previous_transaction):
+    if previous_transaction.parent is None:
+        session.info.pop('dirty_users', None)
@@ -1,4 +1,5 @@
 from app import create_app, db
+import migrations
 import os
 
 # Choose config based on environment; default to production on Render
@@ -7,5 +8,5 @@ app = create_app(config_name=config_name)
 
 if __name__ == "__main__":
     with app.app_context():
-        db.create_all()
+        migrations.upgrade()
     app.run(host='0.0.0.0', port=int(os.environ.get('PORT', 5000)))